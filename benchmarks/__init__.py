@@ -0,0 +1,21 @@
+# Copyright 2018 Twilio, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+"""
+Microbenchmarks for SOCless hot paths, run against moto stand-ins for AWS.
+
+    python -m benchmarks --output results.json
+    python -m benchmarks --filter jinja --compare baseline.json
+
+See `python -m benchmarks --help` for every option.
+"""
@@ -0,0 +1,90 @@
+# Copyright 2018 Twilio, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+"""
+Run the SOCless microbenchmarks and write the results as JSON
+"""
+import argparse, contextlib, json, os, sys
+from .aws import configure_environment, mocked_aws
+from .harness import (
+    REGISTRY,
+    compare_results,
+    format_seconds,
+    run_benchmark,
+    write_report,
+)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__)
+    parser.add_argument(
+        "--output", default="benchmark_results.json", help="Where to write the JSON results"
+    )
+    parser.add_argument(
+        "--filter", default="", help="Only run benchmarks whose name or group contains this"
+    )
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=0.2,
+        help="Seconds each timed repeat should last at least",
+    )
+    parser.add_argument(
+        "--compare", help="A previous results file to compare medians against"
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.25,
+        help="With --compare, exit non-zero if a median is this fraction slower",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    configure_environment()
+    from . import cases  # registers the benchmarks
+
+    selected = [
+        bench
+        for bench in REGISTRY
+        if args.filter in bench.name or args.filter in bench.group
+    ]
+    results = []
+    with mocked_aws():
+        for bench in selected:
+            # keep log lines and metrics written by the benchmarked code out of the report
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                result = run_benchmark(bench, args.min_time)
+            results.append(result)
+            print(
+                f"{bench.group:<14} {bench.name:<50} median {format_seconds(result['median_seconds'])}"
+                f" ({result['loops']} loops x {result['repeat']})",
+                file=sys.stderr,
+            )
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_results(results, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+
+    write_report(args.output, results)
+    print(f"Wrote {len(results)} results to {args.output}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
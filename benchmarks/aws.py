@@ -0,0 +1,110 @@
+# Copyright 2018 Twilio, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+"""
+aws.py - moto stand-ins for the AWS resources SOCless uses
+"""
+import boto3, json, os
+from contextlib import ExitStack, contextmanager
+from moto import mock_dynamodb2, mock_iam, mock_s3, mock_ssm, mock_stepfunctions
+
+ACCOUNT_ID = "123456789012"
+PLAYBOOK_NAME = "BenchmarkPlaybook"
+
+# the same stand-in configuration tox uses for the tests
+ENVIRONMENT = {
+    "SOCLESS_VAULT": "socless-dev-soclessvault-xxxxxxxx",
+    "SOCLESS_EVENTS_TABLE": "mock_events_table",
+    "SOCLESS_PLAYBOOKS_TABLE": "mock_playbooks_table",
+    "SOCLESS_RESULTS_TABLE": "mock_results_table",
+    "SOCLESS_MESSAGE_RESPONSE_TABLE": "mock_message_responses",
+    "SOCLESS_DEDUP_TABLE": "socless_dedup",
+    "MOTO_ACCOUNT_ID": ACCOUNT_ID,
+    "AWS_REGION": "us-east-1",
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "AWS_SECURITY_TOKEN": "testing",
+    "AWS_SESSION_TOKEN": "testing",
+}
+
+PLAYBOOK_DEFINITION = json.dumps(
+    {
+        "StartAt": "DefaultState",
+        "States": {"DefaultState": {"Type": "Pass", "End": True}},
+    }
+)
+
+
+class BenchmarkLambdaContext:
+    invoked_function_arn = (
+        f"arn:aws:lambda:us-east-1:{ACCOUNT_ID}:function:socless_benchmarks"
+    )
+
+
+def configure_environment():
+    """Point SOCless at the stand-ins. Must run before socless modules are imported"""
+    for key, value in ENVIRONMENT.items():
+        os.environ.setdefault(key, value)
+
+
+def create_resources():
+    dynamodb = boto3.client("dynamodb")
+    for table_env, key in (
+        ("SOCLESS_EVENTS_TABLE", "id"),
+        ("SOCLESS_RESULTS_TABLE", "execution_id"),
+        ("SOCLESS_DEDUP_TABLE", "dedup_hash"),
+        ("SOCLESS_MESSAGE_RESPONSE_TABLE", "message_id"),
+    ):
+        dynamodb.create_table(
+            TableName=os.environ[table_env],
+            KeySchema=[{"AttributeName": key, "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": key, "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+
+    boto3.client("s3").create_bucket(Bucket=os.environ["SOCLESS_VAULT"])
+    boto3.client("ssm").put_parameter(
+        Name="/socless/benchmarks/api_key", Value="secret", Type="SecureString"
+    )
+
+    role_arn = boto3.client("iam").create_role(
+        RoleName="socless-benchmarks",
+        AssumeRolePolicyDocument=json.dumps(
+            {
+                "Version": "2012-10-17",
+                "Statement": {
+                    "Effect": "Allow",
+                    "Principal": {"Service": "states.amazonaws.com"},
+                    "Action": "sts:AssumeRole",
+                },
+            }
+        ),
+    )["Role"]["Arn"]
+    boto3.client("stepfunctions").create_state_machine(
+        name=PLAYBOOK_NAME, definition=PLAYBOOK_DEFINITION, roleArn=role_arn
+    )
+
+
+@contextmanager
+def mocked_aws():
+    """Run the block against fresh moto stand-ins of every resource SOCless uses"""
+    with ExitStack() as stack:
+        for mock in (mock_dynamodb2, mock_s3, mock_ssm, mock_stepfunctions, mock_iam):
+            stack.enter_context(mock())
+        boto3.setup_default_session()
+        from socless.clients import reset_boto3_registry
+
+        reset_boto3_registry()
+        create_resources()
+        yield
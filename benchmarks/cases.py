@@ -0,0 +1,202 @@
+# Copyright 2018 Twilio, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+"""
+cases.py - The benchmarked SOCless hot paths
+
+Import after `aws.configure_environment()`: some socless modules read their
+configuration from the environment at import.
+"""
+import itertools
+from .aws import PLAYBOOK_NAME, BenchmarkLambdaContext
+from .harness import benchmark
+from boto3.dynamodb.types import TypeDeserializer
+from socless.dynamodb import deserialize_item, serialize_item
+from socless.events import InitialEvent, create_events
+from socless.jinja import render_jinja_from_string
+from socless.logger import socless_log
+from socless.paramresolver import ParameterResolver
+from socless.utils import gen_id, replace_decimals, replace_floats_with_decimals
+
+_unique = itertools.count()
+
+
+def build_context(state_count: int) -> dict:
+    """An execution context shaped like a playbook that has run `state_count` states"""
+    return {
+        "execution_id": gen_id(),
+        "artifacts": {
+            "event": {
+                "id": gen_id(),
+                "event_type": "Suspicious Login",
+                "created_at": "2021-01-01T00:00:00.000000Z",
+                "details": {
+                    "username": "sterling.archer",
+                    "ip": "203.0.113.7",
+                    "user_agent": "Mozilla/5.0",
+                    "risk_score": 87.5,
+                    "tags": ["vpn", "new_device", "impossible_travel"],
+                },
+                "data_types": {"ip": "ip_address"},
+                "event_meta": {"source": "idp"},
+                "investigation_id": gen_id(),
+                "status_": "open",
+                "is_duplicate": False,
+            },
+            "execution_id": gen_id(),
+        },
+        "errors": {},
+        "results": {
+            f"Enrich_{index}": {
+                "status": "ok",
+                "count": index,
+                "score": index / 3,
+                "records": [
+                    {"id": record, "value": f"record-{record}", "weight": record * 0.5}
+                    for record in range(10)
+                ],
+            }
+            for index in range(state_count)
+        },
+    }
+
+
+STATE_PARAMETERS = {
+    "username": "$.artifacts.event.details.username",
+    "ip": "$.artifacts.event.details.ip",
+    "score": "$.results.Enrich_3.score",
+    "first_record": "$.results.Enrich_1.records[0].value",
+    "message": "Login by {{ context.artifacts.event.details.username }} from {{ context.artifacts.event.details.ip }}",
+    "tags": "{{ context.artifacts.event.details.tags | join(',') }}",
+    "api_key": "{{ secret('/socless/benchmarks/api_key') }}",
+    "options": {
+        "channel": "security-alerts",
+        "mention": ["@oncall", "$.artifacts.event.details.username"],
+        "threshold": 50,
+    },
+}
+
+
+@benchmark("paramresolver")
+def resolve_parameters():
+    resolver = ParameterResolver(build_context(20))
+    return lambda: resolver.resolve_parameters(STATE_PARAMETERS)
+
+
+@benchmark("paramresolver", blocks=200)
+def resolve_parameters_with_static_payload(blocks):
+    # e.g a Slack message whose block template has a single dynamic field
+    parameters = {
+        "target": "$.artifacts.event.details.username",
+        "blocks": [
+            {
+                "type": "section",
+                "text": {"type": "mrkdwn", "text": f"Static text for block {index}"},
+                "accessory": {"type": "button", "value": f"approve-{index}"},
+            }
+            for index in range(blocks)
+        ],
+    }
+    resolver = ParameterResolver(build_context(20))
+    return lambda: resolver.resolve_parameters(parameters)
+
+
+@benchmark("jinja", template="loop")
+@benchmark("jinja", template="expression")
+@benchmark("jinja", template="plain")
+def render_jinja(template):
+    templates = {
+        "plain": "security-alerts",
+        "expression": "{{ context.artifacts.event.details.username | upper }}",
+        "loop": "{% for tag in context.artifacts.event.details.tags %}{{ tag }};{% endfor %}",
+    }
+    template_string = templates[template]
+    context = build_context(5)
+    return lambda: render_jinja_from_string(template_string, context)
+
+
+@benchmark("utils", states=200)
+def replace_decimals_on_context(states):
+    context = replace_floats_with_decimals(build_context(states))
+    return lambda: replace_decimals(context)
+
+
+@benchmark("utils", states=200)
+def replace_floats_with_decimals_on_context(states):
+    context = build_context(states)
+    return lambda: replace_floats_with_decimals(context)
+
+
+@benchmark("utils", states=200)
+def deserialize_context_item(states):
+    wire_item = serialize_item({"execution_id": gen_id(), "results": build_context(states)})
+    return lambda: deserialize_item(wire_item)
+
+
+@benchmark("utils", states=200)
+def boto3_deserialize_and_replace_decimals(states):
+    wire_item = serialize_item({"execution_id": gen_id(), "results": build_context(states)})
+    deserializer = TypeDeserializer()
+    return lambda: replace_decimals(
+        {name: deserializer.deserialize(value) for name, value in wire_item.items()}
+    )
+
+
+@benchmark("events")
+def dedup_hash():
+    event = InitialEvent(
+        created_at="2021-01-01T00:00:00.000000Z",
+        event_type="Suspicious Login",
+        playbook=PLAYBOOK_NAME,
+        details={"username": "sterling.archer", "ip": "203.0.113.7", "id": "1"},
+        data_types={},
+        event_meta={},
+        dedup_keys=["username", "ip"],
+    )
+    return lambda: event.dedup_hash
+
+
+@benchmark("events", repeat=3, details=1000)
+@benchmark("events", repeat=3, details=100)
+@benchmark("events", repeat=3, details=1)
+def create_events_batch(details):
+    lambda_context = BenchmarkLambdaContext()
+
+    def run():
+        # unique usernames, so every run creates new investigations
+        batch = next(_unique)
+        create_events(
+            {
+                "event_type": "Suspicious Login",
+                "playbook": PLAYBOOK_NAME,
+                "details": [
+                    {"username": f"user-{batch}-{index}", "ip": "203.0.113.7"}
+                    for index in range(details)
+                ],
+                "dedup_keys": ["username"],
+            },
+            lambda_context,
+        )
+
+    return run
+
+
+@benchmark("logger", extra="large")
+@benchmark("logger", extra="small")
+def socless_log_info(extra):
+    extras = {
+        "small": {"execution_id": gen_id(), "state_name": "Enrich_1"},
+        "large": build_context(50),
+    }
+    payload = extras[extra]
+    return lambda: socless_log.info("Benchmark message", payload)
@@ -0,0 +1,151 @@
+# Copyright 2018 Twilio, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+"""
+harness.py - Registers, times and reports benchmarks
+"""
+import json, platform, statistics, subprocess, sys, time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+# a benchmark function does its setup and returns the zero-argument callable to time
+BenchmarkFactory = Callable[[], Callable[[], object]]
+
+
+@dataclass
+class Benchmark:
+    name: str
+    group: str
+    factory: BenchmarkFactory
+    params: Dict[str, object] = field(default_factory=dict)
+    repeat: int = 5
+
+
+REGISTRY: List[Benchmark] = []
+
+
+def benchmark(group: str, repeat: int = 5, **params):
+    """Register a benchmark factory. Its name is the function name plus any params"""
+
+    def register(factory: BenchmarkFactory) -> BenchmarkFactory:
+        name = factory.__name__
+        if params:
+            name += "[" + ",".join(f"{key}={value}" for key, value in params.items()) + "]"
+        REGISTRY.append(
+            Benchmark(
+                name=name,
+                group=group,
+                factory=lambda: factory(**params),
+                params=params,
+                repeat=repeat,
+            )
+        )
+        return factory
+
+    return register
+
+
+def calibrate_loops(func: Callable[[], object], min_time: float) -> int:
+    """The number of calls that take at least `min_time` seconds, like timeit's autorange"""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        if time.perf_counter() - start >= min_time:
+            return loops
+        loops *= 2
+
+
+def run_benchmark(bench: Benchmark, min_time: float) -> dict:
+    func = bench.factory()
+    loops = calibrate_loops(func, min_time)
+    per_call = []
+    for _ in range(bench.repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        per_call.append((time.perf_counter() - start) / loops)
+    return {
+        "name": bench.name,
+        "group": bench.group,
+        "params": bench.params,
+        "loops": loops,
+        "repeat": bench.repeat,
+        "min_seconds": min(per_call),
+        "median_seconds": statistics.median(per_call),
+        "mean_seconds": statistics.mean(per_call),
+        "stdev_seconds": statistics.stdev(per_call) if len(per_call) > 1 else 0.0,
+    }
+
+
+def package_version(name: str) -> Optional[str]:
+    try:
+        from importlib.metadata import version
+
+        return version(name)
+    except Exception:
+        return None
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def environment_metadata() -> dict:
+    return {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "git_commit": git_commit(),
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "packages": {
+            name: package_version(name)
+            for name in ("boto3", "botocore", "moto", "jinja2", "simplejson")
+        },
+    }
+
+
+def compare_results(results: List[dict], baseline: dict, max_regression: float) -> List[str]:
+    """Describe every benchmark whose median is more than `max_regression` slower than the baseline"""
+    baseline_medians = {
+        result["name"]: result["median_seconds"] for result in baseline["results"]
+    }
+    regressions = []
+    for result in results:
+        before = baseline_medians.get(result["name"])
+        if not before:
+            continue
+        ratio = result["median_seconds"] / before
+        result["baseline_ratio"] = ratio
+        if ratio > 1 + max_regression:
+            regressions.append(f"{result['name']}: {ratio:.2f}x the baseline median")
+    return regressions
+
+
+def format_seconds(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f}{unit}"
+    return f"{seconds / 1e-9:.1f}ns"
+
+
+def write_report(path: str, results: List[dict]):
+    with open(path, "w") as f:
+        json.dump({"meta": environment_metadata(), "results": results}, f, indent=2)
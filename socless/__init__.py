@@ -12,15 +12,84 @@
 # See the License for the specific language governing permissions and
 # limitations under the License
 
-# flake8: noqa
-from .socless import *
-from .events import (
-    create_events,
-    setup_socless_global_state_from_running_step_functions_execution,
-)
-from .vault import *
-from .humaninteraction import init_human_interaction, end_human_interaction
-from .s3 import *
-from .utils import *
-from .exceptions import *
-from .integrations import socless_bootstrap, socless_template_string
+"""
+The SOCless core library.
+
+Public names are loaded on first access (PEP 562) so that `import socless`
+stays cheap: an integration that only needs `socless_bootstrap` does not pay
+to import the events, vault, human interaction or legacy modules.
+"""
+import importlib
+
+# public name -> submodule that defines it
+_LAZY_ATTRIBUTES = {
+    # socless.socless (legacy API)
+    "socless_log": "socless",
+    "socless_gen_id": "socless",
+    "socless_credentials": "socless",
+    "socless_execute_playbook": "socless",
+    "socless_dispatch_outbound_message": "socless",
+    "socless_create_events": "socless",
+    "socless_save_state_execution_result": "socless",
+    "socless_fetch_execution_result": "socless",
+    "socless_save_to_vault": "socless",
+    "socless_post_human_response": "socless",
+    "socless_log_then_raise": "socless",
+    # socless.events
+    "create_events": "events",
+    "setup_socless_global_state_from_running_step_functions_execution": "events",
+    # socless.vault
+    "save_to_vault": "vault",
+    "fetch_from_vault": "vault",
+    "remove_from_vault": "vault",
+    # socless.humaninteraction
+    "init_human_interaction": "humaninteraction",
+    "end_human_interaction": "humaninteraction",
+    # socless.s3
+    "save_to_s3": "s3",
+    # socless.utils
+    "gen_id": "utils",
+    "gen_datetimenow": "utils",
+    "convert_empty_strings_to_none": "utils",
+    "replace_decimals": "utils",
+    "replace_floats_with_decimals": "utils",
+    # socless.exceptions
+    "SoclessException": "exceptions",
+    "SoclessNotFoundError": "exceptions",
+    "SoclessEventsError": "exceptions",
+    "SoclessBootstrapError": "exceptions",
+    "SoclessVaultError": "exceptions",
+    # socless.integrations
+    "socless_bootstrap": "integrations",
+    "socless_bootstrap_async": "integrations",
+    "socless_bootstrap_batch": "integrations",
+    "socless_template_string": "integrations",
+    # socless.timings
+    "span": "timings",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    try:
+        module_name = _LAZY_ATTRIBUTES[name]
+    except KeyError:
+        # fall back to submodules, e.g `socless.events`
+        try:
+            return importlib.import_module(f".{name}", __name__)
+        except ModuleNotFoundError as e:
+            if e.name != f"{__name__}.{name}":
+                raise
+            raise AttributeError(
+                f"module {__name__!r} has no attribute {name!r}"
+            ) from None
+
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    # cache on the package so later lookups skip __getattr__ entirely
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,79 @@
+# Copyright 2018 Twilio, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+"""
+clients.py - Process-wide registry of boto3 clients and resources
+
+boto3 clients and resources are expensive to build. Lambda keeps the Python
+process alive between warm invocations, so SOCless builds each one once,
+on first use, and reuses it for the lifetime of the process.
+"""
+import boto3, threading
+from typing import Any, Dict, Optional, Tuple
+
+__all__ = ["get_boto3_client", "get_boto3_resource", "reset_boto3_registry"]
+
+RegistryKey = Tuple[str, Optional[str]]
+
+_registry_lock = threading.Lock()
+_clients: Dict[RegistryKey, Any] = {}
+_resources: Dict[RegistryKey, Any] = {}
+
+
+def _get_or_create(registry: Dict[RegistryKey, Any], key: RegistryKey, factory):
+    try:
+        return registry[key]
+    except KeyError:
+        pass
+    with _registry_lock:
+        # another thread may have created it while we waited on the lock
+        if key not in registry:
+            service_name, region_name = key
+            registry[key] = factory(service_name, region_name=region_name)
+        return registry[key]
+
+
+def get_boto3_client(service_name: str, region_name: Optional[str] = None):
+    """Return the shared boto3 client for a service and region.
+
+    Args:
+        service_name (str): The AWS service name e.g "stepfunctions"
+        region_name (str): The AWS region. Defaults to boto3's region resolution
+    Returns:
+        A boto3 client. Clients are thread-safe and may be shared across threads
+    """
+    return _get_or_create(_clients, (service_name, region_name), boto3.client)
+
+
+def get_boto3_resource(service_name: str, region_name: Optional[str] = None):
+    """Return the shared boto3 service resource for a service and region.
+
+    Args:
+        service_name (str): The AWS service name e.g "dynamodb"
+        region_name (str): The AWS region. Defaults to boto3's region resolution
+    Returns:
+        A boto3 service resource. Unlike clients, resources are not thread-safe;
+        use `get_boto3_client` from worker threads.
+    """
+    return _get_or_create(_resources, (service_name, region_name), boto3.resource)
+
+
+def reset_boto3_registry():
+    """Drop every cached client and resource.
+
+    Intended for tests, which need fresh clients after swapping credentials,
+    regions or mocked endpoints.
+    """
+    with _registry_lock:
+        _clients.clear()
+        _resources.clear()
@@ -0,0 +1,261 @@
+# Copyright 2018 Twilio, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+"""
+dynamodb.py - Helpers for batched DynamoDB operations
+"""
+import random, time
+from decimal import Decimal
+from typing import Any, Dict, List, Sequence, Tuple
+from .clients import get_boto3_client, get_boto3_resource
+from .exceptions import SoclessException
+
+# BatchWriteItem accepts at most 25 put/delete requests per call
+BATCH_WRITE_ITEM_LIMIT = 25
+# BatchGetItem accepts at most 100 keys per call
+BATCH_GET_ITEM_LIMIT = 100
+# DynamoDB rejects items larger than 400KB
+ITEM_SIZE_LIMIT = 400 * 1024
+MAX_BATCH_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 0.05
+BACKOFF_MAX_SECONDS = 2.0
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter, in seconds, for a 0-based retry attempt"""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+def chunks(items: Sequence, size: int):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def batch_put_items(puts: Sequence[Tuple[str, dict]]):
+    """Write items with BatchWriteItem, 25 at a time, retrying unprocessed items.
+
+    Args:
+        puts: (table_name, item) pairs. Items may go to several tables and are
+            written in the given order, chunk by chunk
+    Raises:
+        SoclessException if some items are still unprocessed after
+            MAX_BATCH_ATTEMPTS calls
+    """
+    dynamodb = get_boto3_resource("dynamodb")
+    for chunk in chunks(puts, BATCH_WRITE_ITEM_LIMIT):
+        request_items: Dict[str, List[dict]] = {}
+        for table_name, item in chunk:
+            request_items.setdefault(table_name, []).append(
+                {"PutRequest": {"Item": item}}
+            )
+
+        for attempt in range(MAX_BATCH_ATTEMPTS):
+            if attempt:
+                time.sleep(backoff_delay(attempt - 1))
+            response = dynamodb.batch_write_item(RequestItems=request_items)
+            request_items = response.get("UnprocessedItems") or {}
+            if not request_items:
+                break
+        else:
+            unprocessed_count = sum(len(reqs) for reqs in request_items.values())
+            raise SoclessException(
+                f"{unprocessed_count} items were still unprocessed after {MAX_BATCH_ATTEMPTS} BatchWriteItem attempts"
+            )
+
+
+def batch_get_items(
+    table_name: str, keys: Sequence[dict], consistent_read: bool = False
+) -> List[dict]:
+    """Read items from one table with BatchGetItem, 100 keys at a time, retrying unprocessed keys.
+
+    Args:
+        table_name: The table to read from
+        keys: The primary keys of the items. Must not contain duplicates
+        consistent_read: Use strongly consistent reads
+    Returns:
+        The items that exist, in no particular order
+    Raises:
+        SoclessException if some keys are still unprocessed after
+            MAX_BATCH_ATTEMPTS calls
+    """
+    return _batch_get(
+        get_boto3_resource("dynamodb"),
+        table_name,
+        keys,
+        {"ConsistentRead": consistent_read},
+    )
+
+
+def batch_get_raw_items(
+    table_name: str, keys: Sequence[dict], **table_request
+) -> List[dict]:
+    """Read items with BatchGetItem like `batch_get_items`, using the low-level client.
+
+    Args:
+        table_name: The table to read from
+        keys: The primary keys of the items, in the low-level client format, e.g
+            {"execution_id": {"S": "..."}}. Must not contain duplicates
+        table_request: Other request parameters for the table, e.g
+            ConsistentRead or ProjectionExpression
+    Returns:
+        The items that exist in the low-level client format, see `deserialize_item`
+    """
+    return _batch_get(get_boto3_client("dynamodb"), table_name, keys, table_request)
+
+
+def _batch_get(dynamodb, table_name: str, keys: Sequence[dict], table_request: dict):
+    items: List[dict] = []
+    for chunk in chunks(keys, BATCH_GET_ITEM_LIMIT):
+        request_items = {table_name: {"Keys": list(chunk), **table_request}}
+        for attempt in range(MAX_BATCH_ATTEMPTS):
+            if attempt:
+                time.sleep(backoff_delay(attempt - 1))
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            items.extend(response.get("Responses", {}).get(table_name, []))
+            request_items = response.get("UnprocessedKeys") or {}
+            if not request_items:
+                break
+        else:
+            unprocessed_count = len(request_items[table_name]["Keys"])
+            raise SoclessException(
+                f"{unprocessed_count} keys were still unprocessed after {MAX_BATCH_ATTEMPTS} BatchGetItem attempts"
+            )
+    return items
+
+
+def attribute_value_size(value: Any) -> int:
+    """Estimate the bytes DynamoDB bills for one attribute value.
+
+    Follows the sizing rules in the DynamoDB developer guide: strings and binary
+    count their bytes, numbers about one byte per two significant digits, and
+    maps and lists 3 bytes plus 1 byte per element on top of their contents.
+    """
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (int, float, Decimal)):
+        digits = str(value).lstrip("-").replace(".", "").lstrip("0") or "0"
+        return (len(digits.split("E")[0].split("e")[0]) + 1) // 2 + 1
+    if isinstance(value, dict):
+        return 3 + sum(
+            1 + len(str(key).encode("utf-8")) + attribute_value_size(nested)
+            for key, nested in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        return 3 + sum(1 + attribute_value_size(nested) for nested in value)
+    if isinstance(value, (set, frozenset)):
+        return sum(attribute_value_size(nested) for nested in value)
+    # boto3 Binary wrapper and anything else with a byte representation
+    return len(bytes(value))
+
+
+def item_size(item: dict) -> int:
+    """Estimate the size of a DynamoDB item in bytes, as counted against ITEM_SIZE_LIMIT"""
+    return sum(
+        len(name.encode("utf-8")) + attribute_value_size(value)
+        for name, value in item.items()
+    )
+
+
+def deserialize_value(attribute: dict) -> Any:
+    """Convert a low-level client attribute value, e.g {"N": "1.5"}, to Python.
+
+    Unlike boto3's TypeDeserializer, numbers become `int` or `float` rather than
+    `Decimal`, so no second `replace_decimals` pass is needed.
+    """
+    for kind, raw in attribute.items():
+        if kind == "S":
+            return raw
+        if kind == "M":
+            return {key: deserialize_value(value) for key, value in raw.items()}
+        if kind == "N":
+            return _deserialize_number(raw)
+        if kind == "L":
+            return [deserialize_value(value) for value in raw]
+        if kind == "BOOL":
+            return raw
+        if kind == "NULL":
+            return None
+        if kind == "B":
+            return raw
+        if kind == "SS" or kind == "BS":
+            return set(raw)
+        if kind == "NS":
+            return {_deserialize_number(number) for number in raw}
+        raise TypeError(f"Unknown DynamoDB attribute type {kind}")
+    raise TypeError("Empty DynamoDB attribute value")
+
+
+def _deserialize_number(raw: str):
+    if "." in raw or "e" in raw or "E" in raw:
+        return float(raw)
+    return int(raw)
+
+
+def deserialize_item(item: dict) -> dict:
+    return {name: deserialize_value(value) for name, value in item.items()}
+
+
+def serialize_value(value: Any) -> dict:
+    """Convert a Python value to a low-level client attribute value.
+
+    Unlike boto3's TypeSerializer, floats are accepted as they are, so there's no
+    need to convert them with `replace_floats_with_decimals` first.
+    Raises:
+        TypeError for values DynamoDB can't store, e.g NaN or an empty set
+    """
+    if value is None:
+        return {"NULL": True}
+    if isinstance(value, bool):
+        return {"BOOL": value}
+    if isinstance(value, str):
+        return {"S": value}
+    if isinstance(value, dict):
+        return {"M": {key: serialize_value(nested) for key, nested in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return {"L": [serialize_value(nested) for nested in value]}
+    if isinstance(value, (int, float, Decimal)):
+        return {"N": _serialize_number(value)}
+    if isinstance(value, (bytes, bytearray)):
+        return {"B": bytes(value)}
+    if isinstance(value, (set, frozenset)) and value:
+        if all(isinstance(member, str) for member in value):
+            return {"SS": list(value)}
+        if all(isinstance(member, (bytes, bytearray)) for member in value):
+            return {"BS": [bytes(member) for member in value]}
+        if all(
+            isinstance(member, (int, float, Decimal))
+            and not isinstance(member, bool)
+            for member in value
+        ):
+            return {"NS": [_serialize_number(member) for member in value]}
+    if hasattr(value, "value") and isinstance(value.value, bytes):
+        # boto3.dynamodb.types.Binary
+        return {"B": value.value}
+    raise TypeError(f"Unsupported type {type(value)} for DynamoDB value {value!r}")
+
+
+_INF = float("inf")
+
+
+def _serialize_number(number) -> str:
+    if isinstance(number, float) and (number != number or number in (_INF, -_INF)):
+        raise TypeError("DynamoDB does not support NaN or Infinity")
+    return repr(number) if isinstance(number, float) else str(number)
+
+
+def serialize_item(item: dict) -> dict:
+    return {name: serialize_value(value) for name, value in item.items()}
@@ -16,17 +16,41 @@ Classes and modules for creating and managing events
 """
 from socless.models import EventTableItem, PlaybookArtifacts, PlaybookInput
 from socless.exceptions import SoclessEventsError, SoclessNotFoundError
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 from .logger import socless_log
-import os, boto3, simplejson as json, hashlib
+from .metrics import COUNT, metrics
+from .clients import get_boto3_client, get_boto3_resource
+from .dynamodb import batch_get_items, batch_put_items
+from .resultsformat import build_compressed_attributes, compressed_format_enabled
+import os, simplejson as json, hashlib
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, asdict
 from .utils import gen_id, gen_datetimenow, validate_iso_datetime
 
 
 EVENTS_TABLE = os.environ.get("SOCLESS_EVENTS_TABLE", "")
 DEDUP_TABLE = os.environ.get("SOCLESS_DEDUP_TABLE", "")
-event_table = boto3.resource("dynamodb").Table(EVENTS_TABLE)
-dedup_table = boto3.resource("dynamodb").Table(DEDUP_TABLE)
+# number of playbooks create_events starts at once, 1 starts them one by one
+PLAYBOOK_START_CONCURRENCY = int(os.environ.get("SOCLESS_PLAYBOOK_START_CONCURRENCY", 1))
+
+
+def get_event_table():
+    """Return the socless events table, bound on first use rather than at import."""
+    return get_boto3_resource("dynamodb").Table(EVENTS_TABLE)
+
+
+def get_dedup_table():
+    """Return the socless dedup table, bound on first use rather than at import."""
+    return get_boto3_resource("dynamodb").Table(DEDUP_TABLE)
+
+
+def __getattr__(name):
+    # `event_table` and `dedup_table` used to be built at import time
+    if name == "event_table":
+        return get_event_table()
+    if name == "dedup_table":
+        return get_dedup_table()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def get_playbook_arn(playbook_name, lambda_context):
@@ -37,19 +61,31 @@ def get_playbook_arn(playbook_name, lambda_context):
     )
 
 
+def build_results_table_item(
+    execution_id: str, investigation_id: str, playbook_input_as_dict: dict
+) -> dict:
+    item = {
+        "execution_id": execution_id,
+        "datetime": gen_datetimenow(),
+        "investigation_id": investigation_id,
+    }
+    if compressed_format_enabled():
+        item.update(build_compressed_attributes(playbook_input_as_dict))
+    else:
+        item["results"] = playbook_input_as_dict
+    return item
+
+
 def setup_results_table_for_playbook_execution(
     execution_id: str, investigation_id: str, playbook_input_as_dict: dict
 ):
-    results_table = boto3.resource("dynamodb").Table(
+    results_table = get_boto3_resource("dynamodb").Table(
         os.environ.get("SOCLESS_RESULTS_TABLE")
     )
     results_table.put_item(
-        Item={
-            "execution_id": execution_id,
-            "datetime": gen_datetimenow(),
-            "investigation_id": investigation_id,
-            "results": playbook_input_as_dict,
-        }
+        Item=build_results_table_item(
+            execution_id, investigation_id, playbook_input_as_dict
+        )
     )
 
 
@@ -60,7 +96,7 @@ def get_investigation_id_from_dedup_table(dedup_hash: str) -> str:
     Logs a warning if a dedup_hash is found but doesn't contain any investigation_id.
     """
     key = {"dedup_hash": dedup_hash}
-    dedup_mapping = dedup_table.get_item(Key=key).get("Item")
+    dedup_mapping = get_dedup_table().get_item(Key=key).get("Item")
 
     if dedup_mapping:
         try:
@@ -78,7 +114,7 @@ def get_investigation_id_from_dedup_table(dedup_hash: str) -> str:
 def get_investigation_id_from_existing_unclosed_event(
     current_investigation_id,
 ) -> str:
-    current_investigation = event_table.get_item(
+    current_investigation = get_event_table().get_item(
         Key={"id": current_investigation_id}
     ).get("Item")
     if current_investigation and current_investigation["status_"] != "closed":
@@ -87,6 +123,19 @@ def get_investigation_id_from_existing_unclosed_event(
         raise SoclessNotFoundError("No open investigation found")
 
 
+def compute_dedup_hash(event_type: str, details: dict, dedup_keys: list) -> str:
+    """Hash an event's type and the values of its dedup_keys in `details`.
+
+    Values are compared as lowercased strings, so numbers and booleans can be
+    dedup keys too.
+    Raises:
+        KeyError if a dedup key is missing from `details`
+    """
+    sorted_dedup_vals = sorted([str(details[key]).lower() for key in dedup_keys])
+    dedup_signature = event_type.lower() + "".join(sorted_dedup_vals)
+    return hashlib.md5(dedup_signature.encode("utf-8")).hexdigest()
+
+
 @dataclass
 class StartExecutionReport:
     investigation_id: str
@@ -135,12 +184,7 @@ class InitialEvent:
         Returns:
             A hashed string for deduplicating an event triggered twice.
         """
-        sorted_dedup_vals = sorted(
-            [self.details[key].lower() for key in self.dedup_keys]
-        )
-        dedup_signature = self.event_type.lower() + "".join(sorted_dedup_vals)
-        dedup_hash = hashlib.md5(dedup_signature.encode("utf-8")).hexdigest()
-        return dedup_hash
+        return compute_dedup_hash(self.event_type, self.details, self.dedup_keys)
 
 
 class EventMetadata:
@@ -250,14 +294,14 @@ class CompleteEvent:
                     "dedup_hash": self.event.dedup_hash,
                     "current_investigation_id": self.metadata.investigation_id,
                 }
-                dedup_table.put_item(Item=new_dedup_mapping)
+                get_dedup_table().put_item(Item=new_dedup_mapping)
 
     def put_in_events_table(self) -> dict:
         """Combine event and metadata, then put_item into socless event_table.
         NOTE: does not check if event is duplicate
         """
         event_table_item_as_dict = self.as_event_table_item.__dict__
-        event_table.put_item(Item=event_table_item_as_dict)
+        get_event_table().put_item(Item=event_table_item_as_dict)
         return event_table_item_as_dict
 
     def put_in_results_table(self) -> dict:
@@ -276,7 +320,14 @@ class CompleteEvent:
         NOTE: depends on results_table
         """
         playbook_input_as_dict = self.put_in_results_table()
+        return self.start_playbook_execution(
+            playbook_arn, stepfunctions_client, playbook_input_as_dict
+        )
 
+    def start_playbook_execution(
+        self, playbook_arn, stepfunctions_client, playbook_input_as_dict: dict
+    ) -> StartExecutionReport:
+        """Attempt to start execution, assuming the results_table item is already saved"""
         report = StartExecutionReport(
             investigation_id=self.metadata.investigation_id,
             playbook=str(self.event.playbook),
@@ -300,8 +351,131 @@ class CompleteEvent:
         return report
 
 
-def create_events(event_details: dict, context):
-    """Deduplicate and start playbooks from an intial event or list of event details."""
+def deduplicate_events(complete_events: List[CompleteEvent]) -> List[dict]:
+    """Deduplicate a batch of events with batched reads, mutating each event's metadata.
+
+    Each dedup_hash is computed once and identical hashes are collapsed, so the
+    dedup & events tables are read with one BatchGetItem per 100 distinct hashes
+    rather than two reads per event. The first event with a given hash is
+    checked against the tables; later events with the same hash are duplicates
+    of the same open investigation, or of that first event.
+    Returns:
+        The new dedup table items to write, one per original event with dedup keys
+    Notes:
+        Depends on dedup_table & event_table.
+    """
+    event_hashes = [
+        event.event.dedup_hash if event.event.dedup_keys else None
+        for event in complete_events
+    ]
+    unique_hashes = list(dict.fromkeys(filter(None, event_hashes)))
+    if not unique_hashes:
+        return []
+
+    # dedup_hash -> investigation id the dedup table points at
+    candidate_ids: Dict[str, str] = {}
+    for dedup_mapping in batch_get_items(
+        DEDUP_TABLE, [{"dedup_hash": dedup_hash} for dedup_hash in unique_hashes]
+    ):
+        try:
+            candidate_ids[dedup_mapping["dedup_hash"]] = dedup_mapping[
+                "current_investigation_id"
+            ]
+        except KeyError:
+            socless_log.warn(
+                "Item without 'current_investigation_id' found in dedup table",
+                {"dedup_hash": dedup_mapping["dedup_hash"]},
+            )
+
+    # dedup_hash -> investigation_id of an open investigation
+    open_investigations: Dict[str, str] = {}
+    if candidate_ids:
+        candidate_events = batch_get_items(
+            EVENTS_TABLE,
+            [{"id": event_id} for event_id in dict.fromkeys(candidate_ids.values())],
+        )
+        open_by_id = {
+            item["id"]: item["investigation_id"]
+            for item in candidate_events
+            if item.get("status_") != "closed" and "investigation_id" in item
+        }
+        open_investigations = {
+            dedup_hash: open_by_id[event_id]
+            for dedup_hash, event_id in candidate_ids.items()
+            if event_id in open_by_id
+        }
+
+    new_dedup_mappings = []
+    for complete_event, dedup_hash in zip(complete_events, event_hashes):
+        if not dedup_hash:
+            continue
+        if dedup_hash in open_investigations:
+            complete_event.metadata.investigation_id = open_investigations[dedup_hash]
+            complete_event.metadata.status_ = "closed"
+            complete_event.metadata.is_duplicate = True
+        else:
+            # an original, later events in this batch with the same hash are its duplicates
+            open_investigations[dedup_hash] = complete_event.metadata.investigation_id
+            new_dedup_mappings.append(
+                {
+                    "dedup_hash": dedup_hash,
+                    "current_investigation_id": complete_event.metadata.investigation_id,
+                }
+            )
+    return new_dedup_mappings
+
+
+def start_playbook_executions(
+    complete_events: List[CompleteEvent],
+    playbook_inputs: List[dict],
+    playbook_arn: str,
+    max_concurrency: int = 1,
+) -> List[StartExecutionReport]:
+    """Start a playbook execution per event, on up to `max_concurrency` threads.
+
+    All threads share one Step Functions client. Reports are returned in the
+    same order as `complete_events`.
+    """
+    stepfunctions_client = get_boto3_client("stepfunctions")
+
+    def start(event_and_input) -> StartExecutionReport:
+        complete_event, playbook_input_as_dict = event_and_input
+        with metrics.timer("PlaybookStartLatency"):
+            return complete_event.start_playbook_execution(
+                playbook_arn, stepfunctions_client, playbook_input_as_dict
+            )
+
+    events_and_inputs = list(zip(complete_events, playbook_inputs))
+    if max_concurrency <= 1 or len(events_and_inputs) <= 1:
+        return [start(event_and_input) for event_and_input in events_and_inputs]
+
+    with ThreadPoolExecutor(
+        max_workers=min(max_concurrency, len(events_and_inputs))
+    ) as pool:
+        return list(pool.map(start, events_and_inputs))
+
+
+def create_events(
+    event_details: dict, context, max_concurrent_starts: Optional[int] = None
+):
+    """Deduplicate and start playbooks from an intial event or list of event details.
+
+    Args:
+        event_details: The event, with a single `details` dict or a list of them
+        context: The Lambda context object
+        max_concurrent_starts: How many playbook executions to start at once. Defaults
+            to the SOCLESS_PLAYBOOK_START_CONCURRENCY env var, or 1 (one at a time).
+            Keep it within your Step Functions StartExecution quota.
+    """
+    try:
+        return _create_events(event_details, context, max_concurrent_starts)
+    finally:
+        metrics.flush()
+
+
+def _create_events(
+    event_details: dict, context, max_concurrent_starts: Optional[int] = None
+):
     # setup event_details formats
     event_details.setdefault("created_at", gen_datetimenow())
     # convert "details" to a list of "details" objects (for backwards compatibility)
@@ -325,17 +499,43 @@ def create_events(event_details: dict, context):
             )
         )
 
-    stepfunctions_client = boto3.client("stepfunctions")
+    new_dedup_mappings = deduplicate_events(complete_events_list)
+    metrics.put("EventsCreated", len(complete_events_list), COUNT)
+    metrics.put(
+        "DedupHits",
+        sum(1 for event in complete_events_list if event.metadata.is_duplicate),
+        COUNT,
+    )
+
+    # persist every events, dedup & results table item with batched writes
+    results_table_name = os.environ.get("SOCLESS_RESULTS_TABLE")
+    playbook_inputs = [asdict(event.as_playbook_input) for event in complete_events_list]
+    puts = [
+        (EVENTS_TABLE, event.as_event_table_item.__dict__)
+        for event in complete_events_list
+    ]
+    puts += [(DEDUP_TABLE, dedup_mapping) for dedup_mapping in new_dedup_mappings]
+    for complete_event, playbook_input_as_dict in zip(
+        complete_events_list, playbook_inputs
+    ):
+        results_table_item = build_results_table_item(
+            complete_event.metadata.execution_id,
+            complete_event.metadata.investigation_id,
+            playbook_input_as_dict,
+        )
+        puts.append((results_table_name, results_table_item))
+    batch_put_items(puts)
+
+    if max_concurrent_starts is None:
+        max_concurrent_starts = PLAYBOOK_START_CONCURRENCY
     playbook_arn = get_playbook_arn(event_details["playbook"], context)
-    execution_reports: List[StartExecutionReport] = []
-    for complete_event in complete_events_list:
-        complete_event.deduplicate_and_update_dedup_table()
-        complete_event.put_in_events_table()
-        exec_report = complete_event.start_playbook(playbook_arn, stepfunctions_client)
-        execution_reports.append(exec_report)
+    execution_reports = start_playbook_executions(
+        complete_events_list, playbook_inputs, playbook_arn, max_concurrent_starts
+    )
 
     # check for failures
     failures = [report for report in execution_reports if report.error]
+    metrics.put("PlaybookStartFailures", len(failures), COUNT)
     if len(failures) > 0:
         raise SoclessEventsError(
             f"{len(failures)} of {len(execution_reports)} events failed to start playbooks.\n Failure Reports: \n {failures}"
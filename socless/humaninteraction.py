@@ -14,9 +14,12 @@
 """
 humaninteraction.py - Classes, function and libraries to support SOCless' Human Interaction Workflow
 """
-import os, boto3, json
+import os, json
+from datetime import datetime
 from botocore.exceptions import ClientError
 from .utils import gen_id, gen_datetimenow
+from .metrics import SECONDS, metrics
+from .clients import get_boto3_client, get_boto3_resource
 from .integrations import ExecutionContext
 from .logger import socless_log_then_raise
 
@@ -40,7 +43,7 @@ def init_human_interaction(execution_context, message_draft, message_id=""):
         message_id = gen_id(6)
 
     RESPONSE_TABLE = os.environ["SOCLESS_MESSAGE_RESPONSE_TABLE"]
-    response_table = boto3.resource("dynamodb").Table(RESPONSE_TABLE)
+    response_table = get_boto3_resource("dynamodb").Table(RESPONSE_TABLE)
     try:
         investigation_id = execution_context["artifacts"]["event"]["investigation_id"]
         execution_id = execution_context["execution_id"]
@@ -69,6 +72,19 @@ def init_human_interaction(execution_context, message_draft, message_id=""):
     return message_id
 
 
+def record_response_latency(message_datetime):
+    """Record the seconds between sending a message and delivering the human's response"""
+    if not metrics.enabled or not message_datetime:
+        return
+    try:
+        sent_at = datetime.fromisoformat(message_datetime.rstrip("Z"))
+    except ValueError:
+        return
+    latency = (datetime.utcnow() - sent_at).total_seconds()
+    metrics.put("HumanResponseLatency", latency, SECONDS)
+    metrics.flush()
+
+
 def end_human_interaction(message_id, response_body):
     """Completes a human interaction by returning the human's response to
         the appropriate playbook execution
@@ -93,7 +109,7 @@ def end_human_interaction(message_id, response_body):
     """
 
     try:
-        responses_table = boto3.resource("dynamodb").Table(
+        responses_table = get_boto3_resource("dynamodb").Table(
             os.environ["SOCLESS_MESSAGE_RESPONSE_TABLE"]
         )
         response = responses_table.get_item(Key={"message_id": message_id})
@@ -134,7 +150,7 @@ def end_human_interaction(message_id, response_body):
     resp_body_with_state_name = {receiver: response_body}
     resp_body_with_state_name.update(response_body)
     execution_results["results"] = resp_body_with_state_name
-    stepfunctions = boto3.client("stepfunctions")
+    stepfunctions = get_boto3_client("stepfunctions")
     execution_context.save_state_results(receiver, response_body)
     try:
         stepfunctions.send_task_success(
@@ -149,6 +165,8 @@ def end_human_interaction(message_id, response_body):
     except Exception as e:
         socless_log_then_raise("response_delivery_failed", {"error": f"{e}"})
 
+    record_response_latency(item.get("datetime"))
+
     try:
         responses_table.update_item(
             Key={"message_id": message_id},
@@ -14,19 +14,246 @@
 """
 Classes and modules for Integrations
 """
-import boto3, os
-from typing import Callable
+import asyncio, inspect, os, time, simplejson as json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from botocore.exceptions import ClientError
 from .logger import socless_log
-from .utils import (
-    convert_empty_strings_to_none,
-    replace_decimals,
-    replace_floats_with_decimals,
+from .metrics import metrics
+from .timings import EVENT_TIMINGS_KEY, TIMINGS_MODE, phase_timings
+from .clients import get_boto3_client
+from .dynamodb import (
+    ITEM_SIZE_LIMIT,
+    MAX_BATCH_ATTEMPTS,
+    attribute_value_size,
+    backoff_delay,
+    batch_get_raw_items,
+    deserialize_item,
+    item_size,
+    serialize_value,
 )
+from .resultsformat import (
+    RESULTS_BLOB_ATTRIBUTE,
+    RESULTS_FORMAT_ATTRIBUTE,
+    RESULTS_VERSION_ATTRIBUTE,
+    compressed_format_enabled,
+    decode_context,
+    encode_context,
+    is_compressed_item,
+)
+from .vault import VAULT_TOKEN, fetch_from_vault, save_to_vault
+from .utils import convert_empty_strings_to_none, run_in_thread
 from .exceptions import SoclessException, SoclessBootstrapError
 from .aws_classes import LambdaContext
-from .legacy_jinja import legacy_jinja_env
 from jinja2.exceptions import TemplateSyntaxError, UndefinedError
-from .paramresolver import ParameterResolver
+from .paramresolver import ParameterResolver, find_context_references
+
+
+# State results larger than this many bytes are saved to the vault and only a
+# pointer is kept in the results table item. 0 (the default) disables
+# offloading. Only enable it once every reader of the results table, including
+# integrations built on older socless versions, can rehydrate the pointers.
+RESULTS_OFFLOAD_THRESHOLD = int(
+    os.environ.get("SOCLESS_RESULTS_OFFLOAD_THRESHOLD", 0)
+)
+OFFLOADED_RESULT_KEY = "_socless_offloaded_result"
+OFFLOADED_RESULTS_VAULT_PREFIX = "offloaded_results/"
+
+# Set to "false" to always fetch the whole execution context in StateHandler
+PARTIAL_CONTEXT_FETCH = (
+    os.environ.get("SOCLESS_PARTIAL_CONTEXT_FETCH", "true").lower() != "false"
+)
+# fetch the whole context rather than build very long projection expressions
+MAX_PROJECTED_PATHS = 64
+
+ItemPath = Tuple[str, ...]
+
+
+def is_offloaded_result(value) -> bool:
+    return isinstance(value, dict) and OFFLOADED_RESULT_KEY in value
+
+
+def rehydrate_result(value):
+    """Load an offloaded state result back from the vault. Other values are returned as is."""
+    if not is_offloaded_result(value):
+        return value
+    vault_id = value[OFFLOADED_RESULT_KEY]
+    return json.loads(fetch_from_vault(vault_id[len(VAULT_TOKEN) :], content_only=True))
+
+
+class StateResults(dict):
+    """The `results` of an execution context.
+
+    State results that were offloaded to the vault are kept as pointers and only
+    fetched the first time they are accessed, so states that never read a large
+    result never pay for loading it.
+    """
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if is_offloaded_result(value):
+            value = rehydrate_result(value)
+            super().__setitem__(key, value)
+        return value
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __iter__(self):
+        # overriding __iter__ stops dict(results) and {**results} from copying
+        # the raw pointers, they go through keys() and __getitem__ instead
+        return iter(super().keys())
+
+    def rehydrate_all(self):
+        for key in list(super().keys()):
+            self[key]
+
+    def values(self):
+        self.rehydrate_all()
+        return super().values()
+
+    def items(self):
+        self.rehydrate_all()
+        return super().items()
+
+    def copy(self):
+        self.rehydrate_all()
+        return dict(super().items())
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            super().pop(key)
+            return value
+        return super().pop(key, *default)
+
+
+def build_context_projection(
+    context_paths: Sequence[Tuple[str, ...]]
+) -> Optional[List[ItemPath]]:
+    """Turn context paths into the results table item paths that cover them.
+
+    The context is stored under the item's `results` attribute. Paths into a
+    state's results stop at the state name, so offloaded results are fetched
+    whole and can be rehydrated. Overlapping paths are merged, since DynamoDB
+    rejects projections with overlapping paths.
+    Returns:
+        The item paths to project, or None if the whole item should be fetched
+    """
+    item_paths = []
+    for path in context_paths:
+        if path[0] == "results":
+            path = path[:2]
+        item_paths.append(("results",) + tuple(path))
+
+    return merge_projections([item_paths])
+
+
+def merge_projections(
+    projections: Sequence[Optional[Sequence[ItemPath]]],
+) -> Optional[List[ItemPath]]:
+    """Merge item path projections into one that covers all of them.
+
+    Returns:
+        The merged item paths, always including ("execution_id",), or None if
+        the whole item should be fetched
+    """
+    if any(projection is None for projection in projections):
+        return None
+    projection: List[ItemPath] = [("execution_id",)]
+    item_paths = {path for paths in projections for path in paths}
+    for path in sorted(item_paths, key=len):
+        if not any(path[: len(kept)] == kept for kept in projection):
+            projection.append(path)
+    if len(projection) > MAX_PROJECTED_PATHS:
+        return None
+    return projection
+
+
+def build_projection_arguments(projection: Optional[Sequence[ItemPath]]) -> dict:
+    """The ProjectionExpression request parameters that fetch `projection` from a results table item"""
+    if not projection:
+        return {}
+    # compressed items keep the whole context in one attribute
+    projection = list(projection) + [
+        (RESULTS_FORMAT_ATTRIBUTE,),
+        (RESULTS_BLOB_ATTRIBUTE,),
+    ]
+    attribute_names: Dict[str, str] = {}
+    expressions = []
+    for path in projection:
+        placeholders = []
+        for name in path:
+            if name not in attribute_names:
+                attribute_names[name] = f"#p{len(attribute_names)}"
+            placeholders.append(attribute_names[name])
+        expressions.append(".".join(placeholders))
+    return {
+        "ProjectionExpression": ", ".join(expressions),
+        "ExpressionAttributeNames": {
+            placeholder: name for name, placeholder in attribute_names.items()
+        },
+    }
+
+
+def decode_results_item(item: dict, projected: bool = False) -> dict:
+    """Turn a fetched results table item into the execution result object
+
+    Args:
+        item (dict): The deserialized item
+        projected (bool): Whether the item was fetched with a projection
+    """
+    if is_compressed_item(item):
+        blob = item.pop(RESULTS_BLOB_ATTRIBUTE)
+        item.pop(RESULTS_FORMAT_ATTRIBUTE)
+        item.pop(RESULTS_VERSION_ATTRIBUTE, None)
+        item["results"] = decode_context(blob)
+    if projected:
+        item.setdefault("results", {})
+    context = item.get("results")
+    if isinstance(context, dict) and isinstance(context.get("results"), dict):
+        context["results"] = StateResults(context["results"])
+    return item
+
+
+def fetch_contexts(
+    execution_ids: Sequence[str], projection: Optional[Sequence[ItemPath]] = None
+) -> Dict[str, dict]:
+    """Fetch several executions' contexts from the Execution Results table with BatchGetItem
+
+    Args:
+        execution_ids (list): The executions to fetch
+        projection (list): Item paths to fetch, see `ExecutionContext.fetch_context`
+    Returns:
+        The execution result objects that exist, by execution_id
+    """
+    return {
+        execution_id: decode_results_item(deserialize_item(raw_item), bool(projection))
+        for execution_id, raw_item in fetch_raw_results_items(
+            execution_ids, projection
+        ).items()
+    }
+
+
+def fetch_raw_results_items(
+    execution_ids: Sequence[str], projection: Optional[Sequence[ItemPath]] = None
+) -> Dict[str, dict]:
+    """Fetch several executions' results table items with BatchGetItem, without decoding them
+
+    Returns:
+        The items that exist in the low-level client format, by execution_id
+    """
+    keys = [
+        {"execution_id": {"S": execution_id}}
+        for execution_id in dict.fromkeys(execution_ids)
+    ]
+    items = batch_get_raw_items(
+        os.environ.get("SOCLESS_RESULTS_TABLE"),
+        keys,
+        ConsistentRead=True,
+        **build_projection_arguments(projection),
+    )
+    return {item["execution_id"]["S"]: item for item in items}
 
 
 class ExecutionContext:
@@ -35,68 +262,235 @@ class ExecutionContext:
     def __init__(self, execution_id):
         self.execution_id = execution_id
 
-    def fetch_context(self):
+    @property
+    def results_table_name(self) -> str:
+        return os.environ.get("SOCLESS_RESULTS_TABLE")
+
+    def get_item(self, **kwargs) -> dict:
+        """Read this execution's results table item with the low-level client.
+
+        Numbers are deserialized straight to int/float, skipping the boto3
+        resource layer's Decimals.
+        Raises:
+            Exception if the item does not exist
+        """
+        response = get_boto3_client("dynamodb").get_item(
+            TableName=self.results_table_name,
+            Key={"execution_id": {"S": self.execution_id}},
+            ConsistentRead=True,
+            **kwargs,
+        )
+        item = response.get("Item")
+        if not item:
+            raise Exception(
+                f"Error: Unable to get execution_id {self.execution_id} from {self.results_table_name}."
+            )
+        return deserialize_item(item)
+
+    def update_item(self, expression_attribute_values: dict, **kwargs):
+        get_boto3_client("dynamodb").update_item(
+            TableName=self.results_table_name,
+            Key={"execution_id": {"S": self.execution_id}},
+            ExpressionAttributeValues={
+                placeholder: serialize_value(value)
+                for placeholder, value in expression_attribute_values.items()
+            },
+            **kwargs,
+        )
+
+    def fetch_context(self, projection: Optional[Sequence[ItemPath]] = None):
         """Fetch execution context from the Execution Results table
 
         Args:
-            execution_id (str): The execution id for a playbook execution instance
+            projection (list): Item paths to fetch, e.g [("results", "artifacts")].
+                Must include ("execution_id",). Fetches the whole item by default
         Returns:
             dict: The execution result object
         """
-        RESULTS_TABLE = os.environ.get("SOCLESS_RESULTS_TABLE")
-        results_table = boto3.resource("dynamodb").Table(RESULTS_TABLE)
-        item_resp = results_table.get_item(
-            Key={"execution_id": self.execution_id}, ConsistentRead=True
-        )
+        item = self.get_item(**build_projection_arguments(projection))
+        return decode_results_item(item, bool(projection))
 
-        item = item_resp.get("Item", {})
-        if not item:
-            raise Exception(
-                f"Error: Unable to get execution_id {self.execution_id} from {RESULTS_TABLE}."
-            )
+    async def fetch_context_async(
+        self, projection: Optional[Sequence[ItemPath]] = None
+    ):
+        """Fetch execution context without blocking the event loop. See `fetch_context`"""
+        return await run_in_thread(self.fetch_context, projection)
 
-        return replace_decimals(item)
+    def fetch_item_size(self) -> dict:
+        """Report how close this execution's results table item is to DynamoDB's item size limit
+
+        Returns:
+            dict with the estimated `item_bytes`, the `limit_bytes` and their `ratio`
+        """
+        item_bytes = item_size(self.get_item())
+        return {
+            "item_bytes": item_bytes,
+            "limit_bytes": ITEM_SIZE_LIMIT,
+            "ratio": item_bytes / ITEM_SIZE_LIMIT,
+        }
+
+    def offload_result(self, state_name, result) -> Optional[dict]:
+        """Save a result to the vault if it is larger than RESULTS_OFFLOAD_THRESHOLD
+
+        Args:
+            state_name (str): The name of the state
+            result (obj): The result to save
+        Returns:
+            The pointer to store in place of the result, or None if the result is
+            small enough to store in the results table item
+        """
+        if not RESULTS_OFFLOAD_THRESHOLD:
+            return None
+        result_size = attribute_value_size(result)
+        if result_size <= RESULTS_OFFLOAD_THRESHOLD:
+            return None
+        saved = save_to_vault(
+            json.dumps(result),
+            prefix=f"{OFFLOADED_RESULTS_VAULT_PREFIX}{self.execution_id}/",
+        )
+        socless_log.info(
+            "Offloaded state result to the vault",
+            {
+                "execution_id": self.execution_id,
+                "state_name": state_name,
+                "size_bytes": result_size,
+                "vault_id": saved["vault_id"],
+            },
+        )
+        return {OFFLOADED_RESULT_KEY: saved["vault_id"], "size_bytes": result_size}
 
     def save_state_results(self, state_name, result, errors={}):
         """Save the results of a State's execution to the Execution results table
+
+        Results larger than RESULTS_OFFLOAD_THRESHOLD bytes are saved to the vault
+        and replaced by a pointer, which `fetch_context` resolves on access.
         Args:
             state_name (str): The name of the state
             result (obj): The result to save
         """
-        RESULTS_TABLE = os.environ.get("SOCLESS_RESULTS_TABLE")
-        results_table = boto3.resource("dynamodb").Table(RESULTS_TABLE)
-        result = replace_floats_with_decimals(result)
+        result = self.offload_result(state_name, result) or result
+        if errors:
+            # if Timeout, Error cause is empty string.
+            errors = convert_empty_strings_to_none(errors)
 
+        if compressed_format_enabled() and self.save_compressed_state_results(
+            state_name, result, errors
+        ):
+            return
+        try:
+            self.save_map_state_results(state_name, result, errors)
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            # the item is stored in the compressed format
+            self.save_compressed_state_results(state_name, result, errors)
+
+    async def save_state_results_async(self, state_name, result, errors={}):
+        """Save a State's results without blocking the event loop. See `save_state_results`"""
+        await run_in_thread(
+            self.save_state_results, state_name, result, errors=errors
+        )
+
+    def save_map_state_results(self, state_name, result, errors):
+        """Save a state's results to an item that stores the context as a map
+        Raises:
+            ClientError (ConditionalCheckFailedException) if the item is compressed
+        """
         error_expression = ""
         expression_attributes = {":r": result}
         if errors:
-            # if Timeout, Error cause is empty string.
-            errors = convert_empty_strings_to_none(errors)
             error_expression = ",#results.errors = :e"
             expression_attributes[":e"] = errors
 
-        results_table.update_item(
-            Key={"execution_id": self.execution_id},
+        self.update_item(
+            expression_attributes,
             UpdateExpression=f"SET #results.#results.#name = :r, #results.#results.#last_results = :r {error_expression}",
-            ExpressionAttributeValues=expression_attributes,
+            ConditionExpression="attribute_not_exists(#format)",
             ExpressionAttributeNames={
                 "#results": "results",
                 "#name": state_name,
                 "#last_results": "_Last_Saved_Results",
+                "#format": RESULTS_FORMAT_ATTRIBUTE,
             },
         )
 
+    def save_compressed_state_results(self, state_name, result, errors) -> bool:
+        """Save a state's results to an item that stores the context compressed.
+
+        The context is read, updated and written back, guarded by the item's
+        version counter so concurrent states (e.g in a Parallel) don't lose
+        each other's results.
+        Returns:
+            False, without saving, if the item stores the context as a map
+        Raises:
+            SoclessException if the item kept changing for MAX_BATCH_ATTEMPTS tries
+        """
+        attribute_names = {
+            "#id": "execution_id",
+            "#format": RESULTS_FORMAT_ATTRIBUTE,
+            "#blob": RESULTS_BLOB_ATTRIBUTE,
+            "#version": RESULTS_VERSION_ATTRIBUTE,
+        }
+        for attempt in range(MAX_BATCH_ATTEMPTS):
+            if attempt:
+                time.sleep(backoff_delay(attempt - 1))
+            item = self.get_item(
+                # the key is always projected, so existing items are never empty
+                ProjectionExpression="#id, #format, #blob, #version",
+                ExpressionAttributeNames=attribute_names,
+            )
+            if not is_compressed_item(item):
+                return False
+
+            context = decode_context(item[RESULTS_BLOB_ATTRIBUTE])
+            state_results = context.setdefault("results", {})
+            state_results[state_name] = result
+            state_results["_Last_Saved_Results"] = result
+            if errors:
+                context["errors"] = errors
+            version = item.get(RESULTS_VERSION_ATTRIBUTE, 0)
+            try:
+                self.update_item(
+                    {
+                        ":blob": encode_context(context),
+                        ":version": version,
+                        ":next_version": version + 1,
+                    },
+                    UpdateExpression="SET #blob = :blob, #version = :next_version",
+                    ConditionExpression="#version = :version",
+                    ExpressionAttributeNames={
+                        "#blob": RESULTS_BLOB_ATTRIBUTE,
+                        "#version": RESULTS_VERSION_ATTRIBUTE,
+                    },
+                )
+                return True
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+        raise SoclessException(
+            f"Results for execution_id {self.execution_id} changed concurrently on {MAX_BATCH_ATTEMPTS} save attempts"
+        )
+
 
 class StateHandler:
     """Controls the execution of an integration for a given state in a Playbook"""
 
-    def __init__(self, event, lambda_context, integration_handler, include_event=False):
+    def __init__(
+        self,
+        event,
+        lambda_context,
+        integration_handler,
+        include_event=False,
+        fetch_context=True,
+    ):
         """
         Args:
             event (dict): The input passed to the Lambda function by the service that triggered it
             lambda_context (obj): The Lambda context object
             integration_handler (func): The function that implements the integrations business logic
             include_playbook_context (bool): Set to `True` to make the full context object of the executing playbook available to the integration
+            fetch_context (bool): Set to `False` to leave fetching the context
+                to the caller, who must pass it to `use_fetched_item`
         """
         # TODO: Figure out how to handle include_event
         if "task_token" in event:
@@ -134,23 +528,30 @@ from outside of a SOCless playbook. Running this lambda in test mode."
         except KeyError:
             raise SoclessBootstrapError("`Name` not set in State_Config")
 
+        socless_log.start_invocation(
+            execution_id=self.execution_id, state_name=self.state_name
+        )
+        phase_timings.reset()
+
         try:
             self.state_parameters = self.state_config["Parameters"]
         except KeyError:
             raise SoclessBootstrapError("`Parameters` not set in State_Config")
 
+        self._context_is_partial = False
+        self.projection: Optional[List[ItemPath]] = None
         if self.testing:
-            self.context = self.event
+            self._context = self.event
         else:
             if self.execution_id:
                 self.execution_context = ExecutionContext(self.execution_id)
-                self.context = self.execution_context.fetch_context()["results"]
-                self.context["execution_id"] = self.execution_id
-                if "errors" in self.event:
-                    self.context["errors"] = self.event["errors"]
-                if self.task_token:
-                    self.context["task_token"] = self.task_token
-                    self.context["state_name"] = self.state_name
+                self.projection = self.context_projection(include_event)
+                if fetch_context:
+                    with phase_timings.phase("fetch_context"), metrics.timer(
+                        "ContextFetchTime"
+                    ):
+                        self._context = self.load_context(self.projection)
+                    self._context_is_partial = self.projection is not None
             else:
                 raise SoclessBootstrapError(
                     "Execution id not found in non-testing context"
@@ -160,29 +561,132 @@ from outside of a SOCless playbook. Running this lambda in test mode."
         self.include_event = include_event
         # TODO: Find a way to maintain the execution_id between lambdas
 
+    @property
+    def context(self) -> dict:
+        """The playbook execution context.
+
+        If only the parts the state's parameters read were fetched, the rest is
+        fetched the first time the full context is accessed.
+        """
+        if self._context_is_partial:
+            self._context = self.load_context(None)
+            self._context_is_partial = False
+        return self._context
+
+    def load_context(self, projection: Optional[List[ItemPath]]) -> dict:
+        return self.context_from_item(self.execution_context.fetch_context(projection))
+
+    def use_fetched_item(self, item: dict, projection: Optional[List[ItemPath]]):
+        """Use a results table item fetched by the caller, see `fetch_context`
+
+        Args:
+            item (dict): The execution result object
+            projection (list): The item paths it was fetched with, which must
+                cover `self.projection`. None if the whole item was fetched
+        """
+        # items can be shared by several states of the same execution
+        item = {**item, "results": dict(item["results"])}
+        self._context = self.context_from_item(item)
+        self._context_is_partial = projection is not None
+
+    def context_from_item(self, item: dict) -> dict:
+        context = item["results"]
+        context["execution_id"] = self.execution_id
+        if "errors" in self.event:
+            context["errors"] = self.event["errors"]
+        if self.task_token:
+            context["task_token"] = self.task_token
+            context["state_name"] = self.state_name
+        return context
+
+    def context_projection(self, include_event: bool) -> Optional[List[ItemPath]]:
+        """The results table item paths this state's parameters read.
+
+        Returns None, meaning fetch the whole context, when the integration
+        receives the context (`include_event`) or a parameter reads it dynamically.
+        """
+        if include_event or not PARTIAL_CONTEXT_FETCH:
+            return None
+        context_paths = find_context_references(self.state_parameters)
+        if context_paths is None:
+            return None
+        # errors are saved back with the state's results, see `execute`
+        return build_context_projection(context_paths + [("errors",)])
+
     def execute(self):
         """Execute the integration to fulfil the assigned state"""
+        try:
+            return self._execute()
+        finally:
+            metrics.flush()
 
-        resolver = ParameterResolver(self.context)
-        actual_params = resolver.resolve_parameters(self.state_parameters)
+    async def execute_async(self):
+        """Execute a coroutine integration handler to fulfil the assigned state.
 
-        if self.include_event:
-            result = self.integration_handler(self.context, **actual_params)
-        else:
-            result = self.integration_handler(**actual_params)
+        Blocking work (parameter resolution, saving results) runs on the event
+        loop's default thread pool.
+        """
+        try:
+            return await self._execute_async()
+        finally:
+            metrics.flush()
 
-        if not isinstance(result, dict):
-            raise SoclessBootstrapError(
-                "Result returned from the integration handler is not a Python dictionary. Must be a Python dictionary"
-            )
+    def _execute(self):
+        with phase_timings.phase("resolve_parameters"), metrics.timer(
+            "ResolveTime"
+        ):
+            actual_params = self.resolve_parameters()
+
+        with phase_timings.phase("handler"), metrics.timer("HandlerTime"):
+            result = self.integration_handler(*self.handler_args(), **actual_params)
 
+        self.check_result(result)
         if not self.testing:
-            self.execution_context.save_state_results(
-                self.state_name, result, errors=self.context.get("errors", {})
-            )
+            with phase_timings.phase("save_state_results"), metrics.timer(
+                "SaveTime"
+            ):
+                self.execution_context.save_state_results(
+                    self.state_name, result, errors=self._context.get("errors", {})
+                )
+
+        return result
+
+    async def _execute_async(self):
+        with phase_timings.phase("resolve_parameters"), metrics.timer(
+            "ResolveTime"
+        ):
+            actual_params = await run_in_thread(self.resolve_parameters)
+
+        with phase_timings.phase("handler"), metrics.timer("HandlerTime"):
+            handler_args = await run_in_thread(self.handler_args)
+            result = await self.integration_handler(*handler_args, **actual_params)
+
+        self.check_result(result)
+        if not self.testing:
+            with phase_timings.phase("save_state_results"), metrics.timer(
+                "SaveTime"
+            ):
+                await self.execution_context.save_state_results_async(
+                    self.state_name, result, errors=self._context.get("errors", {})
+                )
 
         return result
 
+    def resolve_parameters(self) -> dict:
+        # the partial context covers everything the parameters read
+        resolver = ParameterResolver(self._context)
+        return resolver.resolve_parameters(self.state_parameters)
+
+    def handler_args(self) -> tuple:
+        """The positional arguments for the integration handler"""
+        return (self.context,) if self.include_event else ()
+
+    def check_result(self, result):
+        if not isinstance(result, dict):
+            raise SoclessBootstrapError(
+                "Result returned from the integration handler is not a Python dictionary. Must be a Python dictionary"
+            )
+
 
 def socless_bootstrap(
     event: dict, context: LambdaContext, handler: Callable, include_event=False
@@ -197,15 +701,264 @@ def socless_bootstrap(
             to the handler
     Returns:
         Dict containing the result of executing the integration
+
+    A coroutine function handler (`async def`) is run to completion on a new
+    event loop, see `socless_bootstrap_async`.
+    """
+    if inspect.iscoroutinefunction(handler):
+        return asyncio.run(
+            socless_bootstrap_async(event, context, handler, include_event)
+        )
+    if not phase_timings.enabled:
+        return _socless_bootstrap(event, context, handler, include_event)
+
+    start = time.perf_counter()
+    try:
+        event = _socless_bootstrap(event, context, handler, include_event)
+    finally:
+        timings = report_phase_timings(start)
+    if TIMINGS_MODE == "event":
+        event[EVENT_TIMINGS_KEY] = timings
+    return event
+
+
+async def socless_bootstrap_async(
+    event: dict, context: LambdaContext, handler: Callable, include_event=False
+):
+    """Setup and run an integration whose business logic is a coroutine function
+
+    Use this directly from code that already runs an event loop, otherwise
+    `socless_bootstrap` runs it for you.
+    Args:
+        event (dict): The Lambda event object
+        context (obj): The Lambda context object
+        handler (coroutine function): The handler for the integration
+        include_event (bool): Indicates whether to make the full event object available
+            to the handler
+    Returns:
+        Dict containing the result of executing the integration
     """
+    if not phase_timings.enabled:
+        return await _socless_bootstrap_async(event, context, handler, include_event)
 
+    start = time.perf_counter()
+    try:
+        event = await _socless_bootstrap_async(event, context, handler, include_event)
+    finally:
+        timings = report_phase_timings(start)
+    if TIMINGS_MODE == "event":
+        event[EVENT_TIMINGS_KEY] = timings
+    return event
+
+
+def socless_bootstrap_batch(
+    events: List[dict],
+    context: LambdaContext,
+    handler: Callable,
+    include_event=False,
+    max_workers=1,
+) -> List[dict]:
+    """Setup and run an integration's business logic for a batch of events
+
+    Each event is handled as `socless_bootstrap` would, but the contexts of all
+    the events are fetched together with BatchGetItem. An event that fails does
+    not fail the rest of the batch.
+    Args:
+        events (list): The SOCless events, e.g one per Map state iteration or SQS message
+        context (obj): The Lambda context object
+        handler (func): The handler for the integration, may be a coroutine function
+        include_event (bool): Indicates whether to make the full event object available
+            to the handler
+        max_workers (int): How many events to handle at once
+    Returns:
+        A list with an entry per event, in order. Either
+        {"status": "SUCCEEDED", "event": <the event with its results>} or
+        {"status": "FAILED", "error": {"Error": <exception type>, "Cause": <message>}}
+    """
+    outcomes: List[Optional[dict]] = [None] * len(events)
+    state_handlers: Dict[int, StateHandler] = {}
+    for index, event in enumerate(events):
+        # StateHandler binds each event's fields to the log; don't let an event
+        # that fails before binding its own be logged with the previous one's
+        socless_log.unbind("execution_id", "state_name")
+        try:
+            state_handlers[index] = StateHandler(
+                event, context, handler, include_event, fetch_context=False
+            )
+        except Exception as e:
+            outcomes[index] = batch_failure(e)
+
+    # the batch fetch is for every event, not the last one built
+    socless_log.unbind("execution_id", "state_name")
+    try:
+        fetch_batch_contexts(state_handlers, outcomes)
+        if inspect.iscoroutinefunction(handler):
+            asyncio.run(
+                _execute_batch_async(events, state_handlers, outcomes, max_workers)
+            )
+        else:
+            _execute_batch(events, state_handlers, outcomes, max_workers)
+    finally:
+        socless_log.unbind("execution_id", "state_name")
+        metrics.put("BatchSize", len(events))
+        metrics.put(
+            "BatchFailures",
+            sum(1 for outcome in outcomes if outcome and outcome["status"] == "FAILED"),
+        )
+        metrics.flush()
+    return outcomes
+
+
+def batch_failure(error: Exception) -> dict:
+    socless_log.error("Batch item failed", {"error": f"{error}"})
+    return {
+        "status": "FAILED",
+        "error": {"Error": type(error).__name__, "Cause": f"{error}"},
+    }
+
+
+def fetch_batch_contexts(
+    state_handlers: Dict[int, StateHandler], outcomes: List[Optional[dict]]
+):
+    """Fetch the contexts of a batch's live events with one BatchGetItem per 100 keys.
+
+    Records a failure for each event whose context can't be fetched.
+    """
+    live_handlers = {
+        index: state_handler
+        for index, state_handler in state_handlers.items()
+        if not state_handler.testing
+    }
+    if not live_handlers:
+        return
+    projection = merge_projections(
+        [state_handler.projection for state_handler in live_handlers.values()]
+    )
+    try:
+        with phase_timings.phase("fetch_context"), metrics.timer(
+            "ContextFetchTime"
+        ):
+            raw_items = fetch_raw_results_items(
+                [handler.execution_id for handler in live_handlers.values()],
+                projection,
+            )
+    except Exception as e:
+        for index in live_handlers:
+            outcomes[index] = batch_failure(e)
+            del state_handlers[index]
+        return
+
+    # each item is decoded once, however many events share it
+    decoded: Dict[str, dict] = {}
+    for index, state_handler in live_handlers.items():
+        execution_id = state_handler.execution_id
+        try:
+            if execution_id not in decoded:
+                raw_item = raw_items.get(execution_id)
+                if raw_item is None:
+                    raise SoclessBootstrapError(
+                        f"Unable to get execution_id {execution_id} from {os.environ.get('SOCLESS_RESULTS_TABLE')}"
+                    )
+                decoded[execution_id] = decode_results_item(
+                    deserialize_item(raw_item), bool(projection)
+                )
+            state_handler.use_fetched_item(decoded[execution_id], projection)
+        except Exception as e:
+            outcomes[index] = batch_failure(e)
+            del state_handlers[index]
+
+
+def _execute_batch(
+    events: List[dict],
+    state_handlers: Dict[int, StateHandler],
+    outcomes: List[Optional[dict]],
+    max_workers: int,
+):
+    def execute(index: int):
+        state_handler = state_handlers[index]
+        if max_workers == 1:
+            socless_log.bind(
+                execution_id=state_handler.execution_id,
+                state_name=state_handler.state_name,
+            )
+        try:
+            result = state_handler._execute()
+        except Exception as e:
+            outcomes[index] = batch_failure(e)
+            return
+        outcomes[index] = {
+            "status": "SUCCEEDED",
+            "event": add_results_to_event(
+                events[index], state_handler.state_name, result
+            ),
+        }
+
+    if max_workers > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(execute, state_handlers))
+    else:
+        for index in state_handlers:
+            execute(index)
+
+
+async def _execute_batch_async(
+    events: List[dict],
+    state_handlers: Dict[int, StateHandler],
+    outcomes: List[Optional[dict]],
+    max_workers: int,
+):
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def execute(index: int):
+        state_handler = state_handlers[index]
+        async with semaphore:
+            try:
+                result = await state_handler._execute_async()
+            except Exception as e:
+                outcomes[index] = batch_failure(e)
+                return
+        outcomes[index] = {
+            "status": "SUCCEEDED",
+            "event": add_results_to_event(
+                events[index], state_handler.state_name, result
+            ),
+        }
+
+    await asyncio.gather(*(execute(index) for index in state_handlers))
+
+
+def report_phase_timings(start: float) -> dict:
+    phase_timings.record("total", (time.perf_counter() - start) * 1000)
+    timings = phase_timings.as_dict()
+    socless_log.info("Integration phase timings", {"timings": timings})
+    return timings
+
+
+def _socless_bootstrap(
+    event: dict, context: LambdaContext, handler: Callable, include_event=False
+):
     state_handler = StateHandler(event, context, handler, include_event=include_event)
     result = state_handler.execute()
+    return add_results_to_event(event, state_handler.state_name, result)
+
+
+async def _socless_bootstrap_async(
+    event: dict, context: LambdaContext, handler: Callable, include_event=False
+):
+    # StateHandler fetches the execution context as it's created
+    state_handler = await run_in_thread(
+        StateHandler, event, context, handler, include_event=include_event
+    )
+    result = await state_handler.execute_async()
+    return add_results_to_event(event, state_handler.state_name, result)
+
+
+def add_results_to_event(event: dict, state_name: str, result: dict) -> dict:
     # README: Below code includes state_name with result so that parameters can be passed to choice state in the same way
     # they are passed to integrations (i.e. with $.results.State_Name.parameters)
     # However, maintain current status quo so that Choice states in current playbooks don't break
     # TODO: Once Choice states in current playbooks have been updated to the new_style, update this code so result's are only nested under state_name
-    result_with_state_name = {state_handler.state_name: result}
+    result_with_state_name = {state_name: result}
     result_with_state_name.update(result)
     event["results"] = result_with_state_name
     return event
@@ -219,5 +972,8 @@ def socless_template_string(message, context):
     Returns:
         str: The rendered template
     """
+    # imported here so integrations that don't use the legacy syntax never load it
+    from .legacy_jinja import legacy_jinja_env
+
     template = legacy_jinja_env.from_string(message)
     return template.render(context=context).replace("&#34;", '"').replace("&#39;", "'")
@@ -15,19 +15,217 @@
 Code for Jinja2 which Socless uses for templating strings
 """
 from socless.exceptions import SoclessBootstrapError
-from typing import Any, Union
+from typing import Any, Optional, Union
 from datetime import datetime, timedelta
-from pytz import UnknownTimeZoneError, timezone
-import json, os
-from jinja2.nativetypes import NativeEnvironment
-from jinja2 import select_autoescape, StrictUndefined
+from functools import lru_cache
+from itertools import chain, islice
+from types import GeneratorType
+from ast import literal_eval, parse
+from contextvars import ContextVar
+from hashlib import sha256
+from importlib.util import find_spec
+import importlib, json, os, time, jinja2
+from jinja2.nativetypes import NativeEnvironment, NativeTemplate
+from jinja2 import (
+    ModuleLoader,
+    nodes,
+    select_autoescape,
+    StrictUndefined,
+    Template,
+    TemplateNotFound,
+)
 from .vault import fetch_from_vault
 from .ssm import fetch_from_ssm
 
 
+# Set SOCLESS_JINJA_LITERAL_COERCION to "false" to keep rendered strings as
+# strings instead of converting literal-looking ones, e.g "123" -> 123
+COERCE_LITERALS = (
+    os.environ.get("SOCLESS_JINJA_LITERAL_COERCION", "true").lower() != "false"
+)
+# Rendered strings longer than this are never converted to literals
+LITERAL_MAX_LENGTH = int(
+    os.environ.get("SOCLESS_JINJA_LITERAL_MAX_LENGTH", 64 * 1024)
+)
+# The first character of anything ast.literal_eval accepts
+LITERAL_FIRST_CHARACTERS = frozenset("0123456789+-.'\"([{TFNbBrRuU")
+
+# Limits on the work rendering one template may do, see `RenderBudget`.
+# 0 disables a limit
+RENDER_TIME_LIMIT_SECONDS = float(
+    os.environ.get("SOCLESS_TEMPLATE_TIME_LIMIT_SECONDS", 10)
+)
+RENDER_LOOP_LIMIT = int(os.environ.get("SOCLESS_TEMPLATE_LOOP_LIMIT", 100_000))
+RENDER_OUTPUT_LIMIT = int(
+    os.environ.get("SOCLESS_TEMPLATE_OUTPUT_LIMIT", 8 * 1024 * 1024)
+)
+# every `for` loop's iterable is passed through this filter, see `_parse`
+LOOP_BUDGET_FILTER = "_socless_loop_budget"
+
+
+class RenderBudget:
+    """The limits on one template render, and how much of them it has used.
+
+    Time is checked at every loop iteration and every piece of output, so a
+    single slow function call can still overrun the time limit.
+    Raises:
+        SoclessBootstrapError when a limit is exceeded
+    """
+
+    def __init__(self, time_limit: float, loop_limit: int, output_limit: int):
+        self.time_limit = time_limit
+        self.deadline = time.monotonic() + time_limit if time_limit else None
+        self.loop_limit = loop_limit
+        self.output_limit = output_limit
+        self.iterations = 0
+        self.output_size = 0
+
+    def check_time(self):
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise SoclessBootstrapError(
+                f"Template rendering exceeded its time limit of {self.time_limit} seconds"
+            )
+
+    def track_iterations(self, iterable):
+        for item in iterable:
+            self.iterations += 1
+            if self.loop_limit and self.iterations > self.loop_limit:
+                raise SoclessBootstrapError(
+                    f"Template rendering exceeded its limit of {self.loop_limit} loop iterations"
+                )
+            self.check_time()
+            yield item
+
+    def track_output(self, chunks):
+        """Count the string output of `chunks` against the output limit.
+
+        A template that outputs a single value passes it through as-is, so the
+        limit only applies once there is a second chunk to concatenate.
+        """
+        for count, chunk in enumerate(chunks, 1):
+            if isinstance(chunk, str):
+                self.output_size += len(chunk)
+            if (
+                count > 1
+                and self.output_limit
+                and self.output_size > self.output_limit
+            ):
+                raise SoclessBootstrapError(
+                    f"Template rendering exceeded its output limit of {self.output_limit} characters"
+                )
+            self.check_time()
+            yield chunk
+
+
+# the budget of the render in progress
+_render_budget = ContextVar("socless_render_budget", default=None)
+
+
+def loop_budget(iterable):
+    budget = _render_budget.get()
+    return iterable if budget is None else budget.track_iterations(iterable)
+
+
+class SoclessNativeEnvironment(NativeEnvironment):
+    """A NativeEnvironment that converts rendered strings to literals more cheaply.
+
+    A template that outputs a single value returns that object. Rendered
+    strings are converted to the literal they spell, like NativeEnvironment
+    does, unless conversion is turned off (`coerce_literals`), the string is
+    longer than `literal_max_length` or it can't possibly be a literal.
+
+    Unlike NativeEnvironment, a string that starts with a line break or a
+    comment is never converted, e.g "\\n123" stays a string instead of 123.
+    """
+
+    def __init__(
+        self,
+        *args,
+        coerce_literals: bool = COERCE_LITERALS,
+        literal_max_length: int = LITERAL_MAX_LENGTH,
+        render_time_limit: float = RENDER_TIME_LIMIT_SECONDS,
+        render_loop_limit: int = RENDER_LOOP_LIMIT,
+        render_output_limit: int = RENDER_OUTPUT_LIMIT,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.coerce_literals = coerce_literals
+        self.literal_max_length = literal_max_length
+        self.render_time_limit = render_time_limit
+        self.render_loop_limit = render_loop_limit
+        self.render_output_limit = render_output_limit
+        self.filters[LOOP_BUDGET_FILTER] = loop_budget
+
+    def _parse(self, source, name, filename):
+        template_ast = super()._parse(source, name, filename)
+        # count loop iterations against the render's budget
+        for loop in template_ast.find_all(nodes.For):
+            loop.iter = nodes.Filter(
+                loop.iter, LOOP_BUDGET_FILTER, [], [], None, None, lineno=loop.lineno
+            )
+        return template_ast
+
+    def new_render_budget(self) -> RenderBudget:
+        return RenderBudget(
+            self.render_time_limit, self.render_loop_limit, self.render_output_limit
+        )
+
+    def concat(self, values):
+        head = list(islice(values, 2))
+        if not head:
+            return None
+        if len(head) == 1:
+            raw = head[0]
+            if not isinstance(raw, str):
+                return raw
+        else:
+            if isinstance(values, GeneratorType):
+                values = chain(head, values)
+            raw = "".join([str(value) for value in values])
+        return self.to_native(raw)
+
+    def to_native(self, raw: str) -> Any:
+        """Convert a rendered string to the Python literal it spells, if any"""
+        if (
+            not self.coerce_literals
+            or not raw
+            or raw[0] not in LITERAL_FIRST_CHARACTERS
+            or len(raw) > self.literal_max_length
+        ):
+            return raw
+        try:
+            # literal_eval strips leading spaces and tabs from a string, parsed
+            # source keeps them, so " 123" stays a string like jinja2.nativetypes
+            return literal_eval(parse(raw, mode="eval"))
+        except (ValueError, SyntaxError, MemoryError):
+            return raw
+
+
+class SoclessNativeTemplate(NativeTemplate):
+    environment_class = SoclessNativeEnvironment
+
+    def render(self, *args, **kwargs) -> Any:
+        # NativeTemplate concatenates with the class's concat, this uses the
+        # environment's so its settings apply
+        ctx = self.new_context(dict(*args, **kwargs))
+        budget = self.environment.new_render_budget()
+        token = _render_budget.set(budget)
+        try:
+            return self.environment.concat(
+                budget.track_output(self.root_render_func(ctx))
+            )
+        except Exception:
+            return self.environment.handle_exception()
+        finally:
+            _render_budget.reset(token)
+
+
+SoclessNativeEnvironment.template_class = SoclessNativeTemplate
+
+
 # Jinja Environment Configuration
 #! this fails to escape <script>, escaping works with Environment
-jinja_env = NativeEnvironment(
+jinja_env = SoclessNativeEnvironment(
     autoescape=select_autoescape(
         ["html", "xml"], default_for_string=True, default=True
     ),
@@ -71,10 +269,11 @@ def fromjson(string_json: str) -> Any:
 
 def secret(secret_path: str) -> str:
     """Custom Jinja function/filter that fetches a secret from SSM Parameter Store.
+    Values are cached in-process for SOCLESS_SECRET_CACHE_TTL seconds (default 300).
     Args:
         secret_path: "/socless/slack/bot_token"
     """
-    return fetch_from_ssm(secret_path)
+    return fetch_from_ssm(secret_path, use_cache=True)
 
 
 def env(env_var_name: str) -> str:
@@ -104,6 +303,8 @@ def fromtimestamp(timestamp: Union[int, str], tz: str = "UTC") -> str:
     Return:
         An ISO8601 datetime string without microseconds
     """
+    from pytz import UnknownTimeZoneError, timezone
+
     try:
         timestamp = int(timestamp)
     except ValueError as e:
@@ -138,6 +339,8 @@ def datetime_from_now(
     Return:
         An ISO8601 datetime string without microseconds
     """
+    from pytz import UnknownTimeZoneError, timezone
+
     try:
         tzinfo = timezone(tz)
     except UnknownTimeZoneError as e:
@@ -174,6 +377,75 @@ jinja_env.filters.update(custom_filters)
 jinja_env.globals.update(custom_functions)
 
 
+# Strings without any of these can't contain Jinja syntax
+JINJA_MARKERS = ("{{", "{%", "{#")
+
+
+def native_literal(raw: str) -> Any:
+    """Convert a string to the Python literal it spells, the way `jinja_env` does.
+    e.g "123" -> 123, "[1, 2]" -> [1, 2], "hello" -> "hello"
+    """
+    return jinja_env.to_native(raw)
+
+
+# The package of templates compiled by `python -m socless.precompile`, looked
+# up on the import path. "" disables precompiled templates
+PRECOMPILED_TEMPLATES_PACKAGE = os.environ.get(
+    "SOCLESS_PRECOMPILED_TEMPLATES", "socless_precompiled_templates"
+)
+
+
+def template_hash(template_string: str) -> str:
+    """The name a template is precompiled under"""
+    return sha256(template_string.encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def get_precompiled_templates_loader(package_name: str) -> Optional[ModuleLoader]:
+    """A loader for a package of precompiled templates, or None if there's no usable package.
+
+    Templates compiled with a different Jinja version are ignored, since the
+    compiled code depends on Jinja's runtime.
+    """
+    if not package_name:
+        return None
+    try:
+        spec = find_spec(package_name)
+    except (ImportError, ValueError):
+        return None
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    package = importlib.import_module(package_name)
+    if getattr(package, "JINJA_VERSION", None) != jinja2.__version__:
+        return None
+    return ModuleLoader(list(spec.submodule_search_locations))
+
+
+@lru_cache(maxsize=int(os.environ.get("SOCLESS_TEMPLATE_CACHE_SIZE", 512)))
+def get_compiled_template(template_string: str) -> Template:
+    """Compile a template string once and reuse the compiled Template afterwards.
+
+    Templates precompiled by `python -m socless.precompile` are loaded instead
+    of being compiled.
+    """
+    loader = get_precompiled_templates_loader(PRECOMPILED_TEMPLATES_PACKAGE)
+    if loader is not None:
+        try:
+            return loader.load(jinja_env, template_hash(template_string))
+        except TemplateNotFound:
+            pass
+    return jinja_env.from_string(template_string)
+
+
 def render_jinja_from_string(template_string: str, root_object: dict) -> Any:
-    template_obj = jinja_env.from_string(template_string)
+    if "\r" not in template_string and not any(
+        marker in template_string for marker in JINJA_MARKERS
+    ):
+        # Plain text renders to itself, so skip Jinja entirely. Mirror the two
+        # things Jinja would still do: drop a single trailing newline and
+        # convert literal-looking text to native types
+        raw = template_string[:-1] if template_string.endswith("\n") else template_string
+        return native_literal(raw) if raw else None
+
+    template_obj = get_compiled_template(template_string)
     return template_obj.render(context=root_object)
@@ -0,0 +1,184 @@
+# Copyright 2018 Twilio, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+"""
+A small compiled JsonPath evaluator for legacy `$.` parameter references.
+
+Supported syntax:
+    $.key.nested_key        dict keys (and list indexes, e.g `$.items.0`)
+    $['key'] / $["key"]     quoted dict keys
+    $.list[0] / $.list[-1]  list indexes
+    $.list[1:3] / $.list[::2]  list slices
+    $.dict.* / $.list[*]    wildcards
+
+Selecting with a wildcard or a slice yields a list, and later steps are applied
+to every selected element, skipping the elements they don't match.
+"""
+import re
+from functools import lru_cache
+from typing import Any, List, Tuple
+
+__all__ = ["JsonPath", "compile_jsonpath"]
+
+ROOT_TOKEN = "$"
+
+_NAME = re.compile(r"[\w-]+")
+_BRACKET = re.compile(
+    r"""\[\s*(?:
+        (?P<wildcard>\*)
+        |'(?P<single_quoted>[^']*)'
+        |"(?P<double_quoted>[^"]*)"
+        |(?P<slice>-?\d*\s*:\s*-?\d*(?:\s*:\s*-?\d*)?)
+        |(?P<index>-?\d+)
+    )\s*\]""",
+    re.VERBOSE,
+)
+
+# step kinds
+KEY, INDEX, SLICE, WILDCARD = "key", "index", "slice", "wildcard"
+
+Step = Tuple[str, Any]
+
+
+class JsonPath:
+    """A compiled JsonPath expression. Build with `compile_jsonpath`."""
+
+    def __init__(self, path: str, steps: List[Step]):
+        self.path = path
+        self.steps = tuple(steps)
+        self.is_multi = any(kind in (SLICE, WILDCARD) for kind, _ in self.steps)
+
+    def __repr__(self):
+        return f"JsonPath({self.path!r})"
+
+    def evaluate(self, root: Any) -> Any:
+        """Evaluate the path against `root`.
+
+        Returns:
+            The selected value, or a list of values if the path contains a
+            wildcard or slice
+        Raises:
+            LookupError (KeyError, IndexError) if a single-valued path does not exist
+        """
+        if not self.is_multi:
+            value = root
+            for kind, arg in self.steps:
+                value = _select_one(value, kind, arg)
+            return value
+
+        values = [root]
+        for kind, arg in self.steps:
+            selected = []
+            for value in values:
+                if kind in (SLICE, WILDCARD):
+                    selected.extend(_select_many(value, kind, arg))
+                    continue
+                try:
+                    selected.append(_select_one(value, kind, arg))
+                except LookupError:
+                    pass
+            values = selected
+        return values
+
+
+def _select_one(value: Any, kind: str, arg: Any) -> Any:
+    if kind == KEY:
+        if isinstance(value, dict):
+            if arg in value:
+                return value[arg]
+            raise KeyError(arg)
+        if isinstance(value, list) and _is_int(arg):
+            return _index(value, int(arg))
+        raise KeyError(arg)
+    # INDEX
+    if isinstance(value, list):
+        return _index(value, arg)
+    raise IndexError(arg)
+
+
+def _select_many(value: Any, kind: str, arg: Any) -> list:
+    if kind == WILDCARD:
+        if isinstance(value, dict):
+            return list(value.values())
+        if isinstance(value, list):
+            return list(value)
+        return []
+    # SLICE
+    return value[arg] if isinstance(value, list) else []
+
+
+def _index(value: list, index: int) -> Any:
+    try:
+        return value[index]
+    except IndexError:
+        raise IndexError(index) from None
+
+
+def _is_int(text: str) -> bool:
+    return text.lstrip("-").isdigit()
+
+
+def _parse_slice(text: str) -> slice:
+    parts = [part.strip() for part in text.split(":")]
+    return slice(*(int(part) if part else None for part in parts))
+
+
+@lru_cache(maxsize=1024)
+def compile_jsonpath(path: str) -> JsonPath:
+    """Compile a JsonPath expression such as `$.artifacts.event.details`.
+
+    Compiled paths are cached, so repeated references are only parsed once.
+    Raises:
+        ValueError if the expression uses syntax this evaluator doesn't support
+    """
+    if not path.startswith(ROOT_TOKEN):
+        raise ValueError(f"JsonPath must start with '{ROOT_TOKEN}': {path}")
+
+    steps: List[Step] = []
+    position = len(ROOT_TOKEN)
+    # `$.` on its own selects the root object
+    if path == ROOT_TOKEN + ".":
+        return JsonPath(path, steps)
+
+    while position < len(path):
+        char = path[position]
+        if char == ".":
+            position += 1
+            if path.startswith("*", position):
+                steps.append((WILDCARD, None))
+                position += 1
+                continue
+            match = _NAME.match(path, position)
+            if not match:
+                raise ValueError(f"Invalid JsonPath {path} at position {position}")
+            steps.append((KEY, match.group()))
+            position = match.end()
+        elif char == "[":
+            match = _BRACKET.match(path, position)
+            if not match:
+                raise ValueError(f"Invalid JsonPath {path} at position {position}")
+            if match.group("wildcard"):
+                steps.append((WILDCARD, None))
+            elif match.group("single_quoted") is not None:
+                steps.append((KEY, match.group("single_quoted")))
+            elif match.group("double_quoted") is not None:
+                steps.append((KEY, match.group("double_quoted")))
+            elif match.group("slice"):
+                steps.append((SLICE, _parse_slice(match.group("slice"))))
+            else:
+                steps.append((INDEX, int(match.group("index"))))
+            position = match.end()
+        else:
+            raise ValueError(f"Invalid JsonPath {path} at position {position}")
+
+    return JsonPath(path, steps)
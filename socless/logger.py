@@ -13,9 +13,61 @@
 # limitations under the License
 """
 Logging library
+
+Log lines are JSON objects with a `context` and a `body`:
+    {"context": {"time": ..., "aws_region": ..., "level": ..., "lineno": ...},
+     "body": {"message": ..., "extra": {...}}}
+
+Configuration (environment variables, read at import):
+    SOCLESS_LOG_LEVEL: lowest level written, DEBUG by default
+    SOCLESS_LOG_LINENO: set to "false" to skip looking up the caller's line number
+    SOCLESS_LOG_DEBUG_SAMPLE_RATE: fraction of invocations that write DEBUG logs
+    SOCLESS_LOG_MAX_EXTRA_BYTES: `extra` payloads larger than this are truncated
 """
 from datetime import datetime
-import os, inspect, simplejson as json
+import os, random, sys, simplejson as json
+
+LEVEL_THRESHOLDS = {
+    "DEBUG": 10,
+    "INFO": 20,
+    "WARN": 30,
+    "WARNING": 30,
+    "ERROR": 40,
+    "CRITICAL": 50,
+}
+
+LOG_LEVEL = os.environ.get("SOCLESS_LOG_LEVEL", "DEBUG").upper()
+LOG_THRESHOLD = LEVEL_THRESHOLDS.get(LOG_LEVEL, LEVEL_THRESHOLDS["DEBUG"])
+LOG_LINENO = os.environ.get("SOCLESS_LOG_LINENO", "true").lower() != "false"
+DEBUG_SAMPLE_RATE = float(os.environ.get("SOCLESS_LOG_DEBUG_SAMPLE_RATE", 1.0))
+MAX_EXTRA_BYTES = int(os.environ.get("SOCLESS_LOG_MAX_EXTRA_BYTES", 32 * 1024))
+
+
+def build_static_context() -> dict:
+    """The parts of the log context that don't change for the life of the process"""
+    return {
+        "aws_region": os.environ.get("AWS_REGION", ""),
+        "function_name": os.environ.get("AWS_LAMBDA_FUNCTION_NAME", ""),
+        "execution_env": os.environ.get("AWS_EXECUTION_ENV", ""),
+        "memory_size": os.environ.get("AWS_LAMBDA_FUNCTION_MEMORY_SIZE", ""),
+        "function_version": os.environ.get("AWS_LAMBDA_FUNCTION_VERSION", ""),
+        "function_log_group": os.environ.get("AWS_LAMBDA_LOG_GROUP_NAME", ""),
+        "source": "Socless",
+    }
+
+
+def serialize_extra(extra: dict) -> str:
+    """Serialize `extra`, replacing it with a truncated preview if it exceeds MAX_EXTRA_BYTES"""
+    serialized = json.dumps(extra)
+    if MAX_EXTRA_BYTES and len(serialized) > MAX_EXTRA_BYTES:
+        serialized = json.dumps(
+            {
+                "_truncated": True,
+                "_original_length": len(serialized),
+                "preview": serialized[:MAX_EXTRA_BYTES],
+            }
+        )
+    return serialized
 
 
 class socless_log:
@@ -25,6 +77,49 @@ class socless_log:
     DEBUG = "DEBUG"
     CRITICAL = "CRITICAL"
 
+    _static_context = build_static_context()
+    # fields added to the context of every log line, e.g execution_id
+    _bound_context: dict = {}
+    _debug_sampled = random.random() < DEBUG_SAMPLE_RATE
+
+    @classmethod
+    def start_invocation(cls, **fields):
+        """Start logging for a new invocation of a warm Lambda.
+
+        Replaces the bound fields with `fields` and decides whether this
+        invocation's DEBUG logs are sampled.
+        """
+        cls._bound_context = dict(fields)
+        cls._debug_sampled = random.random() < DEBUG_SAMPLE_RATE
+
+    @classmethod
+    def bind(cls, **fields):
+        """Add fields, such as `execution_id` or `state_name`, to the context of every log line"""
+        cls._bound_context = {**cls._bound_context, **fields}
+
+    @classmethod
+    def unbind(cls, *names):
+        """Remove bound fields. Removes all of them if no names are given"""
+        if not names:
+            cls._bound_context = {}
+        else:
+            cls._bound_context = {
+                key: value
+                for key, value in cls._bound_context.items()
+                if key not in names
+            }
+
+    @classmethod
+    def refresh_static_context(cls):
+        """Re-read the static context from the environment"""
+        cls._static_context = build_static_context()
+
+    @classmethod
+    def is_enabled_for(cls, level) -> bool:
+        if LEVEL_THRESHOLDS[level] < LOG_THRESHOLD:
+            return False
+        return level != cls.DEBUG or cls._debug_sampled
+
     @classmethod
     def __log(cls, level, message, extra={}):
         """
@@ -35,57 +130,59 @@ class socless_log:
 
         if not isinstance(extra, dict):
             raise ValueError("Extra must be a dictionary")
-        payload = {
-            "context": {
-                "time": "{}Z".format(datetime.utcnow().isoformat()),
-                "aws_region": os.environ.get("AWS_REGION", ""),
-                "function_name": os.environ.get("AWS_LAMBDA_FUNCTION_NAME", ""),
-                "execution_env": os.environ.get("AWS_EXECUTION_ENV", ""),
-                "memory_size": os.environ.get("AWS_LAMBDA_FUNCTION_MEMORY_SIZE", ""),
-                "function_version": os.environ.get("AWS_LAMBDA_FUNCTION_VERSION", ""),
-                "function_log_group": os.environ.get("AWS_LAMBDA_LOG_GROUP_NAME", ""),
-                "source": "Socless",
-                "level": level,
-                "lineno": inspect.currentframe().f_back.f_back.f_lineno,
-            },
-            "body": {"message": message, "extra": extra},
-        }
-        return json.dumps(payload)
+        context = {"time": "{}Z".format(datetime.utcnow().isoformat())}
+        context.update(cls._static_context)
+        context["level"] = level
+        if LOG_LINENO:
+            # the caller of info(), error(), etc.
+            context["lineno"] = sys._getframe(2).f_lineno
+        if cls._bound_context:
+            context.update(cls._bound_context)
+        return '{"context": %s, "body": {"message": %s, "extra": %s}}' % (
+            json.dumps(context),
+            json.dumps(message),
+            serialize_extra(extra),
+        )
 
     @classmethod
     def info(self, message, extra={}):
         """
         Write a log message with level info
         """
-        print((self.__log(self.INFO, message, extra)))
+        if self.is_enabled_for(self.INFO):
+            print((self.__log(self.INFO, message, extra)))
 
     @classmethod
     def error(self, message, extra={}):
         """
         Write an error message
         """
-        print((self.__log(self.ERROR, message, extra)))
+        if self.is_enabled_for(self.ERROR):
+            print((self.__log(self.ERROR, message, extra)))
 
     @classmethod
     def debug(self, message, extra={}):
         """
         Write a debug message
         """
-        print((self.__log(self.DEBUG, message, extra)))
+        if self.is_enabled_for(self.DEBUG):
+            print((self.__log(self.DEBUG, message, extra)))
 
     @classmethod
     def critical(self, message, extra={}):
         """
         Write a critical message
         """
-        print((self.__log(self.CRITICAL, message, extra)))
+        if self.is_enabled_for(self.CRITICAL):
+            print((self.__log(self.CRITICAL, message, extra)))
 
     @classmethod
     def warn(self, message, extra={}):
         """
         Write a warning message
         """
-        print((self.__log(self.WARN, message, extra)))
+        if self.is_enabled_for(self.WARN):
+            print((self.__log(self.WARN, message, extra)))
 
 
 def socless_log_then_raise(error_string, extras={}):
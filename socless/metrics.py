@@ -0,0 +1,125 @@
+# Copyright 2018 Twilio, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+"""
+metrics.py - CloudWatch Embedded Metric Format (EMF) metrics
+
+Metrics are buffered in memory and written to stdout as EMF JSON lines when
+`flush` is called, once per invocation. CloudWatch Logs extracts them into
+metrics, so emitting them costs no API calls.
+
+Configuration (environment variables, read at import):
+    SOCLESS_METRICS_ENABLED: set to "true" to emit metrics. Off by default
+    SOCLESS_METRICS_NAMESPACE: the CloudWatch namespace, "SOCless" by default
+"""
+import os, threading, time, simplejson as json
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+__all__ = ["MetricsBuffer", "metrics"]
+
+# EMF accepts at most 100 metrics per log line and 100 values per metric
+MAX_METRICS_PER_LINE = 100
+MAX_VALUES_PER_METRIC = 100
+
+COUNT = "Count"
+MILLISECONDS = "Milliseconds"
+SECONDS = "Seconds"
+BYTES = "Bytes"
+
+
+class MetricsBuffer:
+    """A thread-safe buffer of metric values, written as EMF by `flush`"""
+
+    def __init__(self, namespace: str, enabled: bool, dimensions: Dict[str, str]):
+        self.namespace = namespace
+        self.enabled = enabled
+        self.dimensions = dimensions
+        self._values: Dict[str, Tuple[str, List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def put(self, name: str, value: float, unit: str = COUNT):
+        """Record a value for a metric. Does nothing when metrics are disabled"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._values.setdefault(name, (unit, []))[1].append(value)
+
+    @contextmanager
+    def timer(self, name: str):
+        """Record how long the `with` block took, in milliseconds"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.put(name, (time.perf_counter() - start) * 1000, MILLISECONDS)
+
+    def flush(self):
+        """Write the buffered metrics to stdout and empty the buffer"""
+        if not self.enabled:
+            return
+        with self._lock:
+            values, self._values = self._values, {}
+        for line in self.build_lines(values):
+            print(line)
+
+    def build_lines(self, values: Dict[str, Tuple[str, List[float]]]) -> List[str]:
+        timestamp = int(time.time() * 1000)
+        entries = [
+            (name, unit, metric_values[start : start + MAX_VALUES_PER_METRIC])
+            for name, (unit, metric_values) in values.items()
+            for start in range(0, len(metric_values), MAX_VALUES_PER_METRIC)
+        ]
+        lines = []
+        while entries:
+            # a metric name may appear only once per line
+            line_entries, seen = [], set()
+            for entry in entries:
+                if entry[0] not in seen and len(line_entries) < MAX_METRICS_PER_LINE:
+                    line_entries.append(entry)
+                    seen.add(entry[0])
+            for entry in line_entries:
+                entries.remove(entry)
+
+            document = {
+                "_aws": {
+                    "Timestamp": timestamp,
+                    "CloudWatchMetrics": [
+                        {
+                            "Namespace": self.namespace,
+                            "Dimensions": [list(self.dimensions)],
+                            "Metrics": [
+                                {"Name": name, "Unit": unit}
+                                for name, unit, _ in line_entries
+                            ],
+                        }
+                    ],
+                },
+                **self.dimensions,
+            }
+            for name, _, metric_values in line_entries:
+                document[name] = (
+                    metric_values[0] if len(metric_values) == 1 else metric_values
+                )
+            lines.append(json.dumps(document))
+        return lines
+
+
+metrics = MetricsBuffer(
+    namespace=os.environ.get("SOCLESS_METRICS_NAMESPACE", "SOCless"),
+    enabled=os.environ.get("SOCLESS_METRICS_ENABLED", "false").lower() == "true",
+    dimensions={"FunctionName": os.environ.get("AWS_LAMBDA_FUNCTION_NAME", "")},
+)
@@ -1,16 +1,53 @@
 """
 SOCless Parameter Resolver Implementation
 """
-from typing import Any
+import hashlib, os, re, threading, simplejson as json
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from .logger import socless_log
-from .exceptions import SoclessException, SoclessBootstrapError
-from .jinja import render_jinja_from_string
+from .exceptions import SoclessException, SoclessBootstrapError, SoclessVaultError
+from .jinja import (
+    JINJA_MARKERS,
+    jinja_env,
+    render_jinja_from_string,
+    native_literal,
+    fromjson,
+)
+from .jsonpath import KEY, JsonPath, compile_jsonpath
+from .ssm import SSM_GET_PARAMETERS_LIMIT, fetch_many_from_ssm, secret_cache
+from .vault import fetch_from_vault, get_vault_bucket_name, vault_cache
+from jinja2 import nodes
 from jinja2.exceptions import TemplateSyntaxError, UndefinedError
 
 
 VAULT_TOKEN = "vault:"
 PATH_TOKEN = "$."
 CONVERSION_TOKEN = "!"
+# the name templates use for the root object, see `render_jinja_from_string`
+CONTEXT_NAME = "context"
+
+ContextPath = Tuple[str, ...]
+
+# secret('/path') and '/path' | secret, with a literal path
+SECRET_REFERENCE_PATTERNS = [
+    re.compile(r"""secret\(\s*(['"])(?P<path>[^'"]+)\1\s*\)"""),
+    re.compile(r"""(['"])(?P<path>[^'"]+)\1\s*\|\s*secret\b"""),
+]
+# vault('file_id'), with a literal file id
+VAULT_REFERENCE_PATTERN = re.compile(
+    r"""vault\(\s*(['"])(?P<file_id>[^'"]+)\1\s*\)"""
+)
+
+# How many secrets/vault objects `ParameterResolver` fetches at once before
+# rendering parameters. 1 fetches them one after another
+PREFETCH_MAX_WORKERS = int(os.environ.get("SOCLESS_PARAMETER_PREFETCH_WORKERS", 8))
+
+# How many compiled parameter plans to keep, see `get_parameter_plan`
+PARAMETER_PLAN_CACHE_SIZE = int(
+    os.environ.get("SOCLESS_PARAMETER_PLAN_CACHE_SIZE", 128)
+)
 
 
 class ParameterResolver:
@@ -50,10 +87,256 @@ class ParameterResolver:
         Returns:
             a dictionary containing resolved parameter references
         """
-        actual_params = {}
-        for parameter, reference in parameters.items():
-            actual_params[parameter] = self.resolve_reference(reference)
-        return actual_params
+        plan = get_parameter_plan(parameters)
+        self.prefetch(plan.references)
+        # each distinct reference is evaluated once
+        resolved: Dict[str, Any] = {}
+
+        def resolve(reference: str):
+            if reference not in resolved:
+                resolved[reference] = resolve_string_parameter(reference, self.root_obj)
+            return resolved[reference]
+
+        if plan.root is STATIC:
+            return dict(parameters)
+        return plan.root.execute(parameters, resolve)
+
+    def prefetch(self, parameters):
+        """Warm the secret and vault caches for the references in `parameters`.
+
+        The secrets and vault objects are fetched at the same time, on up to
+        PREFETCH_MAX_WORKERS threads, so rendering the parameters afterwards is
+        served from the caches. A failed fetch is only logged: the parameter that
+        needs it fetches it again while rendering, so errors are still raised
+        one at a time, in parameter order.
+        """
+        fetches = self.secret_fetches(parameters) + self.vault_fetches(parameters)
+        if not fetches:
+            return
+        if len(fetches) == 1 or PREFETCH_MAX_WORKERS <= 1:
+            errors = [_attempt(fetch) for fetch in fetches]
+        else:
+            with ThreadPoolExecutor(
+                max_workers=min(PREFETCH_MAX_WORKERS, len(fetches))
+            ) as executor:
+                errors = list(executor.map(_attempt, fetches))
+        for error in errors:
+            if error is not None:
+                socless_log.warn(
+                    "Parameter prefetch failed, fetching while rendering",
+                    {"error": f"{error}"},
+                )
+
+    def secret_fetches(self, parameters) -> List[Callable]:
+        """A batched GetParameters call for each 10 uncached literal secret references
+
+        If a batch fails (e.g missing `ssm:GetParameters` permission), each
+        template falls back to fetching its own secret.
+        """
+        if not secret_cache.enabled:
+            return []
+        secret_paths = [
+            path
+            for path in find_secret_references(parameters)
+            if secret_cache.get(path) is None
+        ]
+        return [
+            partial(
+                fetch_many_from_ssm,
+                secret_paths[start : start + SSM_GET_PARAMETERS_LIMIT],
+            )
+            for start in range(0, len(secret_paths), SSM_GET_PARAMETERS_LIMIT)
+        ]
+
+    def vault_fetches(self, parameters) -> List[Callable]:
+        """A fetch for each uncached vault object the parameters reference"""
+        if vault_cache.max_bytes <= 0:
+            return []
+        file_ids = find_vault_references(parameters, self.root_obj)
+        if not file_ids:
+            return []
+        try:
+            bucket_name = get_vault_bucket_name()
+        except SoclessVaultError:
+            # reported when the parameter is rendered
+            return []
+        return [
+            partial(fetch_from_vault, file_id)
+            for file_id in file_ids
+            if (bucket_name, file_id) not in vault_cache
+        ]
+
+
+def _attempt(fetch: Callable) -> Optional[Exception]:
+    try:
+        fetch()
+    except Exception as e:
+        return e
+    return None
+
+
+def find_secret_references(reference) -> List[str]:
+    """Collect the literal SSM paths passed to `secret` in a parameter tree.
+    Args:
+        reference: A parameter reference, may be any Python built-in type
+    Returns:
+        The unique secret paths, in order of first appearance
+    """
+    paths = {}
+    if isinstance(reference, str):
+        if any(marker in reference for marker in JINJA_MARKERS):
+            for pattern in SECRET_REFERENCE_PATTERNS:
+                for match in pattern.finditer(reference):
+                    paths[match.group("path")] = None
+    elif isinstance(reference, dict):
+        for value in reference.values():
+            paths.update(dict.fromkeys(find_secret_references(value)))
+    elif isinstance(reference, list):
+        for item in reference:
+            paths.update(dict.fromkeys(find_secret_references(item)))
+    return list(paths)
+
+
+def find_vault_references(reference, root_object: Optional[dict] = None) -> List[str]:
+    """Collect the vault file ids a parameter tree reads.
+
+    Finds `vault('<file_id>')` calls with a literal id and legacy `vault:<file_id>`
+    references. With `root_object`, legacy `$.` references that point at a
+    `vault:<file_id>` string are followed too.
+    Args:
+        reference: A parameter reference, may be any Python built-in type
+        root_object: The object `$.` references are evaluated against
+    Returns:
+        The unique file ids, in order of first appearance
+    """
+    file_ids: dict = {}
+    _collect_vault_references(reference, root_object, file_ids)
+    return list(file_ids)
+
+
+def _collect_vault_references(
+    reference, root_object: Optional[dict], file_ids: dict
+):
+    if isinstance(reference, str):
+        if reference.startswith(PATH_TOKEN) and root_object is not None:
+            jsonpath = compile_legacy_jsonpath_reference(reference)
+            if jsonpath:
+                try:
+                    reference = jsonpath.evaluate(root_object)
+                except LookupError:
+                    # reported when the parameter is resolved
+                    return
+                if not isinstance(reference, str):
+                    return
+        if reference.startswith(VAULT_TOKEN):
+            reference = convert_deprecated_vault_to_template(reference)
+        if any(marker in reference for marker in JINJA_MARKERS):
+            for match in VAULT_REFERENCE_PATTERN.finditer(reference):
+                file_ids[match.group("file_id")] = None
+    elif isinstance(reference, dict):
+        for value in reference.values():
+            _collect_vault_references(value, root_object, file_ids)
+    elif isinstance(reference, list):
+        for item in reference:
+            _collect_vault_references(item, root_object, file_ids)
+
+
+class DynamicContextReference(Exception):
+    """A parameter reads the context in a way that can't be determined statically"""
+
+
+def find_context_references(reference) -> Optional[List[ContextPath]]:
+    """Collect the context paths a parameter tree reads.
+
+    Paths are key names from the context root, e.g `$.artifacts.event.details.ip`
+    gives ("artifacts", "event", "details", "ip"). A path stops at the first list
+    index, wildcard or computed key, so it always covers what the reference reads.
+    Args:
+        reference: A parameter reference, may be any Python built-in type
+    Returns:
+        The unique paths in order of first appearance, or None if some reference
+        may read any part of the context (e.g `{{ context }}`)
+    """
+    paths = {}
+    try:
+        _collect_context_references(reference, paths)
+    except DynamicContextReference:
+        return None
+    return list(paths)
+
+
+def _collect_context_references(reference, paths: dict):
+    if isinstance(reference, str):
+        for path in _string_context_references(reference):
+            paths[path] = None
+    elif isinstance(reference, dict):
+        for value in reference.values():
+            _collect_context_references(value, paths)
+    elif isinstance(reference, list):
+        for item in reference:
+            _collect_context_references(item, paths)
+
+
+def _string_context_references(parameter: str) -> List[ContextPath]:
+    if parameter.startswith(PATH_TOKEN):
+        jsonpath = compile_legacy_jsonpath_reference(parameter)
+        if jsonpath:
+            path = []
+            for kind, arg in jsonpath.steps:
+                if kind != KEY or arg.lstrip("-").isdigit():
+                    break
+                path.append(arg)
+            if not path:
+                raise DynamicContextReference(parameter)
+            return [tuple(path)]
+        parameter = convert_legacy_reference_to_template(parameter)
+
+    if not any(marker in parameter for marker in JINJA_MARKERS):
+        return []
+    try:
+        template_ast = jinja_env.parse(parameter)
+    except TemplateSyntaxError:
+        # rendered as the raw string, see `resolve_string_parameter`
+        return []
+    found: List[ContextPath] = []
+    _template_context_references(template_ast, found)
+    return found
+
+
+def _template_context_references(node: nodes.Node, found: List[ContextPath]):
+    if isinstance(node, nodes.Call) and isinstance(node.node, nodes.Getattr):
+        # a method call such as `context.results.items()` reads the object it's called on
+        _template_context_references(node.node.node, found)
+        for child in node.iter_child_nodes():
+            if child is not node.node:
+                _template_context_references(child, found)
+        return
+    if isinstance(node, (nodes.Getattr, nodes.Getitem)):
+        keys: List[str] = []
+        target = node
+        while isinstance(target, (nodes.Getattr, nodes.Getitem)):
+            if isinstance(target, nodes.Getattr):
+                keys.append(target.attr)
+            elif isinstance(target.arg, nodes.Const) and isinstance(
+                target.arg.value, str
+            ):
+                keys.append(target.arg.value)
+            else:
+                # a list index or computed key; only the part before it is static
+                _template_context_references(target.arg, found)
+                keys.clear()
+            target = target.node
+        if isinstance(target, nodes.Name) and target.name == CONTEXT_NAME:
+            if not keys:
+                raise DynamicContextReference(CONTEXT_NAME)
+            found.append(tuple(reversed(keys)))
+            return
+        # the chain was rooted somewhere else; look for references in its arguments
+        node = target
+    if isinstance(node, nodes.Name) and node.name == CONTEXT_NAME:
+        raise DynamicContextReference(CONTEXT_NAME)
+    for child in node.iter_child_nodes():
+        _template_context_references(child, found)
 
 
 def add_brackets_and_conditionally_add_fromjson(
@@ -100,7 +383,64 @@ def convert_legacy_reference_to_template(reference_path: str) -> str:
         )
 
 
+def compile_legacy_jsonpath_reference(reference_path: str) -> Optional[JsonPath]:
+    """Compile the JsonPath part of a legacy `$.` reference, e.g `$.artifacts.event!json`.
+    Returns:
+        The compiled JsonPath, or None if the reference needs the Jinja fallback
+        (unsupported syntax or an unknown conversion)
+    """
+    reference, _, conversion = reference_path.partition(CONVERSION_TOKEN)
+    if conversion not in ("", "json"):
+        return None
+    try:
+        return compile_jsonpath(reference)
+    except ValueError:
+        return None
+
+
+def resolve_jsonpath_parameter(
+    parameter: str, jsonpath: JsonPath, root_object: dict
+) -> Any:
+    """Resolve a legacy `$.` reference by walking the root object directly.
+
+    This gives the same result as rendering the reference as a Jinja template,
+    without compiling one:
+        - string values are converted to native types ("123" -> 123)
+        - string values that are vault references are replaced with the vault content
+        - a trailing `!json` parses the resulting string as JSON
+        - a path that doesn't exist is rendered as a template, so it resolves
+          to the same Undefined value or raises the same error
+    """
+    try:
+        resolved = jsonpath.evaluate(root_object)
+    except LookupError:
+        return resolve_template_parameter(parameter, root_object)
+
+    convert_json = parameter.endswith(CONVERSION_TOKEN + "json")
+    if isinstance(resolved, str):
+        if resolved.startswith(VAULT_TOKEN):
+            # vault contents are rendered through jinja like any vault reference
+            resolved = render_jinja_from_string(
+                convert_deprecated_vault_to_template(resolved), root_object
+            )
+        else:
+            resolved = resolved if convert_json else native_literal(resolved)
+
+    if convert_json and isinstance(resolved, str):
+        return fromjson(resolved)
+    return resolved
+
+
 def resolve_string_parameter(parameter: str, root_object: dict) -> Any:
+    if parameter.startswith(PATH_TOKEN):
+        jsonpath = compile_legacy_jsonpath_reference(parameter)
+        if jsonpath:
+            return resolve_jsonpath_parameter(parameter, jsonpath, root_object)
+    return resolve_template_parameter(parameter, root_object)
+
+
+def resolve_template_parameter(parameter: str, root_object: dict) -> Any:
+    """Resolve a string parameter by rendering it as a Jinja template"""
     template = convert_legacy_reference_to_template(parameter)
     try:
         resolved = render_jinja_from_string(template, root_object)
@@ -122,3 +462,141 @@ def resolve_string_parameter(parameter: str, root_object: dict) -> Any:
             f"Undefined variable when resolving parameter: {parameter} template {e} | for template: {template}"
         )
     return resolved
+
+
+# A plan node for a value that resolves to itself
+STATIC = None
+
+
+class ReferenceNode:
+    """A string that must be resolved on every invocation"""
+
+    __slots__ = ("reference",)
+
+    def __init__(self, reference: str):
+        self.reference = reference
+
+    def execute(self, value, resolve: Callable[[str], Any]):
+        return resolve(self.reference)
+
+
+class ConstantNode:
+    """A plain string that always resolves to the same immutable value, e.g "123" -> 123"""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def execute(self, value, resolve: Callable[[str], Any]):
+        return self.value
+
+
+class ContainerNode:
+    """A dict or list with dynamic children.
+
+    Executing it shallow copies the container and replaces only the dynamic
+    children, so static subtrees are passed through as they are.
+    """
+
+    __slots__ = ("children",)
+
+    def __init__(self, children: List[Tuple[Any, Any]]):
+        self.children = children
+
+    def execute(self, value, resolve: Callable[[str], Any]):
+        resolved = value.copy()
+        for key, child in self.children:
+            resolved[key] = child.execute(value[key], resolve)
+        return resolved
+
+
+class ParameterPlan:
+    """A state's parameters compiled into the work needed to resolve them.
+
+    Attributes:
+        root: The plan node for the parameters, or STATIC if they have no references
+        references: The distinct strings that are resolved on every invocation,
+            in order of first appearance
+    """
+
+    __slots__ = ("root", "references")
+
+    def __init__(self, parameters):
+        references: Dict[str, None] = {}
+        self.root = _compile_plan_node(parameters, references)
+        self.references = list(references)
+
+
+def _compile_plan_node(reference, references: Dict[str, None]):
+    if isinstance(reference, str):
+        if is_plain_text(reference):
+            resolved = resolve_string_parameter(reference, {})
+            if resolved == reference and isinstance(resolved, str):
+                return STATIC
+            if resolved is None or isinstance(resolved, (str, int, float, bool)):
+                return ConstantNode(resolved)
+        references[reference] = None
+        return ReferenceNode(reference)
+    if isinstance(reference, dict):
+        items = reference.items()
+    elif isinstance(reference, list):
+        items = enumerate(reference)
+    else:
+        return STATIC
+    children = []
+    for key, value in items:
+        node = _compile_plan_node(value, references)
+        if node is not STATIC:
+            children.append((key, node))
+    return ContainerNode(children) if children else STATIC
+
+
+def is_plain_text(parameter: str) -> bool:
+    """Whether a string parameter resolves without reading the context, vault or secrets"""
+    return not (
+        parameter.startswith(PATH_TOKEN)
+        or parameter.startswith(VAULT_TOKEN)
+        or "\r" in parameter
+        or any(marker in parameter for marker in JINJA_MARKERS)
+    )
+
+
+_parameter_plans: "OrderedDict[bytes, ParameterPlan]" = OrderedDict()
+_parameter_plans_lock = threading.Lock()
+
+
+def _is_json_tree(parameters) -> bool:
+    """Whether `parameters` is only dicts with string keys, lists, strings and scalars"""
+    if isinstance(parameters, dict):
+        return all(
+            isinstance(key, str) and _is_json_tree(value)
+            for key, value in parameters.items()
+        )
+    if isinstance(parameters, list):
+        return all(_is_json_tree(item) for item in parameters)
+    return parameters is None or isinstance(parameters, (str, int, float))
+
+
+def get_parameter_plan(parameters) -> ParameterPlan:
+    """Get the compiled plan for a parameter tree, compiling it on first use.
+
+    Plans are cached by a hash of the parameters' JSON, so a warm Lambda
+    compiles each distinct State_Config once. Trees JSON can't tell apart from
+    another tree, e.g with tuples or non-string keys, are compiled without caching.
+    """
+    if not _is_json_tree(parameters):
+        # e.g a direct invoke from Python
+        return ParameterPlan(parameters)
+    key = hashlib.sha256(json.dumps(parameters).encode("utf-8")).digest()
+    with _parameter_plans_lock:
+        plan = _parameter_plans.get(key)
+        if plan is not None:
+            _parameter_plans.move_to_end(key)
+            return plan
+    plan = ParameterPlan(parameters)
+    with _parameter_plans_lock:
+        _parameter_plans[key] = plan
+        while len(_parameter_plans) > PARAMETER_PLAN_CACHE_SIZE:
+            _parameter_plans.popitem(last=False)
+    return plan
@@ -0,0 +1,166 @@
+# Copyright 2018 Twilio, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+"""
+precompile.py - Compile playbook parameter templates at build time
+
+Extracts the parameter templates from State Machine definitions and compiles
+them into a Python package, so integrations don't compile them on cold start:
+
+    python -m socless.precompile playbook.json --output build/socless_precompiled_templates
+
+Bundle the package with the Lambda function. `render_jinja_from_string` loads
+templates from it by hash, and compiles any template it doesn't find. Run this
+with the same Jinja version the Lambda uses, otherwise the package is ignored.
+"""
+import argparse, os, sys, simplejson as json
+from typing import Dict, Iterable, List, Optional
+from jinja2 import DictLoader, __version__ as jinja_version
+from .jinja import JINJA_MARKERS, jinja_env, template_hash
+from .paramresolver import (
+    PATH_TOKEN,
+    VAULT_TOKEN,
+    compile_legacy_jsonpath_reference,
+    convert_legacy_reference_to_template,
+)
+
+__all__ = ["find_definition_templates", "precompile_templates"]
+
+# Step Functions evaluates the values of keys ending in `.$` itself
+ASL_PATH_SUFFIX = ".$"
+
+
+def parameter_template(parameter: str) -> Optional[str]:
+    """The template `render_jinja_from_string` renders for a string parameter, if any"""
+    if parameter.startswith(PATH_TOKEN) and compile_legacy_jsonpath_reference(
+        parameter
+    ):
+        # resolved without Jinja, see `resolve_jsonpath_parameter`
+        return None
+    if parameter.startswith(PATH_TOKEN) or parameter.startswith(VAULT_TOKEN):
+        parameter = convert_legacy_reference_to_template(parameter)
+    if "\r" in parameter or any(marker in parameter for marker in JINJA_MARKERS):
+        return parameter
+    return None
+
+
+def _collect_parameter_templates(parameters, templates: Dict[str, None]):
+    if isinstance(parameters, str):
+        template = parameter_template(parameters)
+        if template is not None:
+            templates[template] = None
+    elif isinstance(parameters, dict):
+        for key, value in parameters.items():
+            if not str(key).endswith(ASL_PATH_SUFFIX):
+                _collect_parameter_templates(value, templates)
+    elif isinstance(parameters, list):
+        for item in parameters:
+            _collect_parameter_templates(item, templates)
+
+
+def _collect_definition_templates(definition, templates: Dict[str, None]):
+    if isinstance(definition, dict):
+        states = definition.get("States")
+        if isinstance(states, dict):
+            for state in states.values():
+                if isinstance(state, dict) and "Parameters" in state:
+                    _collect_parameter_templates(state["Parameters"], templates)
+        # Parallel branches, Map iterators and definitions wrapped in other documents
+        for value in definition.values():
+            _collect_definition_templates(value, templates)
+    elif isinstance(definition, list):
+        for item in definition:
+            _collect_definition_templates(item, templates)
+
+
+def find_definition_templates(definition: dict) -> List[str]:
+    """Collect the parameter templates in a State Machine or SOCless playbook definition.
+
+    Args:
+        definition (dict): The definition. States nested in Parallel and Map
+            states, or in a document that wraps the definition, are included
+    Returns:
+        The unique templates, in order of first appearance. Legacy `$.` and
+        `vault:` references are converted to the templates they render as
+    """
+    templates: Dict[str, None] = {}
+    _collect_definition_templates(definition, templates)
+    return list(templates)
+
+
+def precompile_templates(
+    templates: Iterable[str], output_dir: str, log_function=None
+) -> int:
+    """Compile templates into the package at `output_dir`.
+
+    Args:
+        templates: The template strings
+        output_dir: The package directory, created if it doesn't exist. Its
+            name is the package name `render_jinja_from_string` imports
+        log_function: Called with progress messages
+    Returns:
+        The number of templates compiled. Templates with syntax errors are
+        skipped, they fail the same way at runtime
+    """
+    sources = {template_hash(template): template for template in templates}
+    compiled = []
+
+    def log(message: str):
+        if message.startswith("Compiled"):
+            compiled.append(message)
+        if log_function:
+            log_function(message)
+
+    # an overlay shares jinja_env's configuration, filters and code generator
+    jinja_env.overlay(loader=DictLoader(sources)).compile_templates(
+        output_dir, zip=None, log_function=log
+    )
+    with open(os.path.join(output_dir, "__init__.py"), "w") as init_file:
+        init_file.write(
+            '"""Templates precompiled by socless.precompile"""\n'
+            f"JINJA_VERSION = {jinja_version!r}\n"
+        )
+    return len(compiled)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m socless.precompile",
+        description="Precompile the parameter templates of State Machine definitions",
+    )
+    parser.add_argument(
+        "definitions", nargs="+", help="State Machine definition JSON files"
+    )
+    parser.add_argument(
+        "--output",
+        default="socless_precompiled_templates",
+        help="the package directory to write (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+
+    templates: Dict[str, None] = {}
+    for path in args.definitions:
+        with open(path) as definition_file:
+            templates.update(
+                dict.fromkeys(find_definition_templates(json.load(definition_file)))
+            )
+    count = precompile_templates(templates, args.output)
+    print(
+        f"Precompiled {count} of {len(templates)} templates into {args.output}",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+# Copyright 2018 Twilio, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+"""
+resultsformat.py - Storage formats for the execution context in the results table
+
+Format 1 (the default) stores the context as a DynamoDB map under `results`.
+Format 2 stores it as zlib compressed JSON in the binary `results_blob`
+attribute, next to a `results_format` marker and a `results_version` counter
+used for optimistic locking. Items without a marker are format 1, so both
+formats can coexist in one table.
+"""
+import os, zlib, simplejson as json
+
+RESULTS_FORMAT_ATTRIBUTE = "results_format"
+RESULTS_BLOB_ATTRIBUTE = "results_blob"
+RESULTS_VERSION_ATTRIBUTE = "results_version"
+
+MAP_FORMAT = 1
+COMPRESSED_FORMAT = 2
+
+# format used for new executions: "map" or "compressed"
+RESULTS_STORAGE_FORMAT = os.environ.get("SOCLESS_RESULTS_STORAGE_FORMAT", "map")
+COMPRESSION_LEVEL = 6
+
+
+def compressed_format_enabled() -> bool:
+    return RESULTS_STORAGE_FORMAT == "compressed"
+
+
+def is_compressed_item(item: dict) -> bool:
+    return item.get(RESULTS_FORMAT_ATTRIBUTE) == COMPRESSED_FORMAT
+
+
+def encode_context(context: dict) -> bytes:
+    """Serialize an execution context to compressed JSON. Decimals are written as numbers"""
+    return zlib.compress(
+        json.dumps(context, separators=(",", ":")).encode("utf-8"), COMPRESSION_LEVEL
+    )
+
+
+def decode_context(blob) -> dict:
+    """Load an execution context saved by `encode_context`.
+
+    Args:
+        blob: bytes, or the boto3 `Binary` read from DynamoDB
+    """
+    return json.loads(zlib.decompress(bytes(blob)).decode("utf-8"))
+
+
+def build_compressed_attributes(context: dict) -> dict:
+    """The item attributes that store `context` in the compressed format"""
+    return {
+        RESULTS_FORMAT_ATTRIBUTE: COMPRESSED_FORMAT,
+        RESULTS_BLOB_ATTRIBUTE: encode_context(context),
+        RESULTS_VERSION_ATTRIBUTE: 0,
+    }
@@ -14,7 +14,7 @@
 """
 Function module - Functions for interacting with boto3 Lambda client
 """
-import boto3
+from .clients import get_boto3_resource
 import simplejson as json
 from botocore.exceptions import ClientError
 
@@ -34,7 +34,7 @@ def save_to_s3(file_id, content, bucket_name, return_content=False):
         reference) of the saved content
     """
 
-    bucket = boto3.resource("s3").Bucket(bucket_name)
+    bucket = get_boto3_resource("s3").Bucket(bucket_name)
     try:
         # print content
         bucket.put_object(Key=file_id, Body=json.dumps(content))
@@ -15,10 +15,12 @@
 Socless Core
 Contains functions that are used accross Socless
 """
-import boto3, os, uuid, simplejson as json, inspect
+import os, uuid, simplejson as json, inspect
 from botocore.exceptions import ClientError
 from datetime import datetime
 from .jinja import jinja_env
+from .clients import get_boto3_client, get_boto3_resource
+from .exceptions import SoclessNotFoundError
 
 # TODO: Deprecate socless_credentials
 __all__ = [
@@ -144,7 +146,7 @@ def _fetch_from_s3(bucket_name, path):
     Returns:
         str: The content of the S3 object in string format
     """
-    s3 = boto3.resource("s3")
+    s3 = get_boto3_resource("s3")
     bucket = s3.Bucket(bucket_name)
     obj = bucket.Object(path)
     data = obj.get()["Body"].read().decode("utf-8")
@@ -163,7 +165,7 @@ def socless_save_to_vault(content):
     # TODO Implement input type checking on content. It should be none empty and a string
     SOCLESS_VAULT = os.environ.get("SOCLESS_VAULT")
     # TODO: Figure out if I'd like to raise an error if there's no VAULT environment variable
-    vault = boto3.resource("s3").Bucket(SOCLESS_VAULT)
+    vault = get_boto3_resource("s3").Bucket(SOCLESS_VAULT)
     file_id = socless_gen_id()
     vault.put_object(
         Key=file_id, Body=content
@@ -354,7 +356,7 @@ def socless_execute_playbook(playbook, entry, investigation_id=""):
         investigation_id = socless_gen_id()
     PLAYBOOKS_TABLE = os.environ.get("SOCLESS_PLAYBOOKS_TABLE")
     RESULTS_TABLE = os.environ.get("SOCLESS_RESULTS_TABLE")
-    playbook_table = boto3.resource("dynamodb").Table(PLAYBOOKS_TABLE)
+    playbook_table = get_boto3_resource("dynamodb").Table(PLAYBOOKS_TABLE)
     try:
         query_result = playbook_table.get_item(Key={"StateMachine": playbook}).get(
             "Item", False
@@ -377,7 +379,7 @@ def socless_execute_playbook(playbook, entry, investigation_id=""):
         execution_id = socless_gen_id()
         playbook_input["artifacts"]["event"] = entry
         playbook_input["artifacts"]["execution_id"] = execution_id
-        results_table = boto3.resource("dynamodb").Table(RESULTS_TABLE)
+        results_table = get_boto3_resource("dynamodb").Table(RESULTS_TABLE)
         save_result_resp = results_table.put_item(
             Item={
                 "execution_id": execution_id,
@@ -386,7 +388,7 @@ def socless_execute_playbook(playbook, entry, investigation_id=""):
                 "results": playbook_input,
             }
         )
-        stepfunctions = boto3.client("stepfunctions")
+        stepfunctions = get_boto3_client("stepfunctions")
         try:
             step_resp = stepfunctions.start_execution(
                 name=execution_id,
@@ -435,7 +437,7 @@ def socless_dispatch_outbound_message(
     }
     RESPONSE_TABLE = os.environ.get("SOCLESS_MESSAGE_RESPONSE_TABLE")
     STORE_ACTIVITY_TOKEN_ARN = os.environ.get("SAVE_MESSAGE_RESPONSE_MACHINE")
-    response_table = boto3.resource("dynamodb").Table(RESPONSE_TABLE)
+    response_table = get_boto3_resource("dynamodb").Table(RESPONSE_TABLE)
     try:
         response_table.put_item(
             Item={
@@ -453,7 +455,7 @@ def socless_dispatch_outbound_message(
         )
     except Exception as e:
         socless_log_then_raise("Failed to save outbound message", message_meta)
-    stepfunctions = boto3.client("stepfunctions")
+    stepfunctions = get_boto3_client("stepfunctions")
     store_activity_token_input = {"receiver": receiver, "message_id": message_id}
     store_activity_token_id = socless_gen_id()
     try:
@@ -505,9 +507,11 @@ def socless_post_human_response(message_id, response_body):
             response_delivery_failed - Failed to deliver the response to the appropriate playbook execution
             message_status_update_failed - Failed to to mark the message as fulfilled
     """
+    from .integrations import build_projection_arguments, decode_results_item
+
     # TODO: Log an error for every exception raised
     try:
-        responses_table = boto3.resource("dynamodb").Table(
+        responses_table = get_boto3_resource("dynamodb").Table(
             os.environ["MESSAGE_RESPONSES_TABLE"]
         )
         response = responses_table.get_item(Key={"message_id": message_id})
@@ -535,14 +539,21 @@ def socless_post_human_response(message_id, response_body):
         socless_log_then_raise("receiver_not_found")
 
     try:
-        results_table = boto3.resource("dynamodb").Table(os.environ["RESULTS_TABLE"])
+        results_table = get_boto3_resource("dynamodb").Table(os.environ["RESULTS_TABLE"])
         results_resp = results_table.get_item(
-            Key={"execution_id": execution_id}, ProjectionExpression="results.artifacts"
+            Key={"execution_id": execution_id},
+            **build_projection_arguments([("results", "artifacts")]),
         )
     except Exception as e:
         socless_log_then_raise("execution_results_query_failed", {"error": f"{e}"})
 
-    execution_results = results_resp.get("Item", {}).get("results", {})
+    context = decode_results_item(results_resp.get("Item", {}), projected=True)[
+        "results"
+    ]
+    # compressed items decode to the whole context, keep only the artifacts
+    execution_results = (
+        {"artifacts": context["artifacts"]} if "artifacts" in context else {}
+    )
     if not execution_results:
         socless_log_then_raise("execution_results_not_found")
 
@@ -554,7 +565,7 @@ def socless_post_human_response(message_id, response_body):
     resp_body_with_state_name = {receiver: response_body}
     resp_body_with_state_name.update(response_body)
     execution_results["results"] = resp_body_with_state_name
-    stepfunctions = boto3.client("stepfunctions")
+    stepfunctions = get_boto3_client("stepfunctions")
     socless_save_state_execution_result(
         execution_id, receiver, resp_body_with_state_name
     )
@@ -594,6 +605,13 @@ def socless_create_events(event_data, dedup=True):
     Returns:
         Dict w/ investigation_id and status of event creation attempt
     """
+    from .events import (
+        compute_dedup_hash,
+        get_dedup_table,
+        get_investigation_id_from_dedup_table,
+        get_investigation_id_from_existing_unclosed_event,
+    )
+
     event_type = event_data.get("event_type")
     if not event_type:
         raise Exception("Error: event_type must be supplied")
@@ -640,7 +658,7 @@ def socless_create_events(event_data, dedup=True):
         raise Exception("Error: Supplied 'dedup_keys' field is not a list")
 
     EVENTS_TABLE = os.environ.get("SOCLESS_EVENTS_TABLE")
-    event_table = boto3.resource("dynamodb").Table(EVENTS_TABLE)
+    event_table = get_boto3_resource("dynamodb").Table(EVENTS_TABLE)
 
     for detection in details:
         if not isinstance(detection, dict):
@@ -656,43 +674,36 @@ def socless_create_events(event_data, dedup=True):
         investigation_id = _id
 
         if dedup_keys:
-            dedup_fields = {key: detection[key] for key in dedup_keys}
-            event_expression = "event_type = :event_type and status_ <> :status_"
-            dedup_expression = " and ".join(
-                ["details.{key} = :{key}".format(key=key) for key in dedup_fields]
-            )
-            if dedup_expression:
-                FilterExpression = event_expression + " and " + dedup_expression
-            else:
-                FilterExpression = event_expression
-            ExpressionAttributeValues = {
-                ":event_type": event_type,
-                ":status_": "closed",
-            }
-            for key, value in list(dedup_fields.items()):
-                ExpressionAttributeValues[":{}".format(key)] = value
+            # same hash-keyed lookup as socless.events.CompleteEvent
+            dedup_hash = compute_dedup_hash(event_type, detection, dedup_keys)
             try:
-                scan_results = event_table.scan(
-                    FilterExpression=FilterExpression,
-                    ExpressionAttributeValues=ExpressionAttributeValues,
+                existing_investigation_id = get_investigation_id_from_dedup_table(
+                    dedup_hash
                 )
-                while "LastEvaluatedKey" in scan_results and scan_results["Count"] == 0:
-                    scan_results = event_table.scan(
-                        FilterExpression=FilterExpression,
-                        ExpressionAttributeValues=ExpressionAttributeValues,
-                        ExclusiveStartKey=scan_results["LastEvaluatedKey"],
+                existing_investigation_id = (
+                    get_investigation_id_from_existing_unclosed_event(
+                        existing_investigation_id
                     )
+                )
+            except SoclessNotFoundError:
+                existing_investigation_id = ""
             except Exception as e:
-                raise Exception(f"Scanning event table for duplicates failed, {e}")
+                raise Exception(f"Checking dedup table for duplicates failed, {e}")
 
-            if not scan_results["Items"]:
+            if not existing_investigation_id:
                 entry["status_"] = "open"
                 entry["is_duplicate"] = False
                 entry["investigation_id"] = investigation_id
+                get_dedup_table().put_item(
+                    Item={
+                        "dedup_hash": dedup_hash,
+                        "current_investigation_id": investigation_id,
+                    }
+                )
             else:
                 entry["status_"] = "closed"
                 entry["is_duplicate"] = True
-                entry["investigation_id"] = scan_results["Items"][0]["investigation_id"]
+                entry["investigation_id"] = existing_investigation_id
         else:
             entry["status_"] = "open"
             entry["investigation_id"] = investigation_id
@@ -713,20 +724,12 @@ def socless_save_state_execution_result(execution_id, state_name, result):
         state_name (string): Name of the state to save results for
         result (dict): The results to save
     """
+    from .integrations import ExecutionContext
+
     meta = {"execution_id": execution_id, "state_name": "state_name"}
-    RESULTS_TABLE = os.environ.get("SOCLESS_RESULTS_TABLE")
-    results_table = boto3.resource("dynamodb").Table(RESULTS_TABLE)
     try:
-        results_table.update_item(
-            Key={"execution_id": execution_id},
-            UpdateExpression="SET #results.#results.#name = :r, #results.#results.#last_results = :r",
-            ExpressionAttributeValues={":r": result},
-            ExpressionAttributeNames={
-                "#results": "results",
-                "#name": state_name,
-                "#last_results": "_Last_Saved_Results",
-            },
-        )
+        # writes whichever storage format the item uses
+        ExecutionContext(execution_id).save_state_results(state_name, result)
     except Exception as e:
         socless_log.error(
             "Failed to save state execution results", dict(meta, **{"error": f"{e}"})
@@ -742,9 +745,11 @@ def socless_fetch_execution_result(execution_id, state_name):
     Returns:
         dict: An execution result object
     """
+    from .integrations import decode_results_item, rehydrate_result
+
     meta = {"execution_id": execution_id, "state_name": state_name}
     RESULTS_TABLE = os.environ.get("SOCLESS_RESULTS_TABLE")
-    results_table = boto3.resource("dynamodb").Table(RESULTS_TABLE)
+    results_table = get_boto3_resource("dynamodb").Table(RESULTS_TABLE)
     try:
         item_resp = results_table.get_item(Key={"execution_id": execution_id})
     except Exception as e:
@@ -758,4 +763,11 @@ def socless_fetch_execution_result(execution_id, state_name):
                 execution_id, RESULTS_TABLE
             )
         )
+    item = decode_results_item(item)
+    state_results = item.get("results", {}).get("results")
+    if isinstance(state_results, dict):
+        # load results that were offloaded to the vault
+        item["results"]["results"] = {
+            name: rehydrate_result(result) for name, result in state_results.items()
+        }
     return item
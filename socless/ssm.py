@@ -14,24 +14,161 @@
 """
 Function module - Functions for interacting with boto3 Lambda client
 """
+import threading, time
+from collections import OrderedDict
 from os import environ
+from typing import Dict, Iterable, Optional
 from socless.exceptions import SoclessBootstrapError
-import boto3
+from .clients import get_boto3_client
+from .utils import run_in_thread
 from botocore.exceptions import ClientError
 
 
-__all__ = ["fetch_from_ssm"]
+__all__ = [
+    "fetch_from_ssm",
+    "fetch_from_ssm_async",
+    "fetch_many_from_ssm",
+    "invalidate_ssm_cache",
+]
 
+# GetParameters accepts at most 10 names per call
+SSM_GET_PARAMETERS_LIMIT = 10
 
-def fetch_from_ssm(paramter_name) -> str:
-    """Fetch path from SSM Parameter Store."""
 
-    ssm = boto3.client("ssm")
+class SecretCache:
+    """A thread-safe, size-bounded LRU cache whose entries expire after `ttl` seconds.
+
+    A `ttl` of 0 disables caching entirely.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, name: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            try:
+                value, expires_at = self._entries[name]
+            except KeyError:
+                return None
+            if time.monotonic() >= expires_at:
+                del self._entries[name]
+                return None
+            self._entries.move_to_end(name)
+            return value
+
+    def set(self, name: str, value: str):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[name] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(name)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, name: Optional[str] = None):
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
+
+
+secret_cache = SecretCache(
+    ttl=float(environ.get("SOCLESS_SECRET_CACHE_TTL", 300)),
+    max_entries=int(environ.get("SOCLESS_SECRET_CACHE_SIZE", 128)),
+)
+
+
+def fetch_from_ssm(paramter_name, use_cache=False) -> str:
+    """Fetch path from SSM Parameter Store.
+
+    Args:
+        paramter_name (str): The SSM parameter path
+        use_cache (bool): Serve the value from the in-process secret cache
+            when possible, and cache it after fetching
+    """
+    if use_cache:
+        cached = secret_cache.get(paramter_name)
+        if cached is not None:
+            return cached
+
+    ssm = get_boto3_client("ssm")
 
     try:
         param_response = ssm.get_parameter(Name=paramter_name, WithDecryption=True)
-        return param_response["Parameter"]["Value"]
+        value = param_response["Parameter"]["Value"]
     except ClientError as e:
         raise SoclessBootstrapError(
             f"Unable to get ssm parameter at path {paramter_name} in {environ.get('AWS_REGION')}\n {e}"
         )
+
+    if use_cache:
+        secret_cache.set(paramter_name, value)
+    return value
+
+
+async def fetch_from_ssm_async(paramter_name, use_cache=False) -> str:
+    """Fetch path from SSM Parameter Store without blocking the event loop. See `fetch_from_ssm`"""
+    if use_cache:
+        cached = secret_cache.get(paramter_name)
+        if cached is not None:
+            return cached
+    return await run_in_thread(fetch_from_ssm, paramter_name, use_cache=use_cache)
+
+
+def fetch_many_from_ssm(parameter_names: Iterable[str], use_cache=True) -> Dict[str, str]:
+    """Fetch several paths from SSM Parameter Store with batched GetParameters calls.
+
+    Args:
+        parameter_names: The SSM parameter paths
+        use_cache (bool): Skip names already in the secret cache, and cache the
+            fetched values
+    Returns:
+        A dict of parameter path -> value
+    Raises:
+        SoclessBootstrapError if a request fails or any name does not exist
+    """
+    values = {}
+    to_fetch = []
+    for name in dict.fromkeys(parameter_names):
+        cached = secret_cache.get(name) if use_cache else None
+        if cached is None:
+            to_fetch.append(name)
+        else:
+            values[name] = cached
+
+    ssm = get_boto3_client("ssm")
+    for start in range(0, len(to_fetch), SSM_GET_PARAMETERS_LIMIT):
+        chunk = to_fetch[start : start + SSM_GET_PARAMETERS_LIMIT]
+        try:
+            response = ssm.get_parameters(Names=chunk, WithDecryption=True)
+        except ClientError as e:
+            raise SoclessBootstrapError(
+                f"Unable to get ssm parameters {chunk} in {environ.get('AWS_REGION')}\n {e}"
+            )
+        if response.get("InvalidParameters"):
+            raise SoclessBootstrapError(
+                f"Unable to get ssm parameters at paths {response['InvalidParameters']} in {environ.get('AWS_REGION')}"
+            )
+        for parameter in response["Parameters"]:
+            # names requested with a version/label selector come back without it
+            name = parameter["Name"] + parameter.get("Selector", "")
+            values[name] = parameter["Value"]
+            if use_cache:
+                secret_cache.set(name, parameter["Value"])
+
+    return values
+
+
+def invalidate_ssm_cache(parameter_name: Optional[str] = None):
+    """Drop one cached secret, or every cached secret when no name is given."""
+    secret_cache.invalidate(parameter_name)
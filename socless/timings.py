@@ -0,0 +1,88 @@
+# Copyright 2018 Twilio, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+"""
+timings.py - Per-invocation phase timings for integrations
+
+`socless_bootstrap` times the phases of running an integration: `fetch_context`,
+`resolve_parameters`, `handler`, `save_state_results` and `total`. Handlers can
+time their own work with `span`:
+
+    from socless.timings import span
+
+    def handle_state(ip):
+        with span("reputation_lookup"):
+            ...
+
+Set SOCLESS_PHASE_TIMINGS to choose where the timings go:
+    off (default): nothing is timed, `span` is a no-op
+    log: socless_bootstrap logs them once per invocation
+    event: as `log`, and they are also added to the returned event under
+        `socless_timings`
+"""
+import os, threading, time
+from contextlib import contextmanager, nullcontext
+from typing import Dict
+
+__all__ = ["PhaseTimings", "phase_timings", "span"]
+
+TIMINGS_MODE = os.environ.get("SOCLESS_PHASE_TIMINGS", "off").lower()
+EVENT_TIMINGS_KEY = "socless_timings"
+
+_NOOP = nullcontext()
+
+
+class PhaseTimings:
+    """Monotonic timings, in milliseconds, of the named phases of one invocation.
+
+    A phase that runs several times accumulates its durations.
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self._durations: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self._durations = {}
+
+    def phase(self, name: str):
+        """Time the `with` block as the phase `name`"""
+        if not self.enabled:
+            return _NOOP
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def record(self, name: str, milliseconds: float):
+        with self._lock:
+            self._durations[name] = self._durations.get(name, 0.0) + milliseconds
+
+    def as_dict(self) -> Dict[str, float]:
+        with self._lock:
+            return {name: round(ms, 3) for name, ms in self._durations.items()}
+
+
+phase_timings = PhaseTimings(enabled=TIMINGS_MODE in ("log", "event"))
+
+
+def span(name: str):
+    """Time a block of a handler's own work, reported with the invocation's phase timings"""
+    return phase_timings.phase(name)
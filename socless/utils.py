@@ -14,7 +14,7 @@
 """
 utils.py - Contains utility functions
 """
-import uuid
+import asyncio, functools, uuid
 from datetime import datetime
 from decimal import Decimal
 
@@ -24,6 +24,7 @@ __all__ = [
     "convert_empty_strings_to_none",
     "replace_decimals",
     "replace_floats_with_decimals",
+    "run_in_thread",
 ]
 
 
@@ -95,3 +96,9 @@ def replace_floats_with_decimals(obj: object) -> object:
         return Decimal(str(obj))
     else:
         return obj
+
+
+async def run_in_thread(func, *args, **kwargs):
+    """Run a blocking function on the event loop's default thread pool and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
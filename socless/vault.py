@@ -14,14 +14,97 @@
 """
 Vault module - Functions for interacting with the vault
 """
-import boto3, os
-from .utils import gen_id
+import os, threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+from .utils import gen_id, run_in_thread
 from .exceptions import SoclessVaultError
+from .clients import get_boto3_client
 
-__all__ = ["save_to_vault", "fetch_from_vault", "remove_from_vault"]
+__all__ = [
+    "save_to_vault",
+    "fetch_from_vault",
+    "remove_from_vault",
+    "save_to_vault_async",
+    "fetch_from_vault_async",
+]
 
 VAULT_TOKEN = "vault:"
 
+VaultCacheKey = Tuple[str, str]
+
+
+class VaultCache:
+    """A thread-safe LRU cache of vault object contents, bounded by total bytes.
+
+    Vault objects are written once under a generated id and never overwritten,
+    so cached contents never go stale. Objects larger than `max_bytes` are not
+    cached, and a `max_bytes` of 0 disables caching entirely.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[VaultCacheKey, Tuple[str, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: VaultCacheKey) -> Optional[str]:
+        with self._lock:
+            try:
+                content, _ = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return content
+
+    def put(self, key: VaultCacheKey, content: str, size: int):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (content, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def __contains__(self, key: VaultCacheKey) -> bool:
+        # unlike `get`, doesn't count as a hit or miss
+        with self._lock:
+            return key in self._entries
+
+    def invalidate(self, key: Optional[VaultCacheKey] = None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self.current_bytes = 0
+            else:
+                self._discard(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _discard(self, key: VaultCacheKey):
+        entry = self._entries.pop(key, None)
+        if entry:
+            self.current_bytes -= entry[1]
+
+
+vault_cache = VaultCache(
+    max_bytes=int(os.environ.get("SOCLESS_VAULT_CACHE_BYTES", 16 * 1024 * 1024))
+)
+
 
 def get_vault_bucket_name():
     vault_env_name = "SOCLESS_VAULT"
@@ -43,35 +126,44 @@ def save_to_vault(content, prefix=""):
         A dict containing the file_id (S3 Object path) and vault_id (Socless vault
         reference) of the saved content
     """
-    s3 = boto3.resource("s3")
-    bucket = s3.Bucket(get_vault_bucket_name())
+    s3 = get_boto3_client("s3")
+    bucket_name = get_vault_bucket_name()
     file_id = gen_id()
     if prefix:
         file_id = prefix + file_id
-    bucket.put_object(
-        Key=file_id, Body=content
+    body = content.encode("utf-8") if isinstance(content, str) else content
+    s3.put_object(
+        Bucket=bucket_name, Key=file_id, Body=body
     )  # TODO: Should I try catch or let it fail here
+    if isinstance(content, str):
+        vault_cache.put((bucket_name, file_id), content, len(body))
     result = {"file_id": file_id, "vault_id": "{}{}".format(VAULT_TOKEN, file_id)}
 
     return result
 
 
-def fetch_from_vault(file_id, content_only=False):
+def fetch_from_vault(file_id, content_only=False, use_cache=True):
     """Fetch an item from the Vault.
 
     Args:
         file_id (string): Path to object in the Vault
         content_only (bool): Set to 'True' to return the content of
             the Vault object and False to return content + metadata
+        use_cache (bool): Serve the content from the in-process vault cache
+            when possible, and cache it after fetching
 
     Returns:
         The string content of the Vault object if content_only is True.
         Otherwise, the content and metadata of the object
     """
-    s3 = boto3.resource("s3")
-    bucket = s3.Bucket(get_vault_bucket_name())
-    obj = bucket.Object(file_id)
-    data = obj.get()["Body"].read().decode("utf-8")
+    bucket_name = get_vault_bucket_name()
+    data = vault_cache.get((bucket_name, file_id)) if use_cache else None
+    if data is None:
+        s3 = get_boto3_client("s3")
+        raw = s3.get_object(Bucket=bucket_name, Key=file_id)["Body"].read()
+        data = raw.decode("utf-8")
+        if use_cache:
+            vault_cache.put((bucket_name, file_id), data, len(raw))
     meta = {"content": data}
     if content_only:
         return meta["content"]
@@ -88,9 +180,28 @@ def remove_from_vault(file_id):
     Returns:
         dict: The response metadata of the attempt to remove the obejct from vault
     """
-    s3 = boto3.resource("s3")
-    bucket = s3.Bucket(get_vault_bucket_name())
-    obj = bucket.Object(file_id)
-    data = obj.delete()
+    s3 = get_boto3_client("s3")
+    bucket_name = get_vault_bucket_name()
+    data = s3.delete_object(Bucket=bucket_name, Key=file_id)
+    vault_cache.invalidate((bucket_name, file_id))
 
     return data
+
+
+async def save_to_vault_async(content, prefix=""):
+    """Save content to the Vault without blocking the event loop. See `save_to_vault`"""
+    return await run_in_thread(save_to_vault, content, prefix=prefix)
+
+
+async def fetch_from_vault_async(file_id, content_only=False, use_cache=True):
+    """Fetch an item from the Vault without blocking the event loop. See `fetch_from_vault`
+
+    Cached content is returned without leaving the event loop.
+    """
+    if use_cache:
+        data = vault_cache.get((get_vault_bucket_name(), file_id))
+        if data is not None:
+            return data if content_only else {"content": data}
+    return await run_in_thread(
+        fetch_from_vault, file_id, content_only=content_only, use_cache=use_cache
+    )
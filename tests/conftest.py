@@ -1,5 +1,8 @@
 from moto import mock_s3, mock_dynamodb2
 import boto3, pytest, os
+from socless.clients import reset_boto3_registry
+from socless.ssm import invalidate_ssm_cache
+from socless.vault import vault_cache
 
 
 def setup_vault():
@@ -86,3 +89,12 @@ def setup_socless(aws_credentials):
         setup_vault()
 
         yield
+
+
+@pytest.fixture(autouse=True)
+def reset_socless_clients():
+    """Drop cached boto3 clients, secrets and vault objects so tests don't leak state into each other."""
+    reset_boto3_registry()
+    invalidate_ssm_cache()
+    vault_cache.invalidate()
+    yield
@@ -15,7 +15,9 @@
 Helpers
 """
 import os
+from unittest.mock import patch
 from socless.utils import gen_id, gen_datetimenow
+from socless.events import build_results_table_item
 import boto3
 
 account_id = os.environ["MOTO_ACCOUNT_ID"]
@@ -38,6 +40,12 @@ def mock_integration_handler(context={}, firstname="", middlename="", lastname="
     return result
 
 
+async def mock_async_integration_handler(
+    context={}, firstname="", middlename="", lastname=""
+):
+    return mock_integration_handler(context, firstname, middlename, lastname)
+
+
 def mock_integration_handler_return_string(firstname="", middlename="", lastname=""):
     """Mock integration handler to return a string. It can be used to test StateHandler's error handling since it's supposed to raise an exception when an integration returns non-dict"""
     return "No dict"
@@ -116,6 +124,18 @@ def mock_execution_results_table_entry():
     }
 
 
+def put_compressed_results_item(context):
+    # setup an execution results table entry stored in the compressed format
+
+    execution_id = gen_id()
+    with patch("socless.resultsformat.RESULTS_STORAGE_FORMAT", "compressed"):
+        item = build_results_table_item(execution_id, gen_id(), context)
+    boto3.resource("dynamodb").Table(os.environ["SOCLESS_RESULTS_TABLE"]).put_item(
+        Item=item
+    )
+    return execution_id
+
+
 def mock_sfn_db_context():
     # setup db context for step function
 
@@ -0,0 +1,47 @@
+# Copyright 2018 Twilio, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+from tests.conftest import *  # imports testing boilerplate
+from concurrent.futures import ThreadPoolExecutor
+from socless.clients import (
+    get_boto3_client,
+    get_boto3_resource,
+    reset_boto3_registry,
+)
+
+
+def test_get_boto3_client_is_reused():
+    assert get_boto3_client("ssm") is get_boto3_client("ssm")
+
+
+def test_get_boto3_client_is_keyed_by_region():
+    default_client = get_boto3_client("ssm")
+    west_client = get_boto3_client("ssm", region_name="us-west-2")
+    assert default_client is not west_client
+    assert west_client.meta.region_name == "us-west-2"
+
+
+def test_get_boto3_resource_is_reused():
+    assert get_boto3_resource("dynamodb") is get_boto3_resource("dynamodb")
+
+
+def test_get_boto3_client_from_many_threads_builds_one_client():
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        clients = list(pool.map(lambda _: get_boto3_client("stepfunctions"), range(32)))
+    assert all(client is clients[0] for client in clients)
+
+
+def test_reset_boto3_registry():
+    client = get_boto3_client("ssm")
+    reset_boto3_registry()
+    assert get_boto3_client("ssm") is not client
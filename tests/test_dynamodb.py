@@ -0,0 +1,198 @@
+# Copyright 2018 Twilio, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+from tests.conftest import *  # imports testing boilerplate
+from unittest.mock import MagicMock, patch
+import pytest
+from socless.dynamodb import (
+    BATCH_WRITE_ITEM_LIMIT,
+    MAX_BATCH_ATTEMPTS,
+    batch_get_items,
+    batch_get_raw_items,
+    batch_put_items,
+    attribute_value_size,
+    deserialize_item,
+    item_size,
+    serialize_item,
+    serialize_value,
+)
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from socless.utils import replace_decimals, replace_floats_with_decimals
+from socless.exceptions import SoclessException
+from decimal import Decimal
+
+
+def test_batch_put_items_writes_across_tables_and_chunks():
+    events_table = os.environ["SOCLESS_EVENTS_TABLE"]
+    dedup_table = os.environ["SOCLESS_DEDUP_TABLE"]
+    puts = [(events_table, {"id": f"batch_event_{i}"}) for i in range(30)]
+    puts += [(dedup_table, {"dedup_hash": "batch_hash", "current_investigation_id": "1"})]
+
+    batch_put_items(puts)
+
+    dynamodb = boto3.resource("dynamodb")
+    for i in range(30):
+        item = dynamodb.Table(events_table).get_item(Key={"id": f"batch_event_{i}"})
+        assert "Item" in item
+    assert "Item" in dynamodb.Table(dedup_table).get_item(Key={"dedup_hash": "batch_hash"})
+
+
+def test_batch_put_items_retries_unprocessed_items():
+    unprocessed = {"table": [{"PutRequest": {"Item": {"id": "2"}}}]}
+    fake_dynamodb = MagicMock()
+    fake_dynamodb.batch_write_item.side_effect = [
+        {"UnprocessedItems": unprocessed},
+        {"UnprocessedItems": {}},
+    ]
+    with patch("socless.dynamodb.get_boto3_resource", return_value=fake_dynamodb), patch(
+        "socless.dynamodb.time.sleep"
+    ) as sleep:
+        batch_put_items([("table", {"id": "1"}), ("table", {"id": "2"})])
+
+    assert fake_dynamodb.batch_write_item.call_count == 2
+    fake_dynamodb.batch_write_item.assert_called_with(RequestItems=unprocessed)
+    sleep.assert_called_once()
+
+
+def test_batch_put_items_fails_when_items_stay_unprocessed():
+    unprocessed = {"table": [{"PutRequest": {"Item": {"id": "1"}}}]}
+    fake_dynamodb = MagicMock()
+    fake_dynamodb.batch_write_item.return_value = {"UnprocessedItems": unprocessed}
+    with patch("socless.dynamodb.get_boto3_resource", return_value=fake_dynamodb), patch(
+        "socless.dynamodb.time.sleep"
+    ):
+        with pytest.raises(SoclessException, match="1 items were still unprocessed"):
+            batch_put_items([("table", {"id": "1"})])
+
+    assert fake_dynamodb.batch_write_item.call_count == MAX_BATCH_ATTEMPTS
+
+
+def test_batch_put_items_sends_at_most_25_items_per_call():
+    fake_dynamodb = MagicMock()
+    fake_dynamodb.batch_write_item.return_value = {"UnprocessedItems": {}}
+    with patch("socless.dynamodb.get_boto3_resource", return_value=fake_dynamodb):
+        batch_put_items([("table", {"id": str(i)}) for i in range(60)])
+
+    sizes = [
+        len(call.kwargs["RequestItems"]["table"])
+        for call in fake_dynamodb.batch_write_item.call_args_list
+    ]
+    assert sizes == [BATCH_WRITE_ITEM_LIMIT, BATCH_WRITE_ITEM_LIMIT, 10]
+
+
+def test_batch_get_items_returns_existing_items():
+    events_table = os.environ["SOCLESS_EVENTS_TABLE"]
+    batch_put_items([(events_table, {"id": f"get_event_{i}"}) for i in range(3)])
+
+    keys = [{"id": f"get_event_{i}"} for i in range(3)] + [{"id": "get_event_missing"}]
+    items = batch_get_items(events_table, keys)
+
+    assert sorted(item["id"] for item in items) == [f"get_event_{i}" for i in range(3)]
+
+
+def test_batch_get_items_retries_unprocessed_keys():
+    unprocessed = {"table": {"Keys": [{"id": "2"}], "ConsistentRead": False}}
+    fake_dynamodb = MagicMock()
+    fake_dynamodb.batch_get_item.side_effect = [
+        {"Responses": {"table": [{"id": "1"}]}, "UnprocessedKeys": unprocessed},
+        {"Responses": {"table": [{"id": "2"}]}, "UnprocessedKeys": {}},
+    ]
+    with patch("socless.dynamodb.get_boto3_resource", return_value=fake_dynamodb), patch(
+        "socless.dynamodb.time.sleep"
+    ):
+        items = batch_get_items("table", [{"id": "1"}, {"id": "2"}])
+
+    assert items == [{"id": "1"}, {"id": "2"}]
+    fake_dynamodb.batch_get_item.assert_called_with(RequestItems=unprocessed)
+
+
+def test_batch_get_raw_items_applies_table_request():
+    events_table = os.environ["SOCLESS_EVENTS_TABLE"]
+    batch_put_items([(events_table, {"id": "raw_event", "other": "value"})])
+
+    items = batch_get_raw_items(
+        events_table,
+        [{"id": {"S": "raw_event"}}],
+        ConsistentRead=True,
+        ProjectionExpression="id",
+    )
+
+    assert items == [{"id": {"S": "raw_event"}}]
+
+
+def test_attribute_value_size_follows_dynamodb_sizing_rules():
+    assert attribute_value_size("héllo") == 6
+    assert attribute_value_size(b"abc") == 3
+    assert attribute_value_size(True) == 1
+    assert attribute_value_size(None) == 1
+    assert attribute_value_size(Decimal("12345")) == 4
+    assert attribute_value_size(["ab", "c"]) == 3 + (1 + 2) + (1 + 1)
+    assert attribute_value_size({"ab": "c"}) == 3 + (1 + 2 + 1)
+
+
+def test_item_size_counts_attribute_names_and_values():
+    assert item_size({"id": "abc", "n": 1}) == (2 + 3) + (1 + 2)
+
+
+SAMPLE_ITEM = {
+    "execution_id": "abc",
+    "results": {
+        "artifacts": {"event": {"details": {"int": 47, "float": 0.07}}},
+        "results": {"State": {"list": [1, 2.5, "three", None, True], "empty": ""}},
+        "tags": {"a", "b"},
+        "numbers": {1, 2},
+        "blob": b"bytes",
+    },
+}
+
+
+def test_serialize_item_matches_boto3_serializer():
+    boto3_serializer = TypeSerializer()
+    expected = {
+        name: boto3_serializer.serialize(value)
+        for name, value in replace_floats_with_decimals(SAMPLE_ITEM).items()
+    }
+    serialized = serialize_item(SAMPLE_ITEM)
+    # sets are unordered
+    for name in ("tags", "numbers"):
+        for item in (expected, serialized):
+            values = item["results"]["M"][name]
+            kind = next(iter(values))
+            values[kind] = sorted(values[kind])
+    assert serialized == expected
+
+
+def test_deserialize_item_matches_boto3_with_replace_decimals():
+    wire_item = serialize_item(SAMPLE_ITEM)
+    boto3_deserializer = TypeDeserializer()
+    expected = replace_decimals(
+        {name: boto3_deserializer.deserialize(value) for name, value in wire_item.items()}
+    )
+    deserialized = deserialize_item(wire_item)
+    expected["results"]["numbers"] = {1, 2}  # replace_decimals doesn't walk sets
+    assert deserialized == expected
+    details = deserialized["results"]["artifacts"]["event"]["details"]
+    assert type(details["int"]) is int
+    assert type(details["float"]) is float
+
+
+def test_serialize_value_round_trips_exponents():
+    assert deserialize_item(serialize_item({"big": 1e20, "small": 1e-7})) == {
+        "big": 1e20,
+        "small": 1e-7,
+    }
+
+
+def test_serialize_value_rejects_nan():
+    with pytest.raises(TypeError):
+        serialize_value(float("nan"))
@@ -18,13 +18,17 @@ from .helpers import MockLambdaContext, dict_to_item
 import json, os
 import pytest
 from moto import mock_stepfunctions, mock_iam
-from socless.utils import gen_datetimenow
+from socless.utils import gen_datetimenow, gen_id
 from socless.exceptions import SoclessEventsError
 
+from unittest.mock import patch
+from socless.dynamodb import batch_get_items
+from socless.metrics import metrics
 from socless.events import (
     InitialEvent,
     CompleteEvent,
     create_events,
+    deduplicate_events,
     get_playbook_arn,
     setup_socless_global_state_from_running_step_functions_execution,
 )
@@ -266,6 +270,32 @@ def test_create_events_with_multiple_details_and_duplicates():
     assert len(results["events"]) == len(results["execution_reports"])
 
 
+@mock_stepfunctions
+@mock_iam
+def test_create_events_emits_metrics(capfd):
+    _ = setup_for_step_functions_and_return_client(MOCK_PLAYBOOK_NAME)
+    username = gen_id()
+    event = {
+        **MOCK_EVENT,
+        "details": [{"username": username}, {"username": username}],
+        "dedup_keys": ["username"],
+    }
+    capfd.readouterr()
+    with patch.object(metrics, "enabled", True):
+        create_events(event_details=event, context=MockLambdaContext())
+
+    documents = [
+        json.loads(line)
+        for line in capfd.readouterr()[0].splitlines()
+        if line.startswith('{"_aws"')
+    ]
+    assert len(documents) == 1
+    assert documents[0]["EventsCreated"] == 2
+    assert documents[0]["DedupHits"] == 1
+    assert documents[0]["PlaybookStartFailures"] == 0
+    assert len(documents[0]["PlaybookStartLatency"]) == 2
+
+
 @mock_stepfunctions
 @mock_iam
 def test_create_events_with_details_as_dict_not_list():
@@ -363,3 +393,157 @@ def test_setup_socless_global_state_from_running_step_functions_execution():
 
     assert result["artifacts"]["event"]["details"] == playbook_event_details
     assert result["execution_id"] == execution_id
+
+
+@mock_stepfunctions
+@mock_iam
+def test_create_events_detects_duplicates_within_the_same_batch():
+    # setup playbook
+    _ = setup_for_step_functions_and_return_client(MOCK_PLAYBOOK_NAME)
+
+    # unique usernames, so earlier tests' dedup mappings don't match
+    username = gen_id()
+    unique_batch = {
+        **MOCK_EVENT_BATCH,
+        "details": [{**details, "username": username} for details in MOCK_EVENT_BATCH["details"]],
+    }
+    results = create_events(event_details=unique_batch, context=MockLambdaContext())
+    first, second, third = [event["metadata"] for event in results["events"]]
+    assert not first["is_duplicate"] and not second["is_duplicate"]
+    assert third["is_duplicate"]
+    assert third["investigation_id"] == first["investigation_id"]
+
+
+@mock_stepfunctions
+@mock_iam
+def test_create_events_persists_large_batches():
+    # setup playbook
+    _ = setup_for_step_functions_and_return_client(MOCK_PLAYBOOK_NAME)
+
+    many_details = {
+        **MOCK_EVENT,
+        "details": [{"username": f"user_{i}"} for i in range(30)],
+    }
+    results = create_events(event_details=many_details, context=MockLambdaContext())
+    assert len(results["execution_reports"]) == 30
+
+    dynamodb = boto3.resource("dynamodb")
+    events_table = dynamodb.Table(os.environ["SOCLESS_EVENTS_TABLE"])
+    results_table = dynamodb.Table(os.environ["SOCLESS_RESULTS_TABLE"])
+    for event in results["events"]:
+        metadata = event["metadata"]
+        assert "Item" in events_table.get_item(Key={"id": metadata["_id"]})
+        saved = results_table.get_item(Key={"execution_id": metadata["execution_id"]})
+        assert saved["Item"]["investigation_id"] == metadata["investigation_id"]
+
+
+@mock_stepfunctions
+@mock_iam
+def test_create_events_with_concurrent_starts_keeps_report_order():
+    # setup playbook
+    _ = setup_for_step_functions_and_return_client(MOCK_PLAYBOOK_NAME)
+
+    many_details = {
+        **MOCK_EVENT,
+        "details": [{"username": gen_id()} for _ in range(10)],
+    }
+    results = create_events(
+        event_details=many_details, context=MockLambdaContext(), max_concurrent_starts=4
+    )
+    assert [event["metadata"]["execution_id"] for event in results["events"]] == [
+        report["execution_id"] for report in results["execution_reports"]
+    ]
+    assert not any(report["error"] for report in results["execution_reports"])
+
+
+@mock_stepfunctions
+@mock_iam
+def test_create_events_with_concurrent_starts_reports_every_failure():
+    # setup playbook
+    _ = setup_for_step_functions_and_return_client(MOCK_PLAYBOOK_NAME)
+
+    modified_event = {
+        **MOCK_EVENT,
+        "playbook": "doesnt exist",
+        "details": [{"username": gen_id()} for _ in range(3)],
+    }
+    with pytest.raises(
+        SoclessEventsError, match="3 of 3 events failed to start playbooks."
+    ):
+        _ = create_events(
+            event_details=modified_event,
+            context=MockLambdaContext(),
+            max_concurrent_starts=3,
+        )
+
+
+def put_existing_investigation(dedup_hash, event_id, investigation_id, status_):
+    client = boto3.client("dynamodb")
+    client.put_item(
+        TableName=os.environ["SOCLESS_DEDUP_TABLE"],
+        Item=dict_to_item(
+            {"dedup_hash": dedup_hash, "current_investigation_id": event_id},
+            convert_root=False,
+        ),
+    )
+    client.put_item(
+        TableName=os.environ["SOCLESS_EVENTS_TABLE"],
+        Item=dict_to_item(
+            {"id": event_id, "investigation_id": investigation_id, "status_": status_},
+            convert_root=False,
+        ),
+    )
+
+
+def test_deduplicate_events_uses_batched_reads_and_collapses_hashes():
+    open_event = CompleteEvent(**{**MOCK_EVENT, "details": {"username": gen_id()}})
+    closed_event = CompleteEvent(**{**MOCK_EVENT, "details": {"username": gen_id()}})
+    put_existing_investigation(
+        open_event.event.dedup_hash, gen_id(), "open_investigation", "open"
+    )
+    put_existing_investigation(
+        closed_event.event.dedup_hash, gen_id(), "closed_investigation", "closed"
+    )
+    new_details = {"username": gen_id()}
+    events = [
+        open_event,
+        closed_event,
+        CompleteEvent(**{**MOCK_EVENT, "details": new_details}),
+        CompleteEvent(**{**MOCK_EVENT, "details": new_details}),
+        CompleteEvent(**{**MOCK_EVENT, "details": new_details, "dedup_keys": []}),
+    ]
+
+    with patch("socless.events.batch_get_items", wraps=batch_get_items) as batch_get:
+        new_dedup_mappings = deduplicate_events(events)
+
+    # one read of the dedup table, one of the events table
+    assert batch_get.call_count == 2
+    metadata = [event.metadata for event in events]
+    assert metadata[0].is_duplicate
+    assert metadata[0].investigation_id == "open_investigation"
+    assert not metadata[1].is_duplicate
+    assert not metadata[2].is_duplicate
+    assert metadata[3].is_duplicate
+    assert metadata[3].investigation_id == metadata[2].investigation_id
+    assert not metadata[4].is_duplicate
+    assert new_dedup_mappings == [
+        {
+            "dedup_hash": events[1].event.dedup_hash,
+            "current_investigation_id": metadata[1].investigation_id,
+        },
+        {
+            "dedup_hash": events[2].event.dedup_hash,
+            "current_investigation_id": metadata[2].investigation_id,
+        },
+    ]
+
+
+def test_deduplicate_events_without_dedup_keys_reads_nothing():
+    events = [
+        CompleteEvent(
+            **{**MOCK_EVENT, "details": {"username": gen_id()}, "dedup_keys": []}
+        )
+    ]
+    with patch("socless.events.batch_get_items") as batch_get:
+        assert deduplicate_events(events) == []
+    batch_get.assert_not_called()
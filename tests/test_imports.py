@@ -0,0 +1,89 @@
+# Copyright 2018 Twilio, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+"""Import-time regression tests.
+
+Each check runs in a fresh interpreter, since the test session itself has
+already imported everything.
+"""
+import json, subprocess, sys
+import pytest
+import socless
+
+
+def loaded_modules_after(import_statement: str) -> set:
+    script = f"import sys, json\n{import_statement}\nprint(json.dumps(list(sys.modules)))"
+    output = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, check=True, text=True
+    ).stdout
+    return set(json.loads(output))
+
+
+def test_import_socless_loads_no_heavy_modules():
+    loaded = loaded_modules_after("import socless")
+    heavy_modules = {
+        "boto3",
+        "botocore",
+        "jinja2",
+        "pytz",
+        "simplejson",
+        "socless.socless",
+        "socless.events",
+        "socless.integrations",
+        "socless.jinja",
+        "socless.vault",
+    }
+    assert not heavy_modules & loaded
+
+
+def test_import_socless_bootstrap_skips_unrelated_modules():
+    loaded = loaded_modules_after("from socless import socless_bootstrap")
+    assert "socless.integrations" in loaded
+    unrelated_modules = {
+        "pytz",
+        "socless.socless",
+        "socless.events",
+        "socless.humaninteraction",
+        "socless.legacy_jinja",
+    }
+    assert not unrelated_modules & loaded
+
+
+def test_import_legacy_api_skips_integration_modules():
+    loaded = loaded_modules_after("from socless import socless_log")
+    assert "socless.socless" in loaded
+    integration_modules = {
+        "socless.events",
+        "socless.integrations",
+        "socless.paramresolver",
+        "socless.resultsformat",
+    }
+    assert not integration_modules & loaded
+
+
+@pytest.mark.parametrize("name", socless.__all__)
+def test_public_api_is_importable(name):
+    assert getattr(socless, name) is not None
+
+
+def test_public_api_resolves_to_same_objects_as_before():
+    from socless import vault, integrations, socless as legacy
+
+    assert socless.fetch_from_vault is vault.fetch_from_vault
+    assert socless.socless_template_string is integrations.socless_template_string
+    assert socless.socless_log is legacy.socless_log
+
+
+def test_unknown_attribute_raises_attribute_error():
+    with pytest.raises(AttributeError):
+        socless.does_not_exist
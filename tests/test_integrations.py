@@ -11,17 +11,32 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License
-import boto3, pytest, os
+import asyncio, boto3, pytest, os, json
 from moto import mock_ssm
-from socless.integrations import StateHandler, ExecutionContext
+from unittest.mock import patch
+from socless.integrations import (
+    StateHandler,
+    ExecutionContext,
+    StateResults,
+    OFFLOADED_RESULT_KEY,
+    build_context_projection,
+    socless_bootstrap,
+    socless_bootstrap_async,
+    socless_bootstrap_batch,
+    fetch_contexts,
+    merge_projections,
+)
 from socless.utils import gen_id
+from socless.metrics import metrics
 from socless.exceptions import SoclessBootstrapError
 from .helpers import (
     mock_integration_handler,
+    mock_async_integration_handler,
     mock_integration_handler_return_string,
     MockLambdaContext,
     mock_sfn_db_context,
     mock_execution_results_table_entry,
+    put_compressed_results_item,
 )
 from socless.paramresolver import ParameterResolver, resolve_string_parameter
 
@@ -94,6 +109,86 @@ def test_ExecutionContext_save_state_results():
     assert saved_result["Item"]["results"]["results"][state_name] == result
 
 
+def test_ExecutionContext_save_state_results_offloads_large_results():
+    item_metadata = mock_execution_results_table_entry()
+    state_name = "large_state"
+    result = {"blob": "x" * 2048, "float": 0.5}
+    execution = ExecutionContext(item_metadata["execution_id"])
+    with patch("socless.integrations.RESULTS_OFFLOAD_THRESHOLD", 1024):
+        execution.save_state_results(state_name=state_name, result=result)
+
+    results_table = boto3.resource("dynamodb").Table(
+        os.environ["SOCLESS_RESULTS_TABLE"]
+    )
+    saved_item = results_table.get_item(
+        Key={"execution_id": item_metadata["execution_id"]}
+    )["Item"]
+    pointer = saved_item["results"]["results"][state_name]
+    assert pointer[OFFLOADED_RESULT_KEY].startswith("vault:")
+    assert saved_item["results"]["results"]["_Last_Saved_Results"] == pointer
+
+    state_results = execution.fetch_context()["results"]["results"]
+    assert isinstance(state_results, StateResults)
+    assert state_results[state_name] == result
+    assert state_results.get("_Last_Saved_Results") == result
+
+
+def test_legacy_fetch_execution_result_rehydrates_offloaded_results():
+    from socless.socless import socless_fetch_execution_result
+
+    item_metadata = mock_execution_results_table_entry()
+    result = {"blob": "x" * 2048}
+    execution = ExecutionContext(item_metadata["execution_id"])
+    with patch("socless.integrations.RESULTS_OFFLOAD_THRESHOLD", 1024):
+        execution.save_state_results(state_name="large_state", result=result)
+
+    item = socless_fetch_execution_result(item_metadata["execution_id"], "reader")
+    assert item["results"]["results"]["large_state"] == result
+
+
+def test_StateResults_copies_rehydrate_offloaded_results():
+    with patch("socless.integrations.fetch_from_vault") as mock_fetch:
+        mock_fetch.return_value = '{"a": 1}'
+        state_results = StateResults(
+            {"offloaded": {OFFLOADED_RESULT_KEY: "vault:some_file"}}
+        )
+        assert dict(state_results) == {"offloaded": {"a": 1}}
+        assert {**state_results} == {"offloaded": {"a": 1}}
+
+
+def test_ExecutionContext_save_state_results_keeps_small_results_inline():
+    item_metadata = mock_execution_results_table_entry()
+    execution = ExecutionContext(item_metadata["execution_id"])
+    with patch("socless.integrations.RESULTS_OFFLOAD_THRESHOLD", 1024):
+        execution.save_state_results(state_name="small_state", result={"ok": True})
+    state_results = execution.fetch_context()["results"]["results"]
+    assert dict.__getitem__(state_results, "small_state") == {"ok": True}
+
+
+def test_StateResults_rehydrates_only_accessed_results():
+    with patch("socless.integrations.fetch_from_vault") as mock_fetch:
+        mock_fetch.return_value = '{"a": 1}'
+        state_results = StateResults(
+            {
+                "offloaded": {OFFLOADED_RESULT_KEY: "vault:some_file"},
+                "inline": {"b": 2},
+            }
+        )
+        assert state_results["inline"] == {"b": 2}
+        mock_fetch.assert_not_called()
+        assert state_results["offloaded"] == {"a": 1}
+        assert state_results["offloaded"] == {"a": 1}
+        mock_fetch.assert_called_once_with("some_file", content_only=True)
+
+
+def test_ExecutionContext_fetch_item_size():
+    item_metadata = mock_execution_results_table_entry()
+    execution = ExecutionContext(item_metadata["execution_id"])
+    report = execution.fetch_item_size()
+    assert 0 < report["item_bytes"] < report["limit_bytes"]
+    assert report["ratio"] == report["item_bytes"] / report["limit_bytes"]
+
+
 def test_StateHandler_init_with_testing_event():
     # test StateHandler init with testing event to assert variables are as expected
 
@@ -482,3 +577,340 @@ def test_StateHandler_execute_with_live_event_returning_non_dict():
 
 def test_socless_bootstrap_can_be_imported():
     from socless import socless_bootstrap  # noqa: F401, E261
+
+
+def test_build_context_projection_merges_overlapping_paths():
+    assert build_context_projection(
+        [
+            ("artifacts", "event", "details"),
+            ("artifacts",),
+            ("results", "State", "nested", "key"),
+        ]
+    ) == [
+        ("execution_id",),
+        ("results", "artifacts"),
+        ("results", "results", "State"),
+    ]
+
+
+def test_StateHandler_fetches_only_referenced_context():
+    item_metadata = mock_execution_results_table_entry()
+    live_event = {
+        "execution_id": item_metadata["execution_id"],
+        "artifacts": {"execution_id": item_metadata["execution_id"]},
+        "State_Config": {
+            "Name": "test",
+            "Parameters": {
+                "firstname": "$.artifacts.event.details.some",
+                "lastname": "{{ context.artifacts.event.details.some_int }}",
+            },
+        },
+    }
+    state_handler = StateHandler(
+        live_event, MockLambdaContext(), mock_integration_handler
+    )
+    assert state_handler._context_is_partial
+    assert state_handler._context["artifacts"] == {
+        "event": {"details": {"some": "randon text", "some_int": 47}}
+    }
+    assert state_handler.execute() == {
+        "firstname": "randon text",
+        "middlename": "",
+        "lastname": 47,
+    }
+    # the full context is still available on demand
+    assert (
+        state_handler.context["artifacts"]["event"]["event_type"]
+        == "Test integrations"
+    )
+    assert not state_handler._context_is_partial
+
+
+def test_StateHandler_fetches_whole_context_for_include_event():
+    item_metadata = mock_execution_results_table_entry()
+    live_event = {
+        "execution_id": item_metadata["execution_id"],
+        "artifacts": {"execution_id": item_metadata["execution_id"]},
+        "State_Config": {
+            "Name": "test",
+            "Parameters": {"firstname": "$.artifacts.event.details.some"},
+        },
+    }
+    state_handler = StateHandler(
+        live_event,
+        MockLambdaContext(),
+        mock_integration_handler,
+        include_event=True,
+    )
+    assert not state_handler._context_is_partial
+    assert (
+        state_handler._context["artifacts"]["event"]["event_type"]
+        == "Test integrations"
+    )
+
+
+def test_ExecutionContext_reads_and_writes_compressed_items():
+    context = {
+        "artifacts": {"event": {"details": {"score": 0.25}}},
+        "errors": {},
+        "results": {},
+    }
+    execution_id = put_compressed_results_item(context)
+    execution = ExecutionContext(execution_id)
+    assert execution.fetch_context()["results"] == context
+
+    execution.save_state_results("First", {"float": 1.5})
+    with patch("socless.resultsformat.RESULTS_STORAGE_FORMAT", "compressed"):
+        execution.save_state_results("Second", {"ok": True}, errors={"e": ""})
+
+    saved = execution.fetch_context()
+    assert "results" in saved and "results_blob" not in saved
+    assert saved["results"]["results"] == {
+        "First": {"float": 1.5},
+        "Second": {"ok": True},
+        "_Last_Saved_Results": {"ok": True},
+    }
+    assert saved["results"]["errors"] == {"e": None}
+
+
+def test_ExecutionContext_compressed_format_still_saves_map_items():
+    item_metadata = mock_execution_results_table_entry()
+    execution = ExecutionContext(item_metadata["execution_id"])
+    with patch("socless.resultsformat.RESULTS_STORAGE_FORMAT", "compressed"):
+        execution.save_state_results("State", {"ok": True})
+    saved_item = (
+        boto3.resource("dynamodb")
+        .Table(os.environ["SOCLESS_RESULTS_TABLE"])
+        .get_item(Key={"execution_id": item_metadata["execution_id"]})["Item"]
+    )
+    assert saved_item["results"]["results"]["State"] == {"ok": True}
+
+
+def test_StateHandler_projection_reads_compressed_items():
+    execution_id = put_compressed_results_item(
+        {"artifacts": {"event": {"details": {"some": "compressed"}}}, "results": {}}
+    )
+    live_event = {
+        "execution_id": execution_id,
+        "State_Config": {
+            "Name": "test",
+            "Parameters": {"firstname": "$.artifacts.event.details.some"},
+        },
+    }
+    state_handler = StateHandler(
+        live_event, MockLambdaContext(), mock_integration_handler
+    )
+    assert state_handler.execute()["firstname"] == "compressed"
+
+
+def test_StateHandler_execute_emits_phase_metrics(capfd):
+    item_metadata = mock_execution_results_table_entry()
+    live_event = {
+        "execution_id": item_metadata["execution_id"],
+        "State_Config": {
+            "Name": "test",
+            "Parameters": {"firstname": "$.artifacts.event.details.some"},
+        },
+    }
+    with patch.object(metrics, "enabled", True):
+        state_handler = StateHandler(
+            live_event, MockLambdaContext(), mock_integration_handler
+        )
+        state_handler.execute()
+    documents = [
+        json.loads(line)
+        for line in capfd.readouterr()[0].splitlines()
+        if line.startswith('{"_aws"')
+    ]
+    assert len(documents) == 1
+    for name in ("ContextFetchTime", "ResolveTime", "HandlerTime", "SaveTime"):
+        assert documents[0][name] >= 0
+
+
+def test_socless_bootstrap_runs_coroutine_handlers():
+    item_metadata = mock_execution_results_table_entry()
+    live_event = {
+        "execution_id": item_metadata["execution_id"],
+        "State_Config": {
+            "Name": "AsyncState",
+            "Parameters": {"firstname": "$.artifacts.event.details.some"},
+        },
+    }
+    result = socless_bootstrap(
+        live_event, MockLambdaContext(), mock_async_integration_handler
+    )
+    expected = {"firstname": "randon text", "middlename": "", "lastname": ""}
+    assert result["results"]["AsyncState"] == expected
+
+    saved = ExecutionContext(item_metadata["execution_id"]).fetch_context()
+    assert saved["results"]["results"]["AsyncState"] == expected
+
+
+def test_socless_bootstrap_async_with_include_event():
+    item_metadata = mock_execution_results_table_entry()
+    live_event = {
+        "execution_id": item_metadata["execution_id"],
+        "State_Config": {"Name": "AsyncState", "Parameters": {"firstname": "Lana"}},
+    }
+
+    async def handler(context, firstname):
+        return {"firstname": firstname, "has_artifacts": "artifacts" in context}
+
+    result = asyncio.run(
+        socless_bootstrap_async(
+            live_event, MockLambdaContext(), handler, include_event=True
+        )
+    )
+    assert result["results"]["AsyncState"] == {
+        "firstname": "Lana",
+        "has_artifacts": True,
+    }
+
+
+def test_socless_bootstrap_async_fails_on_non_dict_result():
+    testing_event = {
+        "_testing": True,
+        "State_Config": {"Name": "test", "Parameters": {"firstname": "Pam"}},
+    }
+
+    async def handler(firstname):
+        return firstname
+
+    with pytest.raises(SoclessBootstrapError):
+        socless_bootstrap(testing_event, MockLambdaContext(), handler)
+
+
+def test_merge_projections_covers_every_projection():
+    assert merge_projections(
+        [
+            [("execution_id",), ("results", "artifacts", "event")],
+            [("execution_id",), ("results", "artifacts")],
+        ]
+    ) == [("execution_id",), ("results", "artifacts")]
+    assert merge_projections([[("execution_id",)], None]) is None
+
+
+def test_fetch_contexts_reads_many_executions():
+    first = mock_execution_results_table_entry()
+    second = mock_execution_results_table_entry()
+
+    contexts = fetch_contexts(
+        [first["execution_id"], second["execution_id"], "missing_execution"],
+        build_context_projection([("artifacts", "event", "details")]),
+    )
+
+    assert set(contexts) == {first["execution_id"], second["execution_id"]}
+    details = contexts[first["execution_id"]]["results"]["artifacts"]["event"]["details"]
+    assert details["some"] == "randon text"
+
+
+def batch_event(execution_id, state_name, parameters):
+    return {
+        "execution_id": execution_id,
+        "State_Config": {"Name": state_name, "Parameters": parameters},
+    }
+
+
+def test_socless_bootstrap_batch_reports_per_item_errors():
+    item_metadata = mock_execution_results_table_entry()
+    execution_id = item_metadata["execution_id"]
+    events = [
+        batch_event(execution_id, "First", {"firstname": "$.artifacts.event.details.some"}),
+        batch_event("missing_execution", "Second", {"firstname": "Ray"}),
+        {"execution_id": execution_id, "State_Config": {"Parameters": {}}},
+        batch_event(execution_id, "Fourth", {"lastname": "Gillette"}),
+    ]
+
+    outcomes = socless_bootstrap_batch(
+        events, MockLambdaContext(), mock_integration_handler
+    )
+
+    assert [outcome["status"] for outcome in outcomes] == [
+        "SUCCEEDED",
+        "FAILED",
+        "FAILED",
+        "SUCCEEDED",
+    ]
+    assert outcomes[0]["event"]["results"]["First"]["firstname"] == "randon text"
+    assert outcomes[1]["error"]["Error"] == "SoclessBootstrapError"
+    assert "missing_execution" in outcomes[1]["error"]["Cause"]
+    assert outcomes[2]["error"]["Cause"] == "`Name` not set in State_Config"
+
+    saved = ExecutionContext(execution_id).fetch_context()["results"]["results"]
+    assert saved["First"]["firstname"] == "randon text"
+    assert saved["Fourth"]["lastname"] == "Gillette"
+
+
+def test_socless_bootstrap_batch_runs_items_concurrently():
+    executions = [mock_execution_results_table_entry() for _ in range(3)]
+    events = [
+        batch_event(item["execution_id"], "Concurrent", {"firstname": f"Agent {i}"})
+        for i, item in enumerate(executions)
+    ]
+
+    outcomes = socless_bootstrap_batch(
+        events, MockLambdaContext(), mock_integration_handler, max_workers=3
+    )
+
+    for i, outcome in enumerate(outcomes):
+        assert outcome["event"]["results"]["Concurrent"]["firstname"] == f"Agent {i}"
+
+
+def test_socless_bootstrap_batch_with_coroutine_handler():
+    item_metadata = mock_execution_results_table_entry()
+    testing_event = {
+        "_testing": True,
+        "State_Config": {"Name": "test", "Parameters": {"firstname": "Cheryl"}},
+    }
+    events = [
+        testing_event,
+        batch_event(item_metadata["execution_id"], "AsyncState", {"lastname": "Tunt"}),
+    ]
+
+    outcomes = socless_bootstrap_batch(
+        events, MockLambdaContext(), mock_async_integration_handler, max_workers=2
+    )
+
+    assert outcomes[0]["event"]["results"]["test"]["firstname"] == "Cheryl"
+    assert outcomes[1]["event"]["results"]["AsyncState"]["lastname"] == "Tunt"
+
+
+def test_socless_bootstrap_batch_isolates_undecodable_items():
+    results_table = boto3.resource("dynamodb").Table(os.environ["SOCLESS_RESULTS_TABLE"])
+    no_results_id, corrupt_id = gen_id(), gen_id()
+    results_table.put_item(Item={"execution_id": no_results_id})
+    results_table.put_item(
+        Item={
+            "execution_id": corrupt_id,
+            "results_format": 2,
+            "results_blob": b"not zlib",
+        }
+    )
+    item_metadata = mock_execution_results_table_entry()
+    events = [
+        batch_event(no_results_id, "NoResults", {"firstname": "Ray"}),
+        batch_event(corrupt_id, "Corrupt", {"firstname": "Ray"}),
+        batch_event(item_metadata["execution_id"], "Fine", {"firstname": "Ray"}),
+    ]
+
+    outcomes = socless_bootstrap_batch(
+        events, MockLambdaContext(), mock_integration_handler
+    )
+
+    assert [outcome["status"] for outcome in outcomes] == [
+        "FAILED",
+        "FAILED",
+        "SUCCEEDED",
+    ]
+
+
+def test_socless_bootstrap_batch_leaves_no_log_fields_bound():
+    from socless.logger import socless_log
+
+    item_metadata = mock_execution_results_table_entry()
+    events = [batch_event(item_metadata["execution_id"], "Bound", {"firstname": "Ray"})]
+
+    socless_bootstrap_batch(events, MockLambdaContext(), mock_integration_handler)
+
+    assert "execution_id" not in socless_log._bound_context
+    assert "state_name" not in socless_log._bound_context
@@ -14,7 +14,19 @@
 import json, pytest
 from tests.conftest import *  # imports testing boilerplate
 from moto import mock_ssm
-from socless.jinja import fromjson, vault, jinja_env, fromtimestamp, datetime_from_now
+from unittest.mock import patch
+from socless.jinja import (
+    fromjson,
+    vault,
+    jinja_env,
+    fromtimestamp,
+    datetime_from_now,
+    get_compiled_template,
+    render_jinja_from_string,
+    SoclessNativeEnvironment,
+    RENDER_OUTPUT_LIMIT,
+)
+from jinja2.nativetypes import NativeEnvironment
 from socless.exceptions import SoclessBootstrapError
 
 TEST_SECRET_PATH = "/socless/test/mock_secret"
@@ -140,3 +152,134 @@ def test_jinja_bad_delta_datetime_from_now():
         result = datetime_from_now(
             days=1, hours=-1, minutes="bad_parameter", tz="US/Pacific"
         )
+
+
+@pytest.mark.parametrize(
+    "template_string",
+    ["plain text", "[A-Z]{16}", "123", "[1, 2]", "True", "trailing newline\n", ""],
+)
+def test_render_jinja_from_string_fast_path_matches_jinja(template_string):
+    expected = jinja_env.from_string(template_string).render(context={})
+    with patch("socless.jinja.get_compiled_template") as compile_template:
+        rendered = render_jinja_from_string(template_string, {})
+    compile_template.assert_not_called()
+    assert rendered == expected
+    assert type(rendered) == type(expected)
+
+
+def test_render_jinja_from_string_reuses_compiled_templates():
+    template_string = "{{ context.name }} reuses its compiled template"
+    get_compiled_template.cache_clear()
+
+    first = render_jinja_from_string(template_string, {"name": "first"})
+    second = render_jinja_from_string(template_string, {"name": "second"})
+
+    assert first == "first reuses its compiled template"
+    assert second == "second reuses its compiled template"
+    cache_info = get_compiled_template.cache_info()
+    assert cache_info.misses == 1
+    assert cache_info.hits == 1
+
+
+@pytest.mark.parametrize(
+    "value",
+    ["123", "-1.5", "[1, 2]", "{'a': 1}", "True", "None", " 123", "hello", "'x'", "b"],
+)
+def test_native_environment_converts_literals_like_jinja(value):
+    template_string = "{{ context.value }}"
+    expected = NativeEnvironment().from_string(template_string).render(
+        context={"value": value}
+    )
+    assert render_jinja_from_string(template_string, {"value": value}) == expected
+
+
+@pytest.mark.parametrize("value", ["\n123", "\r\n[1]", "# comment\n1"])
+def test_native_environment_keeps_strings_starting_with_line_breaks(value):
+    # NativeEnvironment converts these, see SoclessNativeEnvironment
+    assert render_jinja_from_string("{{ context.value }}", {"value": value}) == value
+
+
+def test_native_environment_skips_parsing_non_literals():
+    with patch("socless.jinja.literal_eval") as literal_eval:
+        rendered = render_jinja_from_string(
+            "{{ context.name }} logged in", {"name": "Sterling"}
+        )
+    literal_eval.assert_not_called()
+    assert rendered == "Sterling logged in"
+
+
+def test_native_environment_keeps_large_strings():
+    env = SoclessNativeEnvironment(literal_max_length=10)
+    template = env.from_string("{{ context.value }}")
+    assert template.render(context={"value": "[1, 2]"}) == [1, 2]
+    assert template.render(context={"value": "[1, 2, 3, 4]"}) == "[1, 2, 3, 4]"
+
+
+def test_native_environment_literal_coercion_can_be_disabled():
+    env = SoclessNativeEnvironment(coerce_literals=False)
+    template = env.from_string("{{ context.value }}")
+    assert template.render(context={"value": "123"}) == "123"
+    assert env.from_string("{{ 1 }}{{ 2 }}").render() == "12"
+    # non-string results are still returned as they are
+    assert template.render(context={"value": [1]}) == [1]
+
+
+def test_render_jinja_from_string_enforces_loop_limit():
+    template_string = "{% for i in context.numbers %}{{ i }}{% endfor %}"
+    with patch.object(jinja_env, "render_loop_limit", 5):
+        assert render_jinja_from_string(template_string, {"numbers": [1, 2, 3]}) == 123
+        with pytest.raises(SoclessBootstrapError, match="5 loop iterations"):
+            render_jinja_from_string(template_string, {"numbers": list(range(6))})
+
+
+def test_render_budget_counts_nested_loops():
+    # 3 outer and 9 inner iterations
+    env = SoclessNativeEnvironment(render_loop_limit=12)
+    template = env.from_string(
+        "{% for a in range(3) %}{% for b in range(3) %}.{% endfor %}{% endfor %}"
+    )
+    assert template.render() == "........."
+    nested_template = env.from_string(
+        "{% for a in range(4) %}{% for b in range(3) %}.{% endfor %}{% endfor %}"
+    )
+    with pytest.raises(SoclessBootstrapError, match="loop iterations"):
+        nested_template.render()
+
+
+def test_render_budget_enforces_output_limit():
+    env = SoclessNativeEnvironment(render_output_limit=10)
+    template = env.from_string("{{ context.text }}!")
+    assert template.render(context={"text": "short"}) == "short!"
+    with pytest.raises(SoclessBootstrapError, match="output limit of 10"):
+        template.render(context={"text": "far too long"})
+
+
+def test_render_budget_passes_single_values_over_the_output_limit():
+    env = SoclessNativeEnvironment(render_output_limit=10)
+    big = "x" * 100
+    assert env.from_string("{{ context.text }}").render(context={"text": big}) == big
+    with pytest.raises(SoclessBootstrapError, match="output limit of 10"):
+        env.from_string("{{ context.text }}{{ 1 }}").render(context={"text": big})
+
+
+def test_render_jinja_from_string_passes_large_values_through():
+    big = "x" * (RENDER_OUTPUT_LIMIT + 1)
+    assert render_jinja_from_string('{{ context["big"] }}', {"big": big}) == big
+
+
+def test_render_budget_enforces_time_limit():
+    env = SoclessNativeEnvironment(render_time_limit=1)
+    template = env.from_string("{% for i in range(10) %}{{ i }}{% endfor %}")
+    # every clock read is a second later than the last
+    clock = iter(range(0, 1000))
+    with patch("socless.jinja.time.monotonic", side_effect=lambda: next(clock)):
+        with pytest.raises(SoclessBootstrapError, match="time limit of 1 seconds"):
+            template.render()
+
+
+def test_render_budget_limits_can_be_disabled():
+    env = SoclessNativeEnvironment(
+        render_time_limit=0, render_loop_limit=0, render_output_limit=0
+    )
+    rendered = env.from_string("{% for i in range(200) %}x{% endfor %}").render()
+    assert rendered == "x" * 200
@@ -0,0 +1,75 @@
+# Copyright 2018 Twilio, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import pytest
+from socless.jsonpath import compile_jsonpath
+
+ROOT = {
+    "artifacts": {
+        "event": {
+            "details": {"username": "sarcher", "ips": ["10.0.0.1", "10.0.0.2"]},
+            "event-type": "login",
+        }
+    },
+    "results": {
+        "Lookup_Users": {"users": [{"name": "lana"}, {"name": "cyril"}, {"id": 3}]},
+        "0": "string key",
+    },
+}
+
+
+@pytest.mark.parametrize(
+    "path, expected",
+    [
+        ("$.artifacts.event.details.username", "sarcher"),
+        ("$.artifacts.event.event-type", "login"),
+        ("$['artifacts'][\"event\"].details.username", "sarcher"),
+        ("$.artifacts.event.details.ips[0]", "10.0.0.1"),
+        ("$.artifacts.event.details.ips[-1]", "10.0.0.2"),
+        ("$.artifacts.event.details.ips.1", "10.0.0.2"),
+        ("$.results.0", "string key"),
+        ("$.artifacts.event.details.ips[0:1]", ["10.0.0.1"]),
+        ("$.artifacts.event.details.ips[::-1]", ["10.0.0.2", "10.0.0.1"]),
+        ("$.artifacts.event.details.*", ["sarcher", ["10.0.0.1", "10.0.0.2"]]),
+        ("$.results.Lookup_Users.users[*].name", ["lana", "cyril"]),
+        ("$.", ROOT),
+    ],
+)
+def test_evaluate(path, expected):
+    assert compile_jsonpath(path).evaluate(ROOT) == expected
+
+
+@pytest.mark.parametrize(
+    "path, error",
+    [
+        ("$.artifacts.missing", KeyError),
+        ("$.artifacts.event.details.ips[5]", IndexError),
+        ("$.artifacts.event.details.username[0]", IndexError),
+    ],
+)
+def test_evaluate_missing_path_raises_lookup_error(path, error):
+    with pytest.raises(error):
+        compile_jsonpath(path).evaluate(ROOT)
+
+
+@pytest.mark.parametrize(
+    "path",
+    ["artifacts.event", "$artifacts", "$.artifacts | upper", "$.artifacts[?(@.x)]"],
+)
+def test_compile_rejects_unsupported_syntax(path):
+    with pytest.raises(ValueError):
+        compile_jsonpath(path)
+
+
+def test_compile_jsonpath_is_cached():
+    assert compile_jsonpath("$.artifacts.event") is compile_jsonpath("$.artifacts.event")
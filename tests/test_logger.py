@@ -18,6 +18,7 @@ from copy import deepcopy
 import pytest
 from moto import mock_stepfunctions, mock_sts, mock_iam
 
+from unittest.mock import patch
 from socless.logger import socless_log, socless_log_then_raise
 
 
@@ -92,3 +93,73 @@ def test_socless_log_debug(capfd):
     json_out = json.loads(out)
     assert json_out["context"]["level"] == level
     assert json_out["body"]["message"] == "Testing"
+
+
+def test_socless_log_context_is_compatible(capfd):
+    socless_log.info("Testing", {"key": "value"})
+    json_out = json.loads(capfd.readouterr()[0])
+    assert set(json_out["context"]) >= {
+        "time",
+        "aws_region",
+        "function_name",
+        "execution_env",
+        "memory_size",
+        "function_version",
+        "function_log_group",
+        "source",
+        "level",
+        "lineno",
+    }
+    assert json_out["context"]["source"] == "Socless"
+    assert json_out["body"] == {"message": "Testing", "extra": {"key": "value"}}
+
+
+def test_socless_log_skips_levels_below_threshold(capfd):
+    with patch("socless.logger.LOG_THRESHOLD", 30):
+        socless_log.info("Testing")
+        socless_log.debug("Testing")
+        socless_log.warn("Testing")
+    lines = capfd.readouterr()[0].splitlines()
+    assert [json.loads(line)["context"]["level"] for line in lines] == ["WARN"]
+
+
+def test_socless_log_samples_debug_per_invocation(capfd):
+    try:
+        with patch("socless.logger.DEBUG_SAMPLE_RATE", 0.0):
+            socless_log.start_invocation()
+        socless_log.debug("Testing")
+        socless_log.info("Testing")
+        lines = capfd.readouterr()[0].splitlines()
+        assert [json.loads(line)["context"]["level"] for line in lines] == ["INFO"]
+    finally:
+        socless_log.start_invocation()
+
+
+def test_socless_log_bound_fields(capfd):
+    try:
+        socless_log.start_invocation(execution_id="exec_id")
+        socless_log.bind(state_name="State")
+        socless_log.info("Testing")
+        context = json.loads(capfd.readouterr()[0])["context"]
+        assert context["execution_id"] == "exec_id"
+        assert context["state_name"] == "State"
+        socless_log.unbind("state_name")
+        socless_log.info("Testing")
+        assert "state_name" not in json.loads(capfd.readouterr()[0])["context"]
+    finally:
+        socless_log.start_invocation()
+
+
+def test_socless_log_truncates_large_extra(capfd):
+    with patch("socless.logger.MAX_EXTRA_BYTES", 100):
+        socless_log.info("Testing", {"blob": "x" * 1000})
+    extra = json.loads(capfd.readouterr()[0])["body"]["extra"]
+    assert extra["_truncated"] is True
+    assert extra["_original_length"] > 1000
+    assert len(extra["preview"]) == 100
+
+
+def test_socless_log_lineno_can_be_disabled(capfd):
+    with patch("socless.logger.LOG_LINENO", False):
+        socless_log.info("Testing")
+    assert "lineno" not in json.loads(capfd.readouterr()[0])["context"]
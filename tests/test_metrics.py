@@ -0,0 +1,70 @@
+# Copyright 2018 Twilio, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+import json
+from socless.metrics import MetricsBuffer, MAX_VALUES_PER_METRIC
+
+
+def make_buffer(enabled=True):
+    return MetricsBuffer("SOCless", enabled, {"FunctionName": "test_function"})
+
+
+def test_disabled_metrics_buffer_writes_nothing(capfd):
+    buffer = make_buffer(enabled=False)
+    buffer.put("EventsCreated", 1)
+    with buffer.timer("HandlerTime"):
+        pass
+    buffer.flush()
+    assert capfd.readouterr()[0] == ""
+
+
+def test_metrics_buffer_flushes_embedded_metric_format(capfd):
+    buffer = make_buffer()
+    buffer.put("EventsCreated", 3)
+    buffer.put("DedupHits", 1)
+    buffer.put("DedupHits", 2)
+    with buffer.timer("HandlerTime"):
+        pass
+    buffer.flush()
+
+    lines = capfd.readouterr()[0].splitlines()
+    assert len(lines) == 1
+    document = json.loads(lines[0])
+    directive = document["_aws"]["CloudWatchMetrics"][0]
+    assert directive["Namespace"] == "SOCless"
+    assert directive["Dimensions"] == [["FunctionName"]]
+    assert directive["Metrics"] == [
+        {"Name": "EventsCreated", "Unit": "Count"},
+        {"Name": "DedupHits", "Unit": "Count"},
+        {"Name": "HandlerTime", "Unit": "Milliseconds"},
+    ]
+    assert document["FunctionName"] == "test_function"
+    assert document["EventsCreated"] == 3
+    assert document["DedupHits"] == [1, 2]
+    assert document["HandlerTime"] >= 0
+
+    # the buffer is emptied by flush
+    buffer.flush()
+    assert capfd.readouterr()[0] == ""
+
+
+def test_metrics_buffer_splits_large_value_lists(capfd):
+    buffer = make_buffer()
+    for value in range(MAX_VALUES_PER_METRIC + 1):
+        buffer.put("PlaybookStartLatency", value, "Milliseconds")
+    buffer.flush()
+    documents = [json.loads(line) for line in capfd.readouterr()[0].splitlines()]
+    assert [document["PlaybookStartLatency"] for document in documents] == [
+        list(range(MAX_VALUES_PER_METRIC)),
+        MAX_VALUES_PER_METRIC,
+    ]
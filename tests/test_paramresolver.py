@@ -1,8 +1,20 @@
 import boto3, pytest, os
 from moto import mock_ssm
 from socless.integrations import StateHandler, ExecutionContext
-from socless.exceptions import SoclessBootstrapError
-from socless.paramresolver import ParameterResolver, resolve_string_parameter
+from socless.exceptions import SoclessBootstrapError, SoclessVaultError
+from socless.paramresolver import (
+    ParameterResolver,
+    resolve_string_parameter,
+    find_secret_references,
+    find_vault_references,
+    get_parameter_plan,
+    find_context_references,
+)
+from socless.ssm import fetch_many_from_ssm
+from socless.clients import get_boto3_client
+from socless.vault import fetch_from_vault
+from unittest.mock import patch
+from jinja2 import StrictUndefined
 
 
 @pytest.fixture()
@@ -146,3 +158,246 @@ def test_ParameterResolver_retains_single_curlies(ParamResolverTestObj):
     """This test asserts that the jinja_env configuration"""
     test_string = "[A-Z]{16}"
     assert ParamResolverTestObj.resolve_reference(test_string) == test_string
+
+
+def test_find_secret_references():
+    parameters = {
+        "token": "{{ secret('/socless/slack/bot_token') }}",
+        "nested": [{"key": "Bearer {{ '/socless/api/key' | secret }}"}],
+        "duplicate": "{{secret(\"/socless/slack/bot_token\")}}",
+        "dynamic": "{{ secret(context.secret_path) }}",
+        "not_a_template": "secret('/socless/not/a/template')",
+    }
+    assert find_secret_references(parameters) == [
+        "/socless/slack/bot_token",
+        "/socless/api/key",
+    ]
+
+
+@mock_ssm
+def test_ParameterResolver_prefetches_secrets_in_one_batch(ParamResolverTestObj):
+    ssm_client = boto3.client("ssm", region_name=os.environ["AWS_REGION"])
+    for name in ["/socless/test/one", "/socless/test/two"]:
+        ssm_client.put_parameter(Name=name, Value=f"{name} value", Type="SecureString")
+
+    parameters = {
+        "one": "{{ secret('/socless/test/one') }}",
+        "two": "{{ secret('/socless/test/two') }}",
+    }
+    with patch(
+        "socless.paramresolver.fetch_many_from_ssm", wraps=fetch_many_from_ssm
+    ) as batch_fetch, patch(
+        "socless.ssm.get_boto3_client", wraps=get_boto3_client
+    ) as client_factory:
+        resolved = ParamResolverTestObj.resolve_parameters(parameters)
+
+    assert resolved == {
+        "one": "/socless/test/one value",
+        "two": "/socless/test/two value",
+    }
+    batch_fetch.assert_called_once_with(["/socless/test/one", "/socless/test/two"])
+    # only the batch call needed a client, the templates were served from cache
+    assert client_factory.call_count == 1
+
+
+def test_resolve_jsonpath_does_not_compile_a_template(root_obj):
+    with patch("socless.jinja.get_compiled_template") as compile_template:
+        resolved = resolve_string_parameter(
+            "$.artifacts.event.details.lastname", root_obj
+        )
+    compile_template.assert_not_called()
+    assert resolved == "Archer"
+
+
+def test_resolve_jsonpath_with_json_conversion():
+    resolved = resolve_string_parameter(
+        "$.data.string_json!json", {"data": {"string_json": '["hello","world"]'}}
+    )
+    assert resolved == ["hello", "world"]
+
+
+def test_resolve_jsonpath_to_vault_path_with_json_conversion():
+    resolved = resolve_string_parameter(
+        "$.data.vault_id!json", {"data": {"vault_id": "vault:socless_vault_tests.json"}}
+    )
+    assert resolved == {"hello": "world"}
+
+
+def test_resolve_jsonpath_converts_literals_to_native_types():
+    assert resolve_string_parameter("$.data.count", {"data": {"count": "12"}}) == 12
+
+
+def test_resolve_jsonpath_with_wildcard():
+    root = {"results": {"Users": [{"name": "lana"}, {"name": "cyril"}]}}
+    resolved = resolve_string_parameter("$.results.Users[*].name", root)
+    assert resolved == ["lana", "cyril"]
+
+
+def test_resolve_jsonpath_missing_path_matches_template():
+    root = {"event": {"tags": ["a"]}}
+
+    for parameter in ["$.event.missing", "$.event.tags[9]"]:
+        template = "{{ context" + parameter[1:] + " }}"
+        assert isinstance(resolve_string_parameter(parameter, root), StrictUndefined)
+        assert isinstance(resolve_string_parameter(template, root), StrictUndefined)
+
+
+def test_resolve_jsonpath_undefined_parent_raises(root_obj):
+    with pytest.raises(SoclessBootstrapError, match="^Undefined variable"):
+        resolve_string_parameter("$.artifacts.missing.details", root_obj)
+
+
+def test_find_context_references_collects_static_paths():
+    parameters = {
+        "ip": "$.artifacts.event.details.ip",
+        "message": "Hello {{ context.artifacts.event.details['user name'] }}",
+        "nested": {"first": ["$.results.lookup.items[0].name"]},
+        "static": 5,
+        "vault": "vault:some_file",
+        "secret": "{{ secret('/socless/key') }}",
+    }
+    assert find_context_references(parameters) == [
+        ("artifacts", "event", "details", "ip"),
+        ("artifacts", "event", "details", "user name"),
+        ("results", "lookup", "items"),
+    ]
+
+
+def test_find_context_references_stops_at_computed_keys():
+    assert find_context_references(
+        {"a": "{{ context.results[context.artifacts.state].value }}"}
+    ) == [("artifacts", "state"), ("results",)]
+    assert find_context_references(
+        {"a": "{{ context.results.items() | list }}"}
+    ) == [("results",)]
+
+
+def test_find_context_references_returns_none_for_whole_context():
+    assert find_context_references({"a": "{{ context }}"}) is None
+    assert find_context_references({"a": "$."}) is None
+    assert find_context_references({"a": "{{ context[key] }}"}) is None
+
+
+def test_find_vault_references(root_obj):
+    parameters = {
+        "legacy": "vault:socless_vault_tests.txt!json",
+        "template": "{{ vault('socless_vault_tests.json') | fromjson }}",
+        "jsonpath": "$.artifacts.event.details.vault_test",
+        "dynamic": "{{ vault(context.file_id) }}",
+        "missing_path": "$.artifacts.event.nope",
+    }
+    assert find_vault_references(parameters, root_obj) == [
+        "socless_vault_tests.txt",
+        "socless_vault_tests.json",
+    ]
+    assert find_vault_references(parameters) == [
+        "socless_vault_tests.txt",
+        "socless_vault_tests.json",
+    ]
+
+
+def test_ParameterResolver_prefetches_vault_objects_once(ParamResolverTestObj):
+    parameters = {
+        "txt": "vault:socless_vault_tests.txt",
+        "json": "{{ vault('socless_vault_tests.json') | fromjson }}",
+        "jsonpath": "$.artifacts.event.details.vault_test",
+    }
+    with patch(
+        "socless.paramresolver.fetch_from_vault", wraps=fetch_from_vault
+    ) as prefetch, patch(
+        "socless.vault.get_boto3_client", wraps=get_boto3_client
+    ) as client_factory:
+        resolved = ParamResolverTestObj.resolve_parameters(parameters)
+
+    assert resolved == {
+        "txt": "this came from the vault",
+        "json": {"hello": "world"},
+        "jsonpath": "this came from the vault",
+    }
+    assert sorted(call.args[0] for call in prefetch.call_args_list) == [
+        "socless_vault_tests.json",
+        "socless_vault_tests.txt",
+    ]
+    # rendering was served from the cache the prefetch filled
+    assert client_factory.call_count == 2
+
+
+def test_ParameterResolver_prefetch_errors_are_raised_in_parameter_order(
+    ParamResolverTestObj,
+):
+    parameters = {
+        "first": "vault:missing_first.txt",
+        "second": "vault:missing_second.txt",
+    }
+
+    def missing(file_id, **kwargs):
+        raise SoclessVaultError(f"No vault object {file_id}")
+
+    with patch("socless.paramresolver.fetch_from_vault", side_effect=missing), patch(
+        "socless.jinja.fetch_from_vault", side_effect=missing
+    ):
+        with pytest.raises(SoclessVaultError, match="missing_first"):
+            ParamResolverTestObj.resolve_parameters(parameters)
+
+
+def test_ParameterResolver_shares_static_subtrees(ParamResolverTestObj):
+    parameters = {
+        "name": "$.artifacts.event.details.firstname",
+        "blocks": [{"type": "section", "text": "static"}],
+        "nested": {"static": ["a", "b"], "dynamic": ["$.artifacts.event.details.lastname"]},
+    }
+
+    resolved = ParamResolverTestObj.resolve_parameters(parameters)
+
+    assert resolved == {
+        "name": "Sterling",
+        "blocks": [{"type": "section", "text": "static"}],
+        "nested": {"static": ["a", "b"], "dynamic": ["Archer"]},
+    }
+    assert resolved["blocks"] is parameters["blocks"]
+    assert resolved["nested"]["static"] is parameters["nested"]["static"]
+    # containers with references are copied, never resolved in place
+    assert parameters["nested"]["dynamic"] == ["$.artifacts.event.details.lastname"]
+
+
+def test_ParameterResolver_evaluates_identical_references_once(ParamResolverTestObj):
+    parameters = {
+        "first": "$.artifacts.event.details.firstname",
+        "again": ["$.artifacts.event.details.firstname"],
+    }
+    with patch(
+        "socless.paramresolver.resolve_string_parameter",
+        wraps=resolve_string_parameter,
+    ) as resolve:
+        resolved = ParamResolverTestObj.resolve_parameters(parameters)
+
+    assert resolved == {"first": "Sterling", "again": ["Sterling"]}
+    assert resolve.call_count == 1
+
+
+def test_get_parameter_plan_is_cached_by_config():
+    parameters = {"count": "123", "text": "hello", "ref": "{{ context.x }}"}
+
+    plan = get_parameter_plan(parameters)
+
+    assert get_parameter_plan(dict(parameters)) is plan
+    assert plan.references == ["{{ context.x }}"]
+    assert ParameterResolver({"x": 1}).resolve_parameters(parameters) == {
+        "count": 123,
+        "text": "hello",
+        "ref": 1,
+    }
+
+
+def test_get_parameter_plan_does_not_share_plans_across_container_types():
+    resolver = ParameterResolver({"x": 1})
+
+    # tuples are passed through as-is, like before plans were cached
+    assert resolver.resolve_parameters({"a": ("{{ context.x }}",)}) == {
+        "a": ("{{ context.x }}",)
+    }
+    assert resolver.resolve_parameters({"a": ["{{ context.x }}"]}) == {"a": [1]}
+    assert resolver.resolve_parameters({"a": {1: "{{ context.x }}"}}) == {"a": {1: 1}}
+    assert resolver.resolve_parameters({"a": {"1": "{{ context.x }}"}}) == {
+        "a": {"1": 1}
+    }
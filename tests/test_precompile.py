@@ -0,0 +1,122 @@
+# Copyright 2018 Twilio, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+from tests.conftest import *  # imports testing boilerplate
+import json, sys
+import pytest
+from unittest.mock import patch
+from socless import jinja
+from socless.jinja import (
+    get_compiled_template,
+    get_precompiled_templates_loader,
+    jinja_env,
+    render_jinja_from_string,
+)
+from socless.precompile import find_definition_templates, main
+
+DEFINITION = {
+    "Comment": "A playbook",
+    "StartAt": "Enrich",
+    "States": {
+        "Enrich": {
+            "Type": "Task",
+            "Parameters": {
+                "execution_id.$": "$.execution_id",
+                "State_Config": {
+                    "Name": "Enrich",
+                    "Parameters": {
+                        "message": "Login by {{ context.artifacts.username }}",
+                        "ip": "$.artifacts.event.details.ip",
+                        "legacy_fallback": "$.artifacts.events|length",
+                        "report": "vault:report.txt",
+                        "channel": "security-alerts",
+                    },
+                },
+            },
+            "Next": "Notify",
+        },
+        "Notify": {
+            "Type": "Parallel",
+            "Branches": [
+                {
+                    "StartAt": "Slack",
+                    "States": {
+                        "Slack": {
+                            "Type": "Task",
+                            "Parameters": {
+                                "text": "{% for r in context.results %}{{ r }}{% endfor %}"
+                            },
+                            "End": True,
+                        }
+                    },
+                }
+            ],
+            "End": True,
+        },
+    },
+}
+
+
+def test_find_definition_templates():
+    assert find_definition_templates({"definition": DEFINITION}) == [
+        "Login by {{ context.artifacts.username }}",
+        "{{context.artifacts.events|length}}",
+        "{{vault('report.txt')}}",
+        "{% for r in context.results %}{{ r }}{% endfor %}",
+    ]
+
+
+@pytest.fixture()
+def precompiled_package(tmp_path):
+    definition_path = tmp_path / "playbook.json"
+    definition_path.write_text(json.dumps(DEFINITION))
+    package_dir = tmp_path / "precompiled_test_templates"
+
+    assert main([str(definition_path), "--output", str(package_dir)]) == 0
+
+    sys.path.insert(0, str(tmp_path))
+    get_compiled_template.cache_clear()
+    with patch.object(jinja, "PRECOMPILED_TEMPLATES_PACKAGE", package_dir.name):
+        yield package_dir
+    sys.path.remove(str(tmp_path))
+    sys.modules.pop(package_dir.name, None)
+    get_compiled_template.cache_clear()
+    get_precompiled_templates_loader.cache_clear()
+
+
+def test_render_jinja_from_string_loads_precompiled_templates(precompiled_package):
+    with patch.object(jinja_env, "from_string", wraps=jinja_env.from_string) as compile:
+        rendered = render_jinja_from_string(
+            "Login by {{ context.artifacts.username }}",
+            {"artifacts": {"username": "Sterling"}},
+        )
+        looped = render_jinja_from_string(
+            "{% for r in context.results %}{{ r }}{% endfor %}", {"results": [1, 2]}
+        )
+        compile.assert_not_called()
+
+        # templates that weren't precompiled are compiled at runtime
+        assert render_jinja_from_string("{{ context.x }}!", {"x": "hi"}) == "hi!"
+        compile.assert_called_once()
+
+    assert rendered == "Login by Sterling"
+    assert looped == 12
+
+
+def test_precompiled_templates_from_another_jinja_version_are_ignored(
+    precompiled_package,
+):
+    init_file = precompiled_package / "__init__.py"
+    init_file.write_text('JINJA_VERSION = "0.0"\n')
+
+    assert get_precompiled_templates_loader(precompiled_package.name) is None
@@ -0,0 +1,41 @@
+# Copyright 2018 Twilio, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+from decimal import Decimal
+from boto3.dynamodb.types import Binary
+from socless.resultsformat import (
+    COMPRESSED_FORMAT,
+    build_compressed_attributes,
+    decode_context,
+    encode_context,
+    is_compressed_item,
+)
+
+
+def test_encode_context_round_trips_without_decimals():
+    context = {"artifacts": {"event": {"details": {"score": Decimal("0.5"), "n": 3}}}}
+    decoded = decode_context(Binary(encode_context(context)))
+    assert decoded == {"artifacts": {"event": {"details": {"score": 0.5, "n": 3}}}}
+    assert isinstance(decoded["artifacts"]["event"]["details"]["score"], float)
+
+
+def test_encode_context_compresses_repetitive_contexts():
+    context = {"results": {f"State_{i}": {"status": "ok" * 50} for i in range(50)}}
+    assert len(encode_context(context)) * 5 < len(str(context))
+
+
+def test_build_compressed_attributes_marks_the_format():
+    attributes = build_compressed_attributes({"artifacts": {}})
+    assert is_compressed_item(attributes)
+    assert attributes["results_format"] == COMPRESSED_FORMAT
+    assert not is_compressed_item({"results": {}})
@@ -11,6 +11,7 @@
 # # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # # See the License for the specific language governing permissions and
 # # limitations under the License
+import json
 from tests.conftest import *  # imports testing boilerplate
 from socless.socless import (
     fetch_actual_parameters,
@@ -19,7 +20,16 @@ from socless.socless import (
     parse_parameters,
     apply_conversion_from,
     socless_template_string,
+    socless_create_events,
+    socless_save_state_execution_result,
+    socless_fetch_execution_result,
+    socless_post_human_response,
 )
+from socless.events import compute_dedup_hash, get_event_table, get_dedup_table
+from socless.integrations import ExecutionContext
+from socless.utils import gen_id
+from unittest.mock import MagicMock, patch
+from .helpers import put_compressed_results_item
 
 # initialize test data
 TEST_DATA = {
@@ -150,3 +160,118 @@ def test_socless_fetch_from_vault():
 
 def test_conversion_from_json():
     assert apply_conversion_from('["hello", "world"]', "json") == ["hello", "world"]
+
+
+def test_socless_create_events_dedups_through_dedup_table():
+    username = gen_id()
+    event_data = {
+        "event_type": "Legacy Dedup Test",
+        "details": [{"username": username}],
+        "dedup_keys": ["username"],
+    }
+    original = socless_create_events(event_data)
+    duplicate = socless_create_events(event_data)
+
+    assert original["status"] is True
+    assert duplicate["status"] is True
+    original_event = get_event_table().get_item(Key={"id": original["message"]})["Item"]
+    duplicate_event = get_event_table().get_item(Key={"id": duplicate["message"]})[
+        "Item"
+    ]
+    assert original_event["is_duplicate"] is False
+    assert original_event["status_"] == "open"
+    assert duplicate_event["is_duplicate"] is True
+    assert duplicate_event["status_"] == "closed"
+    assert duplicate_event["investigation_id"] == original["message"]
+
+
+def test_socless_create_events_dedups_non_string_keys():
+    event_data = {
+        "event_type": "Legacy Dedup Test",
+        "details": [{"user_id": int(gen_id(8), 16), "admin": True}],
+        "dedup_keys": ["user_id", "admin"],
+    }
+    original = socless_create_events(event_data)
+    duplicate = socless_create_events(event_data)
+
+    assert original["status"] is True
+    duplicate_event = get_event_table().get_item(Key={"id": duplicate["message"]})[
+        "Item"
+    ]
+    assert duplicate_event["is_duplicate"] is True
+    assert duplicate_event["investigation_id"] == original["message"]
+
+
+def test_socless_create_events_ignores_closed_investigations():
+    username = gen_id()
+    event_data = {
+        "event_type": "Legacy Dedup Test",
+        "details": [{"username": username}],
+        "dedup_keys": ["username"],
+    }
+    original = socless_create_events(event_data)
+    get_event_table().update_item(
+        Key={"id": original["message"]},
+        UpdateExpression="SET status_ = :closed",
+        ExpressionAttributeValues={":closed": "closed"},
+    )
+
+    new = socless_create_events(event_data)
+    new_event = get_event_table().get_item(Key={"id": new["message"]})["Item"]
+    assert new_event["is_duplicate"] is False
+    assert new_event["investigation_id"] == new["message"]
+    dedup_hash = compute_dedup_hash("Legacy Dedup Test", {"username": username}, ["username"])
+    mapping = get_dedup_table().get_item(Key={"dedup_hash": dedup_hash})["Item"]
+    assert mapping["current_investigation_id"] == new["message"]
+
+
+COMPRESSED_CONTEXT = {
+    "artifacts": {"event": {"details": {"username": "sterling"}}},
+    "errors": {},
+    "results": {},
+}
+
+
+def test_legacy_results_helpers_read_and_write_compressed_items():
+    execution_id = put_compressed_results_item(COMPRESSED_CONTEXT)
+
+    socless_save_state_execution_result(execution_id, "Legacy_State", {"ok": True})
+    item = socless_fetch_execution_result(execution_id, "reader")
+
+    assert item["results"]["artifacts"] == COMPRESSED_CONTEXT["artifacts"]
+    assert item["results"]["results"] == {
+        "Legacy_State": {"ok": True},
+        "_Last_Saved_Results": {"ok": True},
+    }
+    assert "results_blob" not in item
+    # the item is still stored compressed
+    assert ExecutionContext(execution_id).get_item()["results_format"] == 2
+
+
+def test_socless_post_human_response_reads_compressed_items():
+    execution_id = put_compressed_results_item(COMPRESSED_CONTEXT)
+    message_id = gen_id()
+    responses_table_name = os.environ["SOCLESS_MESSAGE_RESPONSE_TABLE"]
+    boto3.resource("dynamodb").Table(responses_table_name).put_item(
+        Item={
+            "message_id": message_id,
+            "await_token": gen_id(),
+            "execution_id": execution_id,
+            "receiver": "Await_Response",
+        }
+    )
+    stepfunctions = MagicMock()
+    with patch.dict(
+        os.environ,
+        {
+            "MESSAGE_RESPONSES_TABLE": responses_table_name,
+            "RESULTS_TABLE": os.environ["SOCLESS_RESULTS_TABLE"],
+        },
+    ), patch("socless.socless.get_boto3_client", return_value=stepfunctions):
+        socless_post_human_response(message_id, {"answer": "yes"})
+
+    output = json.loads(stepfunctions.send_task_success.call_args.kwargs["output"])
+    assert output["artifacts"] == COMPRESSED_CONTEXT["artifacts"]
+    assert output["results"] == {"Await_Response": {"answer": "yes"}, "answer": "yes"}
+    saved = ExecutionContext(execution_id).fetch_context()["results"]["results"]
+    assert saved["Await_Response"] == output["results"]
@@ -1,6 +1,17 @@
 from tests.conftest import *  # imports testing boilerplate
+import asyncio, time
+from unittest.mock import patch
 from moto import mock_ssm
-from socless.ssm import fetch_from_ssm
+from socless.exceptions import SoclessBootstrapError
+from socless.ssm import (
+    SSM_GET_PARAMETERS_LIMIT,
+    SecretCache,
+    fetch_from_ssm,
+    fetch_from_ssm_async,
+    fetch_many_from_ssm,
+    invalidate_ssm_cache,
+    secret_cache,
+)
 
 
 @mock_ssm
@@ -15,4 +26,79 @@ def test_fetch_parameter():
     )
 
     param = fetch_from_ssm(test_secret_path)
-    assert param == "test_parameter_for_socless"
\ No newline at end of file
+    assert param == "test_parameter_for_socless"
+
+
+def put_test_parameter(ssm_client, name, value):
+    ssm_client.put_parameter(Name=name, Value=value, Type="SecureString")
+
+
+@mock_ssm
+def test_fetch_parameter_with_cache():
+    test_secret_path = "/socless/test/cached_secret"
+    ssm_client = boto3.client("ssm", region_name=os.environ["AWS_REGION"])
+    put_test_parameter(ssm_client, test_secret_path, "original")
+
+    assert fetch_from_ssm(test_secret_path, use_cache=True) == "original"
+    ssm_client.put_parameter(
+        Name=test_secret_path, Value="rotated", Type="SecureString", Overwrite=True
+    )
+    assert fetch_from_ssm(test_secret_path, use_cache=True) == "original"
+    assert fetch_from_ssm(test_secret_path) == "rotated"
+
+    invalidate_ssm_cache(test_secret_path)
+    assert fetch_from_ssm(test_secret_path, use_cache=True) == "rotated"
+
+
+@mock_ssm
+def test_fetch_many_from_ssm_batches_beyond_request_limit():
+    ssm_client = boto3.client("ssm", region_name=os.environ["AWS_REGION"])
+    names = [f"/socless/test/batch_{i}" for i in range(SSM_GET_PARAMETERS_LIMIT + 3)]
+    for name in names:
+        put_test_parameter(ssm_client, name, f"value of {name}")
+
+    values = fetch_many_from_ssm(names)
+    assert values == {name: f"value of {name}" for name in names}
+    assert secret_cache.get(names[-1]) == f"value of {names[-1]}"
+
+
+@mock_ssm
+def test_fetch_many_from_ssm_fails_on_missing_parameter():
+    ssm_client = boto3.client("ssm", region_name=os.environ["AWS_REGION"])
+    put_test_parameter(ssm_client, "/socless/test/exists", "value")
+
+    with pytest.raises(SoclessBootstrapError, match="/socless/test/missing"):
+        fetch_many_from_ssm(["/socless/test/exists", "/socless/test/missing"])
+
+
+def test_secret_cache_expires_entries():
+    cache = SecretCache(ttl=60, max_entries=2)
+    cache.set("a", "1")
+    with patch("socless.ssm.time.monotonic", return_value=time.monotonic() + 61):
+        assert cache.get("a") is None
+
+
+def test_secret_cache_evicts_least_recently_used():
+    cache = SecretCache(ttl=60, max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+    assert cache.get("a") == "1"
+    assert cache.get("b") is None
+    assert cache.get("c") == "3"
+
+
+def test_secret_cache_disabled_with_zero_ttl():
+    cache = SecretCache(ttl=0, max_entries=2)
+    cache.set("a", "1")
+    assert cache.get("a") is None
+
+
+@mock_ssm
+def test_fetch_from_ssm_async():
+    test_secret_path = "/socless/test/async_secret"
+    ssm_client = boto3.client("ssm", region_name=os.environ["AWS_REGION"])
+    put_test_parameter(ssm_client, test_secret_path, "async_value")
+
+    assert asyncio.run(fetch_from_ssm_async(test_secret_path)) == "async_value"
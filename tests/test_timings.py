@@ -0,0 +1,83 @@
+# Copyright 2018 Twilio, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License
+from tests.conftest import *  # imports testing boilerplate
+import json
+from unittest.mock import patch
+from socless.integrations import socless_bootstrap
+from socless.timings import PhaseTimings, phase_timings, span
+from .helpers import MockLambdaContext, mock_execution_results_table_entry
+
+
+def test_disabled_phase_timings_record_nothing():
+    timings = PhaseTimings(enabled=False)
+    with timings.phase("handler"):
+        pass
+    assert timings.as_dict() == {}
+
+
+def test_phase_timings_accumulate_repeated_phases():
+    timings = PhaseTimings(enabled=True)
+    timings.record("lookup", 1.0)
+    timings.record("lookup", 2.5)
+    with timings.phase("handler"):
+        pass
+    assert timings.as_dict()["lookup"] == 3.5
+    assert timings.as_dict()["handler"] >= 0
+    timings.reset()
+    assert timings.as_dict() == {}
+
+
+def handler_with_span(firstname=""):
+    with span("custom_lookup"):
+        return {"firstname": firstname}
+
+
+def test_socless_bootstrap_reports_phase_timings(capfd):
+    item_metadata = mock_execution_results_table_entry()
+    event = {
+        "execution_id": item_metadata["execution_id"],
+        "State_Config": {
+            "Name": "timed_state",
+            "Parameters": {"firstname": "$.artifacts.event.details.some"},
+        },
+    }
+    with patch.object(phase_timings, "enabled", True), patch(
+        "socless.integrations.TIMINGS_MODE", "event"
+    ):
+        result = socless_bootstrap(event, MockLambdaContext(), handler_with_span)
+
+    assert set(result["socless_timings"]) == {
+        "fetch_context",
+        "resolve_parameters",
+        "handler",
+        "custom_lookup",
+        "save_state_results",
+        "total",
+    }
+    logged = [json.loads(line) for line in capfd.readouterr()[0].splitlines()]
+    timing_logs = [
+        line for line in logged if line["body"]["message"] == "Integration phase timings"
+    ]
+    assert timing_logs[0]["body"]["extra"]["timings"] == result["socless_timings"]
+    assert timing_logs[0]["context"]["state_name"] == "timed_state"
+
+
+def test_socless_bootstrap_without_timings_leaves_event_unchanged():
+    item_metadata = mock_execution_results_table_entry()
+    event = {
+        "execution_id": item_metadata["execution_id"],
+        "State_Config": {"Name": "untimed_state", "Parameters": {"firstname": "x"}},
+    }
+    result = socless_bootstrap(event, MockLambdaContext(), handler_with_span)
+    assert "socless_timings" not in result
@@ -13,12 +13,20 @@
 # limitations under the License
 from tests.conftest import *  # imports testing boilerplate
 from .helpers import MockLambdaContext, dict_to_item
-import json, os
+import asyncio, json, os
 from copy import deepcopy
 import pytest
 from moto import mock_stepfunctions, mock_sts, mock_iam
 
-from socless.vault import save_to_vault, fetch_from_vault, remove_from_vault
+from socless.vault import (
+    VaultCache,
+    save_to_vault,
+    save_to_vault_async,
+    fetch_from_vault,
+    fetch_from_vault_async,
+    remove_from_vault,
+    vault_cache,
+)
 
 
 bucket_name = os.environ["SOCLESS_VAULT"]
@@ -102,3 +110,65 @@ def test_remove_from_vault():
     obj = bucket.Object(file_id)
     with pytest.raises(Exception):
         data = obj.get()["Body"].read().decode("utf-8")
+
+
+def test_fetch_from_vault_is_served_from_cache():
+    setup = save_to_vault("Test_Content")
+    file_id = setup["file_id"]
+    hits_before = vault_cache.hits
+
+    # delete the object behind the cache's back, the cached copy is still served
+    boto3.resource("s3").Bucket(bucket_name).Object(file_id).delete()
+
+    assert fetch_from_vault(file_id, content_only=True) == "Test_Content"
+    assert vault_cache.hits == hits_before + 1
+    with pytest.raises(Exception):
+        fetch_from_vault(file_id, use_cache=False)
+
+
+def test_fetch_from_vault_populates_cache_on_miss():
+    misses_before = vault_cache.misses
+
+    assert fetch_from_vault("socless_vault_tests.txt", content_only=True) == (
+        "this came from the vault"
+    )
+    assert vault_cache.misses == misses_before + 1
+    assert vault_cache.get((bucket_name, "socless_vault_tests.txt")) == (
+        "this came from the vault"
+    )
+
+
+def test_remove_from_vault_invalidates_cache():
+    file_id = save_to_vault("Test_Content")["file_id"]
+    remove_from_vault(file_id)
+
+    assert vault_cache.get((bucket_name, file_id)) is None
+    with pytest.raises(Exception):
+        fetch_from_vault(file_id)
+
+
+def test_vault_cache_is_bounded_by_bytes():
+    cache = VaultCache(max_bytes=10)
+    cache.put(("bucket", "a"), "aaaa", 4)
+    cache.put(("bucket", "b"), "bbbb", 4)
+    cache.get(("bucket", "a"))
+    cache.put(("bucket", "c"), "cccc", 4)
+
+    assert cache.get(("bucket", "b")) is None
+    assert cache.get(("bucket", "a")) == "aaaa"
+    assert cache.stats()["bytes"] == 8
+
+
+def test_vault_cache_skips_objects_larger_than_budget():
+    cache = VaultCache(max_bytes=10)
+    cache.put(("bucket", "big"), "x" * 11, 11)
+    assert cache.get(("bucket", "big")) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_save_and_fetch_from_vault_async():
+    async def round_trip():
+        saved = await save_to_vault_async("Async_Content")
+        return await fetch_from_vault_async(saved["file_id"], use_cache=False)
+
+    assert asyncio.run(round_trip()) == {"content": "Async_Content"}